@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    # Valores iniciales de los contadores (después los mantienen las escrituras de productos)
+    Category = apps.get_model('categoría', 'Category')
+    Product = apps.get_model('prenda', 'Product')
+    products = Product.objects.filter(category=OuterRef('pk')).order_by().values('category')
+    Category.objects.update(
+        product_count=Coalesce(Subquery(products.annotate(count=Count('pk')).values('count')), 0),
+        stock_total=Coalesce(Subquery(products.annotate(total=Sum('stock')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categoría', '0001_initial'),
+        ('prenda', '0007_name_upper_prefix_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Número de Productos'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='stock_total',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Stock Total'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['product_count', 'id'], name='categories_product_231f0c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['stock_total', 'id'], name='categories_stock_t_319aed_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
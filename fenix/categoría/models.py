@@ -1,16 +1,44 @@
 # categoria/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from fenix.cache import CATALOG_NAMESPACE, invalidate_namespace
+from fenix.conditional import remember_loaded_name
 
 class Category(models.Model):
     # Django crea 'id' automáticamente, pero puedes explicitarlo si lo deseas
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=50, unique=True, verbose_name="Nombre de Categoría")
     description = models.TextField(blank=True, null=True, verbose_name="Descripción")
+    # Contadores mantenidos al escribir productos (ver prenda/models.py);
+    # se recalculan con: python manage.py rebuild_counters
+    product_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Número de Productos")
+    stock_total = models.IntegerField(default=0, editable=False, verbose_name="Stock Total")
 
     class Meta:
         db_table = 'categories' # ¡CONFIRMA ESTO! Mapea a la tabla 'categories' de tu MySQL
         verbose_name = "Categoría"
         verbose_name_plural = "Categorías"
+        # Ordenación del listado por los contadores
+        indexes = [
+            models.Index(fields=['product_count', 'id']),
+            models.Index(fields=['stock_total', 'id']),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Nombre con el que se cargó: los productos lo muestran (ver prenda/models.py)
+        instance = super().from_db(db, field_names, values)
+        remember_loaded_name(instance)
+        return instance
+
+
+# Invalida la caché de respuestas del catálogo al crear, modificar o borrar categorías
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_cache_on_category_change(sender, **kwargs):
+    # Al confirmar: antes, otra petición podría volver a cachear los datos sin el cambio
+    transaction.on_commit(lambda: invalidate_namespace(CATALOG_NAMESPACE))
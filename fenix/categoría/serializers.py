@@ -2,33 +2,34 @@
 
 # Importamos el módulo serializers de Django REST Framework
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 # Importamos nuestro modelo Category
 from .models import Category
-# Importamos el modelo Product de la aplicación 'prenda'
-from prenda.models import Product
-
-# Serializador básico para el modelo Product
-class ProductSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Product
-        fields = '__all__'
-        # Si tu modelo Product tiene 'created_at' y es de solo lectura, puedes añadirlo aquí:
-        # read_only_fields = ('created_at',)
 
 # Serializador principal para el modelo Category
+# product_count y stock_total son contadores mantenidos (no editables, ver categoría/models.py)
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
         read_only_fields = ['id']
 
-# Serializador para mostrar los detalles de una categoría junto con sus productos asociados
+# Serializador para mostrar los detalles de una categoría con el resumen de sus productos.
+# Los productos no se incrustan (una categoría puede tener miles): se piden paginados
+# en products_url (/api/categories/<id>/products/).
 class CategoryDetailSerializer(serializers.ModelSerializer):
-    # ¡LA LÍNEA CLAVE A MODIFICAR ES ESTA!
-    # Eliminamos 'source='products'' porque el nombre del campo 'products'
-    # ya coincide con el related_name del ForeignKey en el modelo Product.
-    products = ProductSerializer(many=True, read_only=True) # <-- CAMBIO AQUÍ: Eliminado source='products'
+    price_min = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    price_max = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    products_url = serializers.SerializerMethodField()
+
+    # Columnas que usan los campos anotados (?fields= / ?omit=, ver fenix/sparse.py)
+    sparse_sources = {'price_min': (), 'price_max': (), 'products_url': ()}
 
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'products']
\ No newline at end of file
+        fields = ['id', 'name', 'description', 'product_count', 'stock_total', 'price_min', 'price_max', 'products_url']
+
+    def get_products_url(self, obj):
+        return reverse(
+            'categoría_api:category-products', kwargs={'category_pk': obj.pk}, request=self.context.get('request')
+        )
@@ -1,3 +1,117 @@
+from decimal import Decimal
+
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from .models import Category
+from prenda.models import Product
+
+
+class CategoryProductsTest(TestCase):
+    """
+    Tests for the category list/detail summaries and the paginated products sub-resource.
+    """
+    def setUp(self):
+        cache.clear()
+        self.shirts = Category.objects.create(name="Camisas")
+        self.empty = Category.objects.create(name="Zapatos")
+        for index, price in enumerate(('19.90', '35.00', '12.50')):
+            Product.objects.create(name=f"Camisa {index}", price=Decimal(price), stock=index + 1, category=self.shirts)
+
+    def _get(self, url, **params):
+        return self.client.get(url, params, HTTP_ACCEPT='application/json')
+
+    def test_list_annotates_product_count(self):
+        """Test that the list exposes the maintained counters without touching products."""
+        with self.assertNumQueries(2):  # COUNT de la paginación + listado
+            response = self._get(reverse('categoría_api:category-list-create'), ordering='-product_count')
+        counts = [(category['name'], category['product_count'], category['stock_total']) for category in response.json()['results']]
+        self.assertEqual(counts, [("Camisas", 3, 6), ("Zapatos", 0, 0)])
+
+    def test_detail_returns_summary_without_products(self):
+        """Test that the detail returns aggregates and a link instead of embedding the products."""
+        with self.assertNumQueries(1):
+            response = self._get(reverse('categoría_api:category-detail', args=[self.shirts.pk]))
+        data = response.json()
+        self.assertNotIn('products', data)
+        self.assertEqual(
+            (data['product_count'], data['stock_total'], data['price_min'], data['price_max']),
+            (3, 6, "12.50", "35.00"),
+        )
+        self.assertTrue(data['products_url'].endswith(f'/api/categories/{self.shirts.pk}/products/'))
+
+        data = self._get(reverse('categoría_api:category-detail', args=[self.empty.pk])).json()
+        self.assertEqual((data['product_count'], data['stock_total'], data['price_min']), (0, 0, None))
+
+    def test_products_sub_resource_is_paginated_and_filtered(self):
+        """Test that /categories/<id>/products/ pages only that category's products."""
+        Product.objects.create(name="Bota", price=Decimal('60.00'), stock=1, category=self.empty)
+        for index in range(20):
+            Product.objects.create(name=f"Polo {index}", price=Decimal('50.00'), stock=1, category=self.shirts)
+        url = reverse('categoría_api:category-products', args=[self.shirts.pk])
+        data = self._get(url, ordering='price').json()
+        self.assertEqual(data['count'], 23)
+        self.assertEqual(len(data['results']), 20)  # PAGE_SIZE
+        self.assertEqual([product['price'] for product in data['results'][:2]], ["12.50", "19.90"])
+        self.assertIsNotNone(data['next'])
+
+        self.assertEqual(self._get(url, price_max=20).json()['count'], 2)
+        self.assertEqual(self._get(reverse('categoría_api:category-products', args=[999])).status_code, 404)
+        response = self.client.post(url, {'name': "X", 'price': '1.00'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 405)
+
+
+class CategoryCountersTest(TestCase):
+    """
+    Tests for Category.product_count / stock_total maintained on product writes.
+    """
+    def setUp(self):
+        self.shirts = Category.objects.create(name="Camisas")
+        self.shoes = Category.objects.create(name="Zapatos")
+
+    def assertCounters(self, category, product_count, stock_total):
+        category.refresh_from_db()
+        self.assertEqual((category.product_count, category.stock_total), (product_count, stock_total))
+
+    def test_counters_follow_product_writes(self):
+        """Test that create, stock change, category change and delete adjust the counters."""
+        product = Product.objects.create(name="Camisa", price=Decimal('10.00'), stock=5, category=self.shirts)
+        Product.objects.create(name="Polo", price=Decimal('10.00'), stock=2, category=self.shirts)
+        self.assertCounters(self.shirts, 2, 7)
+
+        product = Product.objects.get(pk=product.pk)
+        product.stock = 8
+        product.save()
+        self.assertCounters(self.shirts, 2, 10)
+
+        product.category = self.shoes
+        product.save()
+        self.assertCounters(self.shirts, 1, 2)
+        self.assertCounters(self.shoes, 1, 8)
+
+        product.delete()
+        self.assertCounters(self.shoes, 0, 0)
+
+    def test_update_api_adjusts_counters(self):
+        """Test that editing a product through the API moves its stock between categories."""
+        product = Product.objects.create(name="Camisa", price=Decimal('10.00'), stock=5, category=self.shirts)
+        response = self.client.patch(
+            f'/api/products/{product.pk}/', {'stock': 3, 'category': self.shoes.pk},
+            content_type='application/json', HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertCounters(self.shirts, 0, 0)
+        self.assertCounters(self.shoes, 1, 3)
 
-# Create your tests here.
+    def test_rebuild_counters_fixes_drift(self):
+        """Test that rebuild_counters recomputes the counters from the products."""
+        Product.objects.create(name="Camisa", price=Decimal('10.00'), stock=5, category=self.shirts)
+        Product.objects.filter(category=self.shirts).update(stock=9)  # sin señales
+        Category.objects.filter(pk=self.shoes.pk).update(product_count=4)
+        call_command('rebuild_counters', '--only', 'categories', stdout=StringIO())
+        self.assertCounters(self.shirts, 1, 9)
+        self.assertCounters(self.shoes, 0, 0)
@@ -1,9 +1,11 @@
 from django.urls import path
-from .views_api import CategoryListCreateAPIView, CategoryRetrieveUpdateDestroyAPIView
+from .views_api import CategoryListCreateAPIView, CategoryProductListAPIView, CategoryRetrieveUpdateDestroyAPIView
 
 app_name = 'categoría_api'
 
 urlpatterns = [
     path('categories/', CategoryListCreateAPIView.as_view(), name='category-list-create'),
     path('categories/<int:pk>/', CategoryRetrieveUpdateDestroyAPIView.as_view(), name='category-detail'),
+    # Productos de la categoría, paginados
+    path('categories/<int:category_pk>/products/', CategoryProductListAPIView.as_view(), name='category-products'),
 ]
@@ -12,17 +12,24 @@ from .models import Category
 # Importamos ambos serializadores: el básico y el de detalle.
 # Asegúrate de que CategoryDetailSerializer esté importado aquí.
 from .serializers import CategorySerializer, CategoryDetailSerializer
+# Caché de respuestas GET del catálogo (se invalida al cambiar productos o categorías)
+from fenix.cache import CachedResponseMixin
+from fenix.sparse import SparseFieldsetMixin
+from django.db.models import Max, Min
+from django.shortcuts import get_object_or_404
+from prenda.api_views import ProductListCreateAPIView
 
 # Vista para la colección de categorías (Listar y Crear)
 # Permite:
-#   - GET request a /api/categorias/ : Lista todas las categorías
+#   - GET request a /api/categorias/ : Lista todas las categorías (con product_count y stock_total)
 #   - POST request a /api/categorias/ : Crea una nueva categoría
-class CategoryListCreateAPIView(generics.ListCreateAPIView):
-    queryset = Category.objects.all().prefetch_related('products')
+class CategoryListCreateAPIView(CachedResponseMixin, SparseFieldsetMixin, generics.ListCreateAPIView):
+    queryset = Category.objects.all()
     serializer_class = CategorySerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description']
-    ordering_fields = ['name', 'id']
+    # Los contadores son columnas (con índice), no agregados sobre los productos
+    ordering_fields = ['name', 'id', 'product_count', 'stock_total']
     ordering = ['name']
 
     # Sobreescribimos el método post para añadir manejo de errores personalizado
@@ -42,19 +49,31 @@ class CategoryListCreateAPIView(generics.ListCreateAPIView):
 
 # Vista para una categoría específica (Obtener, Actualizar, Eliminar)
 # Permite:
-#   - GET request a /api/categorias/<id>/ : Obtiene los detalles de una categoría específica (con productos anidados)
+#   - GET request a /api/categorias/<id>/ : Obtiene los detalles de una categoría con el resumen de sus productos
+#     (número, stock total y rango de precios); los productos van en /api/categories/<id>/products/
 #   - PUT request a /api/categorias/<id>/ : Actualiza TODOS los campos de una categoría
 #   - PATCH request a /api/categorias/<id>/ : Actualiza ALGUNOS campos de una categoría
 #   - DELETE request a /api/categorias/<id>/ : Elimina una categoría
-class CategoryRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryRetrieveUpdateDestroyAPIView(CachedResponseMixin, SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Category.objects.all()
     lookup_field = 'pk'
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET':
+            # Rango de precios en la misma consulta; número de productos y stock total
+            # son contadores de la propia categoría
+            queryset = queryset.annotate(
+                price_min=Min('products__price'),
+                price_max=Max('products__price'),
+            )
+        return queryset
+
     # ¡ESTE ES EL MÉTODO CLAVE QUE DEBEMOS ASEGURARNOS QUE ESTÉ CORRECTO!
     # Sobreescribimos get_serializer_class para usar el serializador de detalle en GET
     # y el serializador básico para PUT/PATCH.
     def get_serializer_class(self):
-        # Si la petición es GET, usamos CategoryDetailSerializer para incluir los productos.
+        # Si la petición es GET, usamos CategoryDetailSerializer para incluir el resumen de productos.
         if self.request.method == 'GET':
             return CategoryDetailSerializer
         # Para PUT, PATCH, DELETE (y por defecto), usamos el serializador básico.
@@ -106,4 +125,16 @@ class CategoryRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView
         except NotFound:
             return Response({'detail': 'Category not found.'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            return Response({'detail': 'An unexpected error occurred.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({'detail': 'An unexpected error occurred.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# Productos de una categoría, paginados (GET /api/categories/<id>/products/).
+# Es el listado de productos de siempre (mismos filtros, búsqueda, ordenación, paginación,
+# ?fields= y caché) limitado a la categoría.
+class CategoryProductListAPIView(ProductListCreateAPIView):
+    http_method_names = ['get', 'head', 'options']
+
+    def get_queryset(self):
+        if not hasattr(self, 'category'):
+            self.category = get_object_or_404(Category.objects.only('pk'), pk=self.kwargs['category_pk'])
+        return super().get_queryset().filter(category=self.category)
@@ -1,13 +1,17 @@
-from rest_framework import generics, status, filters
+from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
-import csv
+from fenix.batch import FetchByIdsMixin
+from fenix.conditional import ConditionalGetMixin
+from fenix.exports import iter_keyset, stream_csv_response
+from fenix.lookup import LookupAPIView
+from fenix.search import FullTextSearchFilter, RankedOrderingFilter
+from fenix.sparse import SparseFieldsetMixin
 from .models import Customer
 from .serializers import CustomerSerializer
 
-class CustomerListCreateAPIView(generics.ListCreateAPIView):
+class CustomerListCreateAPIView(ConditionalGetMixin, FetchByIdsMixin, SparseFieldsetMixin, generics.ListCreateAPIView):
     """
     Vista de API para listar todos los clientes o crear uno nuevo.
     - GET /api/customers/ (Lista todos los clientes con filtros y búsqueda)
@@ -15,13 +19,16 @@ class CustomerListCreateAPIView(generics.ListCreateAPIView):
     
     Filtros disponibles:
     - ?search=nombre (busca en nombre y email)
-    - ?ordering=name,-created_at (ordena por campos)
+    - ?ordering=name,-created_at,-lifetime_value (ordena por campos)
+    - ?ids=3,1,2 (solo esos clientes, en ese orden y sin paginar; ver fenix/batch.py)
     """
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter]
     search_fields = ['name', 'email']
-    ordering_fields = ['name', 'email', 'created_at']
+    trigram_search_fields = ['name', 'email']
+    # Los contadores de pedidos son columnas mantenidas (con índice)
+    ordering_fields = ['name', 'email', 'created_at', 'order_count', 'lifetime_value', 'last_order_at']
     ordering = ['-created_at']  # Orden por defecto
     
     def create(self, request, *args, **kwargs):
@@ -31,7 +38,7 @@ class CustomerListCreateAPIView(generics.ListCreateAPIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class CustomerRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class CustomerRetrieveUpdateDestroyAPIView(ConditionalGetMixin, SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Vista de API para recuperar, actualizar o eliminar un cliente específico.
     - GET /api/customers/{id}/ (Obtiene los detalles de un cliente)
@@ -52,21 +59,27 @@ class CustomerRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class CustomerLookupAPIView(ConditionalGetMixin, LookupAPIView):
+    """
+    Lista compacta de clientes para desplegables: [id, nombre, email].
+    - GET /api/customers/lookup/ (todos los clientes, ordenados por nombre)
+    - ?q=jua (solo los que empiezan por "jua", sin distinguir mayúsculas)
+    - ?limit=20 (máximo de filas, para autocompletado)
+    """
+    queryset = Customer.objects.all()
+    lookup_columns = ('id', 'name', 'email')
+
 @api_view(['GET'])
 def export_customers_csv_api(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="clientes.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['ID', 'Nombre', 'Correo Electronico', 'Telefono', 'Fecha Registro'])
-
-    customers = Customer.objects.all().order_by('id')
-    for customer in customers:
-        writer.writerow([
+    header = ['ID', 'Nombre', 'Correo Electronico', 'Telefono', 'Fecha Registro']
+    rows = (
+        [
             customer.id,
             customer.name,
             customer.email,
             customer.phone,
             customer.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    return response
\ No newline at end of file
+        ]
+        for customer in iter_keyset(Customer.objects.all())
+    )
+    return stream_csv_response(request, 'clientes.csv', header, rows)
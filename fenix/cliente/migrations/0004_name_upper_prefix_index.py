@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# Índice para el filtro por prefijo de /api/customers/lookup/ (UPPER(name) LIKE 'TEXTO%').
+# Con text_pattern_ops PostgreSQL puede usarlo para LIKE con cualquier collation; se crea
+# con SQL directo porque es una expresión con operator class propia de PostgreSQL.
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS customers_name_upper_prefix ON customers (UPPER(name) text_pattern_ops)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS customers_name_upper_prefix')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cliente', '0003_customer_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
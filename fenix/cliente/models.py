@@ -1,4 +1,12 @@
+from decimal import Decimal
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from fenix.conditional import remember_loaded_name
+from fenix.search import refresh_search_vector
 
 # Modelo para Clientes
 class Customer(models.Model):
@@ -10,6 +18,17 @@ class Customer(models.Model):
     email = models.EmailField(max_length=100, unique=True, verbose_name="Correo Electrónico")
     phone = models.CharField(max_length=20, null=True, blank=True, verbose_name="Teléfono")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Registro")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de Actualización")
+    # Contadores mantenidos al escribir pedidos (ver compra/models.py); lifetime_value
+    # no incluye los pedidos cancelados. Se recalculan con: python manage.py rebuild_counters
+    order_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Número de Pedidos")
+    lifetime_value = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False, verbose_name="Total Comprado")
+    last_order_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Último Pedido")
+    # Columna de búsqueda de texto completo (PostgreSQL), se actualiza al guardar
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
+    # Campos (y peso) que alimentan search_vector
+    SEARCH_FIELDS = [('name', 'A'), ('email', 'B')]
 
     class Meta:
         db_table = 'customers'
@@ -17,7 +36,28 @@ class Customer(models.Model):
         verbose_name = "Cliente"
         indexes = [
             models.Index(fields=['email']),
+            # Ordenación del listado por los contadores
+            models.Index(fields=['order_count', 'id']),
+            models.Index(fields=['lifetime_value', 'id']),
+            models.Index(fields=['last_order_at', 'id']),
+            # Búsqueda: texto completo y trigramas sobre nombre y email
+            GinIndex(fields=['search_vector'], name='customers_search_gin'),
+            GinIndex(fields=['name'], name='customers_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['email'], name='customers_email_trgm', opclasses=['gin_trgm_ops']),
         ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Nombre con el que se cargó: los pedidos lo muestran (ver compra/models.py)
+        instance = super().from_db(db, field_names, values)
+        remember_loaded_name(instance)
+        return instance
+
+
+@receiver(post_save, sender=Customer)
+def update_customer_search_vector(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        refresh_search_vector(instance, Customer.SEARCH_FIELDS, update_fields)
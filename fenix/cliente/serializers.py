@@ -8,5 +8,5 @@ class CustomerSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Customer
-        fields = '__all__' # Incluye todos los campos del modelo
+        exclude = ('search_vector',) # Todos los campos del modelo salvo la columna interna de búsqueda
         read_only_fields = ('created_at',) # 'created_at' no se debe modificar en la creación/actualización
\ No newline at end of file
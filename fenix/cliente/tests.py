@@ -1,3 +1,59 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import Customer
+
+
+class CustomerSearchTest(TestCase):
+    """
+    Tests for the customer search (?search=).
+    Outside PostgreSQL the search backend falls back to DRF's icontains search.
+    """
+    def setUp(self):
+        Customer.objects.create(name="Juan Pérez", email="juan@example.com")
+        Customer.objects.create(name="Lucía Gómez", email="lucia@example.com")
+        self.url = reverse('cliente_api:customer-list-create')
+
+    def test_search_filters_by_name_and_email(self):
+        """Test that ?search= matches customers by name or email."""
+        response = self.client.get(self.url, {'search': 'juan'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        names = [customer['name'] for customer in response.json()['results']]
+        self.assertEqual(names, ["Juan Pérez"])
+
+        response = self.client.get(self.url, {'search': 'lucia@'}, HTTP_ACCEPT='application/json')
+        self.assertEqual([c['email'] for c in response.json()['results']], ["lucia@example.com"])
+
+    def test_search_vector_is_not_exposed(self):
+        """Test that the internal search column is not part of the API output."""
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertNotIn('search_vector', response.json()['results'][0])
+
+
+class CustomerLookupTest(TestCase):
+    """
+    Tests for the compact customer lookup (/api/customers/lookup/).
+    """
+    def setUp(self):
+        self.juan = Customer.objects.create(name="Juan Pérez", email="juan@example.com")
+        self.lucia = Customer.objects.create(name="Lucía Gómez", email="lucia@example.com")
+        self.url = reverse('cliente_api:customer-lookup')
+
+    def test_returns_tuples_filtered_by_prefix(self):
+        """Test that the lookup returns [id, name, email] rows and filters them with ?q=."""
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['fields'], ['id', 'name', 'email'])
+        self.assertEqual(response.json()['results'], [
+            [self.juan.pk, "Juan Pérez", "juan@example.com"],
+            [self.lucia.pk, "Lucía Gómez", "lucia@example.com"],
+        ])
+
+        response = self.client.get(self.url, {'q': 'luc'}, HTTP_ACCEPT='application/json')
+        self.assertEqual([row[0] for row in response.json()['results']], [self.lucia.pk])
+
+    def test_etag_revalidation(self):
+        """Test that a matching If-None-Match gets a 304 Not Modified."""
+        etag = self.client.get(self.url, HTTP_ACCEPT='application/json')['ETag']
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
@@ -1,5 +1,8 @@
 from django.urls import path
-from .api_views import CustomerListCreateAPIView, CustomerRetrieveUpdateDestroyAPIView, export_customers_csv_api
+from fenix.batch import FetchByIdsAPIView
+from .api_views import (
+    CustomerListCreateAPIView, CustomerRetrieveUpdateDestroyAPIView, CustomerLookupAPIView, export_customers_csv_api,
+)
 
 
 app_name = 'cliente_api' # Un namespace específico para las URLs de API de 'cliente'
@@ -8,6 +11,10 @@ urlpatterns = [
     # URLs para la API REST de clientes
     path('customers/', CustomerListCreateAPIView.as_view(), name='customer-list-create'),
     path('customers/<int:pk>/', CustomerRetrieveUpdateDestroyAPIView.as_view(), name='customer-detail'),
+    # Varios clientes por id (POST {"ids": [...]}, igual que GET /customers/?ids=...)
+    path('customers/by-ids/', FetchByIdsAPIView.as_view(list_view_class=CustomerListCreateAPIView), name='customer-by-ids'),
+    # Lista compacta (id, nombre, email) para desplegables
+    path('customers/lookup/', CustomerLookupAPIView.as_view(), name='customer-lookup'),
     # NUEVA URL para exportar clientes a CSV via API
     path('customers/export-csv/', export_customers_csv_api, name='customer-export-csv'),
 ]
\ No newline at end of file
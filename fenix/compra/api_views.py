@@ -2,10 +2,19 @@ from rest_framework import generics, status, filters
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
-import csv
-from .models import Order, OrderItem
-from .serializers import OrderSerializer, OrderItemSerializer
+from operator import itemgetter
+from django.db import transaction
+from django.db.models import Prefetch
+from fenix.batch import FetchByIdsMixin, parse_ids
+from fenix.compiled import CompiledListMixin
+from fenix.conditional import ConditionalGetMixin
+from fenix.exports import iter_keyset, stream_csv_response
+from fenix.pagination import FlexiblePagination
+from fenix.sparse import SparseFieldsetMixin
+from rest_framework.exceptions import ValidationError
+from .models import ORDER_CANCELLED, Order, OrderItem, transition_orders
+from prenda.models import change_stock
+from .serializers import OrderSerializer, OrderItemSerializer, CompiledOrderSerializer
 from django_filters import rest_framework as django_filters
 
 class OrderFilter(django_filters.FilterSet):
@@ -22,11 +31,12 @@ class OrderFilter(django_filters.FilterSet):
             'status': ['exact'],
         }
 
-class OrderListCreateAPIView(generics.ListCreateAPIView):
+class OrderListCreateAPIView(ConditionalGetMixin, FetchByIdsMixin, CompiledListMixin, generics.ListCreateAPIView):
     """
     Vista para listar todos los pedidos o crear uno nuevo.
     - GET /api/orders/ (Lista todos los pedidos con filtros)
-    - POST /api/orders/ (Crea un nuevo pedido con items anidados)
+    - POST /api/orders/ (Crea un nuevo pedido con items anidados y reserva su stock;
+      400 con todas las líneas sin stock suficiente)
     
     Filtros disponibles:
     - ?customer=1 (filtra por cliente)
@@ -34,9 +44,15 @@ class OrderListCreateAPIView(generics.ListCreateAPIView):
     - ?order_date_from=2023-01-01&order_date_to=2023-12-31 (rango de fechas)
     - ?total_min=100&total_max=500 (rango de totales)
     - ?ordering=-order_date (ordena por campos)
+    - ?ids=3,1,2 (solo esos pedidos, en ese orden y sin paginar; ver fenix/batch.py)
+    - ?serializer=compiled (listado con el serializador compilado, ver fenix/compiled.py)
     """
-    queryset = Order.objects.all().select_related('customer').prefetch_related('items__product')
+    queryset = Order.objects.all().select_related('customer').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('pk'))
+    )
     serializer_class = OrderSerializer
+    compiled_serializer_class = CompiledOrderSerializer
+    pagination_class = FlexiblePagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_class = OrderFilter
     ordering_fields = ['order_date', 'total_amount']
@@ -49,15 +65,17 @@ class OrderListCreateAPIView(generics.ListCreateAPIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class OrderRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class OrderRetrieveUpdateDestroyAPIView(ConditionalGetMixin, SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Vista para recuperar, actualizar o eliminar un pedido específico.
     - GET /api/orders/{id}/ (Obtiene los detalles de un pedido)
     - PUT /api/orders/{id}/ (Actualiza un pedido completo)
-    - PATCH /api/orders/{id}/ (Actualiza parcialmente un pedido)
-    - DELETE /api/orders/{id}/ (Elimina un pedido)
+    - PATCH /api/orders/{id}/ (Actualiza parcialmente un pedido; status=CANCELADO devuelve el stock)
+    - DELETE /api/orders/{id}/ (Elimina un pedido y, si no estaba cancelado, devuelve su stock)
     """
-    queryset = Order.objects.all().select_related('customer').prefetch_related('items__product')
+    queryset = Order.objects.all().select_related('customer').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('pk'))
+    )
     serializer_class = OrderSerializer
     lookup_field = 'pk'
     
@@ -70,18 +88,20 @@ class OrderRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class OrderItemListCreateAPIView(generics.ListCreateAPIView):
+class OrderItemListCreateAPIView(SparseFieldsetMixin, generics.ListCreateAPIView):
     """
     Vista opcional para gestionar OrderItems individualmente.
     Filtros por pedido: ?order=1
+    Crear, cambiar o borrar una línea reserva o devuelve su stock (salvo en pedidos cancelados).
     """
     queryset = OrderItem.objects.all().select_related('order', 'product')
     serializer_class = OrderItemSerializer
+    pagination_class = FlexiblePagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['order', 'product']
     ordering = ['id']
 
-class OrderItemRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class OrderItemRetrieveUpdateDestroyAPIView(SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Vista opcional para gestionar un OrderItem específico.
     """
@@ -89,41 +109,55 @@ class OrderItemRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIVie
     serializer_class = OrderItemSerializer
     lookup_field = 'pk'
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Con el pedido bloqueado: la línea de un pedido cancelado ya no tiene stock reservado
+            order = Order.objects.select_for_update().get(pk=instance.order_id)
+            item = OrderItem.objects.select_for_update().get(pk=instance.pk)
+            if order.status != ORDER_CANCELLED:
+                change_stock({item.product_id: item.quantity})
+            item.delete()
+
 @api_view(['GET'])
 def export_orders_csv_api(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="pedidos.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['ID Pedido', 'ID Cliente', 'Nombre Cliente', 'Fecha Pedido'])
-
-    orders = Order.objects.all().order_by('id')
-    for order in orders:
-        customer_name = order.customer.name if order.customer else ''
-        writer.writerow([
-            order.id,
-            order.customer.id,
-            customer_name,
-            order.order_date.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    return response
+    # Solo las columnas necesarias, con el nombre del cliente resuelto por JOIN
+    # (sin una consulta extra por pedido).
+    header = ['ID Pedido', 'ID Cliente', 'Nombre Cliente', 'Fecha Pedido']
+    orders = Order.objects.values_list('id', 'customer_id', 'customer__name', 'order_date')
+    rows = (
+        [order_id, customer_id, customer_name or '', order_date.strftime('%Y-%m-%d %H:%M:%S')]
+        for order_id, customer_id, customer_name, order_date in iter_keyset(orders, key=itemgetter(0))
+    )
+    return stream_csv_response(request, 'pedidos.csv', header, rows)
 
 @api_view(['GET'])
 def export_order_items_csv_api(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="articulos_pedido.csv"'
+    # Igual que en pedidos: el nombre del producto llega por JOIN en la misma consulta.
+    header = ['ID Item', 'ID Pedido', 'ID Producto', 'Nombre Producto', 'Cantidad']
+    order_items = OrderItem.objects.values_list('id', 'order_id', 'product_id', 'product__name', 'quantity')
+    rows = (
+        [item_id, order_id, product_id, product_name or '', quantity]
+        for item_id, order_id, product_id, product_name, quantity in iter_keyset(order_items, key=itemgetter(0))
+    )
+    return stream_csv_response(request, 'articulos_pedido.csv', header, rows)
 
-    writer = csv.writer(response)
-    writer.writerow(['ID Item', 'ID Pedido', 'ID Producto', 'Nombre Producto', 'Cantidad'])
-
-    order_items = OrderItem.objects.all().order_by('id')
-    for item in order_items:
-        product_name = item.product.name if item.product else ''
-        writer.writerow([
-            item.id,
-            item.order.id,
-            item.product.id,
-            product_name,
-            item.quantity
-        ])
-    return response
\ No newline at end of file
+@api_view(['POST'])
+def order_transition_api(request):
+    """
+    Cambia el estado de varios pedidos a la vez (ver ORDER_TRANSITIONS en compra/models.py).
+    POST /api/orders/transition/  {"ids": [3, 1, 2], "status": "ENVIADO"}
+    Los pedidos que admiten la transición se actualizan con un único UPDATE; el resto se
+    devuelve con su error. Cancelar devuelve el stock de todos los pedidos a la vez.
+    Respuesta: {"status": ..., "updated": 2, "results": [{"id", "ok", "from", "status", "error"?}]}
+    """
+    data = request.data if isinstance(request.data, dict) else {}
+    ids = parse_ids(data.get('ids'))
+    target = data.get('status')
+    if target not in dict(Order.STATUS_CHOICES):
+        raise ValidationError({'status': [f'Estado no válido. Opciones: {", ".join(dict(Order.STATUS_CHOICES))}.']})
+    results = transition_orders(ids, target)
+    return Response({
+        'status': target,
+        'updated': sum(1 for result in results if result['ok'] and result['from'] != target),
+        'results': results,
+    })
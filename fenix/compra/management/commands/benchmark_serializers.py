@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from compra.models import Order, OrderItem
+from compra.serializers import CompiledOrderSerializer, OrderSerializer
+from prenda.models import Product
+from prenda.serializers import CompiledProductListSerializer, ProductListSerializer
+from usuarias.models import Usuaria
+from usuarias.serializers import CompiledUsuariaListSerializer, UsuariaListSerializer
+
+
+class Command(BaseCommand):
+    """
+    Compara filas/segundo de los serializadores de listado de siempre frente a los
+    compilados (fenix/compiled.py), incluyendo la consulta, y comprueba que el JSON
+    generado es idéntico byte a byte.
+
+    Uso: python manage.py benchmark_serializers [--rows 20] [--repeat 200]
+    """
+    help = 'Mide los serializadores de listado compilados frente a los ModelSerializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20, help='Filas por "página" (20 = PAGE_SIZE)')
+        parser.add_argument('--repeat', type=int, default=200, help='Repeticiones de cada medición')
+
+    def handle(self, *args, **options):
+        rows, repeat = max(options['rows'], 1), max(options['repeat'], 1)
+        request = Request(APIRequestFactory().get('/api/'))
+        context = {'request': request}
+
+        cases = [
+            ('productos', Product.objects.select_related('category').order_by('pk'),
+             ProductListSerializer, CompiledProductListSerializer),
+            ('usuarias', Usuaria.objects.order_by('pk'),
+             UsuariaListSerializer, CompiledUsuariaListSerializer),
+            ('pedidos', Order.objects.select_related('customer').prefetch_related(
+                Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('pk'))
+            ).order_by('pk'), OrderSerializer, CompiledOrderSerializer),
+        ]
+
+        for label, queryset, serializer_class, compiled_class in cases:
+            page = queryset[:rows]
+            count = len(page)
+            if not count:
+                self.stdout.write(f"{label}: sin datos, se omite.")
+                continue
+
+            def classic():
+                return serializer_class(list(page.all()), many=True, context=context).data
+
+            def compiled():
+                serializer = compiled_class(context)
+                return serializer.serialize(serializer.values(page.all()))
+
+            renderer = JSONRenderer()
+            identical = renderer.render(classic()) == renderer.render(compiled())
+            classic_rate = count * repeat / self._time(classic, repeat)
+            compiled_rate = count * repeat / self._time(compiled, repeat)
+
+            style = self.style.SUCCESS if identical else self.style.ERROR
+            self.stdout.write(
+                f"{label}: {count} filas x {repeat} | ModelSerializer {classic_rate:,.0f} filas/s | "
+                f"compilado {compiled_rate:,.0f} filas/s | x{compiled_rate / classic_rate:.2f} | "
+                + style('JSON idéntico' if identical else 'JSON DISTINTO')
+            )
+
+    def _time(self, func, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return time.perf_counter() - start
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from categoría.models import Category
+from cliente.models import Customer
+from compra.models import refresh_customer_counters
+from prenda.models import refresh_category_counters
+
+# (nombre, modelo, función que recalcula los contadores de una lista de ids)
+COUNTERS = [
+    ('categories', Category, refresh_category_counters),
+    ('customers', Customer, refresh_customer_counters),
+]
+
+
+class Command(BaseCommand):
+    """
+    Recalcula los contadores mantenidos a partir de los datos:
+    Category.product_count / stock_total y Customer.order_count / lifetime_value / last_order_at.
+    Cada lote es un único UPDATE con subconsultas agregadas (sin recorrer filas en Python).
+    Solo hace falta tras cargas o cambios hechos fuera de la aplicación (SQL directo, loaddata...).
+
+    Uso: python manage.py rebuild_counters [--only categories|customers] [--batch-size 1000]
+    """
+    help = 'Recalcula los contadores de categorías y clientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=[name for name, _, _ in COUNTERS], help='Solo estos contadores')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por UPDATE')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        for name, model, refresh in COUNTERS:
+            if options['only'] and options['only'] != name:
+                continue
+            ids = list(model.objects.order_by('pk').values_list('pk', flat=True))
+            updated = 0
+            for start in range(0, len(ids), batch_size):
+                with transaction.atomic():
+                    updated += refresh(ids[start:start + batch_size])
+            self.stdout.write(self.style.SUCCESS(f"{name}: {updated} filas recalculadas."))
@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from compra.models import Order, order_line_total, recalculate_order_totals
+
+
+class Command(BaseCommand):
+    """
+    Verifica que Order.total_amount coincide con la suma de sus líneas.
+    Sin --fix solo informa; con --fix recalcula los pedidos descuadrados por lotes.
+
+    Uso: python manage.py reconcile_order_totals [--fix] [--batch-size 1000]
+    """
+    help = 'Verifica (y opcionalmente corrige) los totales de los pedidos en bloque'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Corrige los totales descuadrados')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Pedidos por UPDATE al corregir')
+
+    def handle(self, *args, **options):
+        mismatched = (
+            Order.objects.annotate(
+                computed_total=Coalesce(
+                    Sum(order_line_total('items__'), output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+                    Value(Decimal('0.00')),
+                    output_field=models.DecimalField(max_digits=10, decimal_places=2),
+                )
+            )
+            .exclude(total_amount=F('computed_total'))
+            .order_by('pk')
+            .values_list('pk', 'total_amount', 'computed_total')
+        )
+
+        order_ids = []
+        for pk, stored, computed in mismatched.iterator():
+            order_ids.append(pk)
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Pedido #{pk}: guardado {stored} / calculado {computed}")
+
+        if not order_ids:
+            self.stdout.write(self.style.SUCCESS('Todos los totales de pedidos son correctos.'))
+            return
+
+        self.stdout.write(self.style.WARNING(f"{len(order_ids)} pedidos con el total descuadrado."))
+        if not options['fix']:
+            self.stdout.write('Ejecuta de nuevo con --fix para corregirlos.')
+            return
+
+        batch_size = max(options['batch_size'], 1)
+        fixed = 0
+        for start in range(0, len(order_ids), batch_size):
+            with transaction.atomic():
+                fixed += recalculate_order_totals(order_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f"{fixed} pedidos corregidos."))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cliente', '0001_initial'),
+        ('compra', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_date', 'id'], name='compra_orde_order_d_0c7662_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['total_amount', 'id'], name='compra_orde_total_a_995e62_idx'),
+        ),
+    ]
@@ -1,9 +1,16 @@
 # compra/models.py
-from django.db import models
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.urls import reverse # ¡Asegúrate de que esta línea esté presente!
+from fenix.conditional import name_changed
 from decimal import Decimal
 from cliente.models import Customer
-from prenda.models import Product
+from prenda.models import InsufficientStock, Product, change_stock
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -18,16 +25,38 @@ class Order(models.Model):
     order_date = models.DateTimeField(auto_now_add=True, verbose_name="Fecha del Pedido")
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), verbose_name="Cantidad Total")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDIENTE', verbose_name="Estado")
+    # Se actualiza también cuando cambian sus líneas (ver _apply_total_delta / recalculate_order_totals)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de Actualización")
 
     class Meta:
         verbose_name = "Pedido"
         verbose_name_plural = "Pedidos"
         ordering = ['-order_date'] # Ordenar por fecha del pedido descendente
+        # Índices compuestos (campo, id) para la paginación por cursor estable
+        indexes = [
+            models.Index(fields=['order_date', 'id']),
+            models.Index(fields=['total_amount', 'id']),
+        ]
 
     def __str__(self):
         # Utiliza self.pk para el ID del pedido y self.customer.name para el nombre del cliente
         return f"Pedido #{self.pk} - Cliente: {self.customer.name} ({self.order_date.strftime('%Y-%m-%d')})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Cliente, estado e importe con los que se cargó el pedido, para aplicar solo
+        # la diferencia a los contadores del cliente cuando se guarde
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_counters()
+        return instance
+
+    def _remember_loaded_counters(self):
+        loaded = self.__dict__
+        if all(name in loaded for name in ('customer_id', 'status', 'total_amount')):
+            self._loaded_counters = (self.customer_id, self.status, self.total_amount)
+        else:
+            self._loaded_counters = None
+
     # API-only implementation - no HTML redirects needed
     # def get_absolute_url(self):
     #     return reverse('compra:order_detail', kwargs={'pk': self.pk})
@@ -46,22 +75,369 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.product.name} (Pedido #{self.order.pk})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Guardamos el pedido y el subtotal con los que se cargó la línea para
+        # poder aplicar solo la diferencia al total del pedido cuando se guarde.
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_total()
+        return instance
+
+    def _remember_loaded_total(self):
+        loaded = self.__dict__
+        if all(name in loaded for name in ('order_id', 'quantity', 'price')):
+            self._loaded_total = (self.order_id, self.quantity * self.price)
+        else:
+            self._loaded_total = None
+
     @property
     def get_total(self):
         return self.quantity * self.price
 
+
+# --- Mantenimiento del total de los pedidos ---
+# ORDER_TOTALS_MODE (settings) decide cómo se mantiene Order.total_amount:
+#   - 'incremental': cada escritura de un OrderItem aplica solo la diferencia con un
+#     UPDATE atómico (total_amount = total_amount + delta), sin releer las líneas.
+#   - 'on_commit': los pedidos afectados se recalculan una sola vez al confirmar la transacción.
+ORDER_TOTALS_INCREMENTAL = 'incremental'
+ORDER_TOTALS_ON_COMMIT = 'on_commit'
+
+_pending_totals = threading.local()
+
+
+def get_order_totals_mode():
+    return getattr(settings, 'ORDER_TOTALS_MODE', ORDER_TOTALS_INCREMENTAL)
+
+
+def order_line_total(prefix=''):
+    """
+    Expresión SQL del subtotal de una línea (cantidad x precio unitario).
+    Desde Order se usa con prefix='items__'.
+    """
+    return ExpressionWrapper(
+        F(f'{prefix}quantity') * F(f'{prefix}price'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def recalculate_order_totals(order_ids=None):
+    """
+    Recalcula total_amount a partir de sus líneas con un único UPDATE.
+    Si no se indican pedidos, recalcula todos. Devuelve el número de pedidos actualizados.
+    """
+    line_totals = (
+        OrderItem.objects.filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total=Sum(order_line_total()))
+        .values('total')
+    )
+    orders = Order.objects.all()
+    if order_ids is not None:
+        orders = orders.filter(pk__in=list(order_ids))
+    updated = orders.update(
+        total_amount=Coalesce(
+            Subquery(line_totals),
+            Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        ),
+        updated_at=timezone.now(),
+    )
+    refresh_customer_counters(None if order_ids is None else set(orders.values_list('customer_id', flat=True)))
+    return updated
+
+
+# --- Contadores del cliente (Customer.order_count / lifetime_value / last_order_at) ---
+# Crear un pedido o cambiar su importe aplica la diferencia con un UPDATE atómico
+# (order_count = order_count + 1, ...). Borrarlo o cambiarlo de cliente recalcula los
+# clientes afectados, porque last_order_at no se puede "restar".
+ORDER_CANCELLED = 'CANCELADO'
+
+
+def counted_amount(status, total_amount):
+    """Lo que suma un pedido al total comprado por el cliente (los cancelados no cuentan)."""
+    if status == ORDER_CANCELLED:
+        return Decimal('0.00')
+    return total_amount or Decimal('0.00')
+
+
+def apply_customer_delta(customer_id, orders=0, amount=0, order_date=None):
+    """Suma (o resta) pedidos e importe a los contadores de un cliente y registra la fecha del pedido."""
+    changes = {}
+    if orders:
+        changes['order_count'] = F('order_count') + orders
+    if amount:
+        changes['lifetime_value'] = F('lifetime_value') + amount
+    if order_date is not None:
+        changes['last_order_at'] = Case(
+            When(last_order_at__gte=order_date, then=F('last_order_at')),
+            default=Value(order_date),
+        )
+    if customer_id is None or not changes:
+        return
+    Customer.objects.filter(pk=customer_id).update(updated_at=timezone.now(), **changes)
+
+
+def refresh_customer_counters(customer_ids=None):
+    """
+    Recalcula los contadores a partir de los pedidos con un único UPDATE.
+    Si no se indican clientes, recalcula todos. Devuelve el número de clientes actualizados.
+    """
+    orders = Order.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+    customers = Customer.objects.all()
+    if customer_ids is not None:
+        customers = customers.filter(pk__in=customer_ids)
+    return customers.update(
+        order_count=Coalesce(Subquery(orders.annotate(count=Count('pk')).values('count')), 0),
+        lifetime_value=Coalesce(
+            Subquery(orders.exclude(status=ORDER_CANCELLED).annotate(total=Sum('total_amount')).values('total')),
+            Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        last_order_at=Subquery(orders.annotate(last=Max('order_date')).values('last')),
+        updated_at=timezone.now(),
+    )
+
+
+@contextmanager
+def order_totals_suspended():
+    """
+    Desactiva temporalmente el mantenimiento automático de totales en este hilo.
+    Lo usan las escrituras en bloque, que fijan el total del pedido una sola vez al final.
+    """
+    previous = getattr(_pending_totals, 'suspended', False)
+    _pending_totals.suspended = True
+    try:
+        yield
+    finally:
+        _pending_totals.suspended = previous
+
+
+def _totals_suspended():
+    return getattr(_pending_totals, 'suspended', False)
+
+
+def _apply_total_delta(instance, order_id, delta):
+    if not delta:
+        return
+    Order.objects.filter(pk=order_id).update(total_amount=F('total_amount') + delta, updated_at=timezone.now())
+    # El total comprado por el cliente cambia igual (si el pedido no está cancelado)
+    Customer.objects.filter(
+        pk__in=Order.objects.filter(pk=order_id).exclude(status=ORDER_CANCELLED).values('customer_id')
+    ).update(lifetime_value=F('lifetime_value') + delta, updated_at=timezone.now())
+    # Mantenemos coherente el pedido en memoria (p. ej. el que devuelve el serializer)
+    if OrderItem.order.is_cached(instance) and instance.order is not None and instance.order.pk == order_id:
+        order = instance.order
+        order.total_amount = (order.total_amount or Decimal('0.00')) + delta
+        loaded = getattr(order, '_loaded_counters', None)
+        if loaded is not None:
+            order._loaded_counters = (loaded[0], loaded[1], (loaded[2] or Decimal('0.00')) + delta)
+
+
+class _PendingRecalculation:
+    """
+    Pedidos que se recalculan al confirmar. Se registra con transaction.on_commit, así
+    que si la transacción o el savepoint en que se registró se deshace, Django lo
+    descarta junto con sus ids.
+    """
+    def __init__(self):
+        self.order_ids = set()
+        self.orders = []
+
+    def __call__(self):
+        recalculate_order_totals(self.order_ids)
+        # Mantenemos coherentes los pedidos en memoria (p. ej. el que devuelve el serializer)
+        totals = dict(Order.objects.filter(pk__in=self.order_ids).values_list('pk', 'total_amount'))
+        for order in self.orders:
+            if order.pk in totals:
+                order.total_amount = totals[order.pk]
+                order._remember_loaded_counters()
+
+
+def _schedule_recalculation(instance, *order_ids):
+    # Los ids se acumulan en el recálculo ya registrado en la transacción (o savepoint)
+    # actual; si no lo hay (la anterior se confirmó o se deshizo) se registra uno nuevo.
+    connection = transaction.get_connection()
+    savepoint_ids = set(connection.savepoint_ids)
+    pending = next((
+        func for callback_savepoints, func, _ in reversed(connection.run_on_commit)
+        if isinstance(func, _PendingRecalculation) and callback_savepoints == savepoint_ids
+    ), None)
+    registered = pending is not None
+    if not registered:
+        pending = _PendingRecalculation()
+    pending.order_ids.update(order_id for order_id in order_ids if order_id is not None)
+    if OrderItem.order.is_cached(instance) and instance.order is not None:
+        pending.orders.append(instance.order)
+    if not registered:
+        transaction.on_commit(pending)
+
+
+# --- Cambios de estado ---
+# Estados a los que puede pasar un pedido desde cada estado. Un pedido se puede cancelar
+# mientras no se ha enviado; cancelarlo devuelve su stock y reactivarlo (volver a
+# PENDIENTE) lo reserva de nuevo. COMPLETADO es definitivo.
+ORDER_TRANSITIONS = {
+    'PENDIENTE': ('PROCESANDO', 'ENVIADO', 'COMPLETADO', ORDER_CANCELLED),
+    'PROCESANDO': ('PENDIENTE', 'ENVIADO', 'COMPLETADO', ORDER_CANCELLED),
+    'ENVIADO': ('COMPLETADO',),
+    'COMPLETADO': (),
+    ORDER_CANCELLED: ('PENDIENTE',),
+}
+
+
+def can_transition(current, target):
+    return current == target or target in ORDER_TRANSITIONS.get(current, ())
+
+
+def transition_orders(order_ids, target):
+    """
+    Lleva los pedidos al estado `target` con un único UPDATE (status y updated_at) sobre
+    los que admiten la transición. Los pedidos se bloquean en orden de id mientras tanto.
+    Al cancelar se devuelve el stock de todos los pedidos con un solo change_stock; al
+    reactivar se reserva pedido a pedido y los que no tienen stock se quedan como estaban.
+    Devuelve [{id, ok, from, status[, error]}] en el orden de order_ids.
+    """
+    with transaction.atomic():
+        current = {
+            pk: (status, customer_id)
+            for pk, status, customer_id in Order.objects.select_for_update()
+            .filter(pk__in=order_ids).order_by('pk').values_list('pk', 'status', 'customer_id')
+        }
+        errors, moving = {}, []
+        for pk in order_ids:
+            if pk not in current:
+                errors[pk] = 'El pedido no existe.'
+            elif not can_transition(current[pk][0], target):
+                errors[pk] = f'No se puede pasar de {current[pk][0]} a {target}.'
+            elif current[pk][0] != target:
+                moving.append(pk)
+
+        reactivated = [pk for pk in moving if current[pk][0] == ORDER_CANCELLED]
+        cancelled = moving if target == ORDER_CANCELLED else []
+        if cancelled:
+            returned = OrderItem.objects.filter(order__in=cancelled).values('product').annotate(total=Sum('quantity'))
+            change_stock({row['product']: row['total'] for row in returned})
+        if reactivated:
+            quantities = {}
+            for order_id, product_id, quantity in OrderItem.objects.filter(order__in=reactivated).values_list('order', 'product', 'quantity'):
+                quantities.setdefault(order_id, {})[product_id] = -quantity
+            for pk in sorted(reactivated):
+                try:
+                    change_stock(quantities.get(pk, {}))
+                except InsufficientStock as exc:
+                    errors[pk] = 'Stock insuficiente. ' + ', '.join(
+                        f'Producto {product_id}: quedan {available}' for product_id, available in exc.shortages.items()
+                    ) + '.'
+                    moving.remove(pk)
+
+        if moving:
+            Order.objects.filter(pk__in=moving).update(status=target, updated_at=timezone.now())
+            # Entrar o salir de CANCELADO cambia el total comprado por los clientes
+            if cancelled or reactivated:
+                refresh_customer_counters({current[pk][1] for pk in moving})
+
+    results = []
+    for pk in order_ids:
+        previous = current[pk][0] if pk in current else None
+        if pk in errors:
+            results.append({'id': pk, 'ok': False, 'from': previous, 'status': previous, 'error': errors[pk]})
+        else:
+            results.append({'id': pk, 'ok': True, 'from': previous, 'status': target})
+    return results
+
+
 # Importaciones para las señales
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 
 # Señal para actualizar el total del pedido cuando un OrderItem se guarda/crea
 @receiver(post_save, sender=OrderItem)
-def update_order_total_on_save(sender, instance, **kwargs):
-    instance.order.total_amount = sum(item.get_total for item in instance.order.items.all())
-    instance.order.save()
+def update_order_total_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_loaded_total', None)
+    instance._remember_loaded_total()
+    if _totals_suspended():
+        return
+
+    if get_order_totals_mode() == ORDER_TOTALS_ON_COMMIT:
+        _schedule_recalculation(instance, instance.order_id, previous[0] if previous else None)
+        return
+
+    if not created and previous is None:
+        # No sabemos con qué valores se cargó la línea: recalculamos ese pedido.
+        recalculate_order_totals([instance.order_id])
+        return
+
+    new_total = instance.quantity * instance.price
+    if previous is None:
+        _apply_total_delta(instance, instance.order_id, new_total)
+    elif previous[0] != instance.order_id:
+        # La línea cambió de pedido: se descuenta del anterior y se suma al nuevo
+        _apply_total_delta(instance, previous[0], -previous[1])
+        _apply_total_delta(instance, instance.order_id, new_total)
+    else:
+        _apply_total_delta(instance, instance.order_id, new_total - previous[1])
 
 # Señal para actualizar el total del pedido cuando un OrderItem se elimina
 @receiver(post_delete, sender=OrderItem)
 def update_order_total_on_delete(sender, instance, **kwargs):
-    instance.order.total_amount = sum(item.get_total for item in instance.order.items.all())
-    instance.order.save()
\ No newline at end of file
+    if _totals_suspended():
+        return
+
+    if get_order_totals_mode() == ORDER_TOTALS_ON_COMMIT:
+        _schedule_recalculation(instance, instance.order_id)
+        return
+
+    previous = getattr(instance, '_loaded_total', None)
+    if previous is None:
+        _apply_total_delta(instance, instance.order_id, -(instance.quantity * instance.price))
+    else:
+        _apply_total_delta(instance, previous[0], -previous[1])
+
+
+@receiver(post_save, sender=Order)
+def update_customer_counters_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'customer', 'customer_id', 'status', 'total_amount'} & set(update_fields)):
+        return
+    previous = getattr(instance, '_loaded_counters', None)
+    instance._remember_loaded_counters()
+    amount = counted_amount(instance.status, instance.total_amount)
+
+    if created:
+        apply_customer_delta(instance.customer_id, 1, amount, instance.order_date)
+    elif previous is None:
+        # No sabemos con qué valores se cargó el pedido: recalculamos su cliente
+        refresh_customer_counters([instance.customer_id])
+    elif previous[0] != instance.customer_id:
+        refresh_customer_counters([previous[0], instance.customer_id])
+    else:
+        apply_customer_delta(instance.customer_id, amount=amount - counted_amount(previous[1], previous[2]))
+
+
+# Al borrar un pedido (también en cascada al borrar su cliente) se devuelve el stock de
+# sus líneas, salvo si estaba cancelado (ya se devolvió al cancelarlo)
+@receiver(pre_delete, sender=Order)
+def return_stock_on_order_delete(sender, instance, **kwargs):
+    if not Order.objects.select_for_update().filter(pk=instance.pk).exclude(status=ORDER_CANCELLED).exists():
+        return
+    quantities = OrderItem.objects.filter(order=instance).values('product_id').annotate(quantity=Sum('quantity'))
+    change_stock({row['product_id']: row['quantity'] for row in quantities})
+
+
+@receiver(post_delete, sender=Order)
+def update_customer_counters_on_delete(sender, instance, **kwargs):
+    refresh_customer_counters([instance.customer_id])
+
+
+# Los pedidos muestran el nombre del cliente y el de los productos de sus líneas: al
+# cambiar uno de ellos se marcan como modificados para que su ETag cambie (ver fenix/conditional.py)
+@receiver(post_save, sender=Customer)
+def touch_orders_on_customer_rename(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not raw and name_changed(instance, created, update_fields):
+        Order.objects.filter(customer=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Product)
+def touch_orders_on_product_rename(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not raw and name_changed(instance, created, update_fields):
+        Order.objects.filter(items__product=instance).update(updated_at=timezone.now())
@@ -1,9 +1,12 @@
 # compra/serializers.py
 from rest_framework import serializers
+from decimal import Decimal
 from django.db import transaction # Importamos transaction para asegurar la integridad de los datos
-from .models import Order, OrderItem
+from django.db.models import Prefetch, prefetch_related_objects
+from fenix.compiled import CompiledSerializer
+from .models import ORDER_CANCELLED, Order, OrderItem, can_transition, order_totals_suspended
 from cliente.models import Customer
-from prenda.models import Product
+from prenda.models import InsufficientStock, Product, change_stock
 
 # Serializador para Product (uso general y anidado si es necesario)
 class ProductSerializer(serializers.ModelSerializer):
@@ -11,8 +14,37 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['id', 'name', 'price', 'description'] # O los campos que desees mostrar del Product
 
+
+class StockReservationMixin:
+    """
+    Reserva y devuelve el stock de las líneas de los pedidos (ver prenda.models.change_stock).
+    Los pedidos cancelados no tienen stock reservado.
+    """
+    # Campo en el que se informa la falta de stock
+    stock_error_field = 'items'
+
+    @staticmethod
+    def _quantities(items):
+        return {item.product_id: item.quantity for item in items}
+
+    def _change_stock(self, reserved, wanted):
+        """Reserva o devuelve la diferencia entre las cantidades reservadas y las pedidas."""
+        deltas = {
+            product_id: reserved.get(product_id, 0) - wanted.get(product_id, 0)
+            for product_id in set(reserved) | set(wanted)
+        }
+        try:
+            change_stock(deltas)
+        except InsufficientStock as exc:
+            raise serializers.ValidationError({self.stock_error_field: [
+                "Stock insuficiente. " + ', '.join(
+                    f"Producto {product_id}: quedan {available}" for product_id, available in exc.shortages.items()
+                ) + "."
+            ]})
+
+
 # Serializador para OrderItem (uso individual en endpoint, ej: /api/order-items/)
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(StockReservationMixin, serializers.ModelSerializer):
     # Para la entrada (POST/PUT/PATCH), acepta solo el ID del producto.
     # write_only=True significa que este campo solo se usa para la entrada de datos,
     # no se incluirá en la respuesta serializada.
@@ -32,6 +64,105 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'order', 'product', 'quantity', 'product_details']
         read_only_fields = ('id', 'product_details',)
 
+    stock_error_field = 'quantity'
+
+    # Las líneas sueltas reservan y devuelven stock igual que las de OrderSerializer,
+    # con el pedido bloqueado para leer su estado (un pedido cancelado no reserva)
+    def create(self, validated_data):
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(pk=validated_data['order'].pk)
+            validated_data.setdefault('price', validated_data['product'].price)
+            item = OrderItem(**validated_data)
+            self._change_stock({}, self._quantities([item]) if order.status != ORDER_CANCELLED else {})
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            order_ids = {instance.order_id, validated_data.get('order', instance.order).pk}
+            active = set(
+                Order.objects.select_for_update().filter(pk__in=order_ids).exclude(status=ORDER_CANCELLED)
+                .order_by('pk').values_list('pk', flat=True)
+            )
+            locked = OrderItem.objects.select_for_update().get(pk=instance.pk)
+            instance.order_id, instance.product_id, instance.quantity, instance.price = (
+                locked.order_id, locked.product_id, locked.quantity, locked.price
+            )
+            instance._loaded_total = locked._loaded_total
+            new_item = OrderItem(**{
+                'order': validated_data.get('order', instance.order),
+                'product': validated_data.get('product', instance.product),
+                'quantity': validated_data.get('quantity', instance.quantity),
+            })
+            self._change_stock(
+                self._quantities([locked]) if locked.order_id in active else {},
+                self._quantities([new_item]) if new_item.order_id in active else {},
+            )
+            return super().update(instance, validated_data)
+
+
+class BatchedProductField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField que, dentro de una lista de líneas, toma el producto
+    de los ya resueltos por NestedOrderItemListSerializer en vez de hacer un SELECT propio.
+    """
+    def to_internal_value(self, data):
+        list_serializer = getattr(self.parent, 'parent', None)
+        resolved = getattr(list_serializer, '_resolved_products', None)
+        if resolved is not None:
+            product = resolved.get(_as_product_id(data))
+            if product is not None:
+                return product
+        return super().to_internal_value(data)
+
+
+def _as_product_id(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class NestedOrderItemListSerializer(serializers.ListSerializer):
+    """
+    Valida todas las líneas de un pedido de una vez: resuelve los productos con una
+    única consulta (id__in), informa de todos los IDs inexistentes juntos y rechaza
+    productos repetidos antes de llegar al unique_together de la base de datos.
+    """
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self._resolved_products = self._resolve_products(data)
+        return super().to_internal_value(data)
+
+    def _resolve_products(self, data):
+        product_ids = [
+            _as_product_id(item.get('product')) for item in data if isinstance(item, dict)
+        ]
+        product_ids = [product_id for product_id in product_ids if product_id is not None]
+
+        seen, duplicated = set(), []
+        for product_id in product_ids:
+            if product_id in seen and product_id not in duplicated:
+                duplicated.append(product_id)
+            seen.add(product_id)
+
+        queryset = self.child.fields['product'].get_queryset()
+        products = queryset.in_bulk(seen)
+        missing = sorted(seen - set(products))
+
+        errors = []
+        if missing:
+            errors.append(f"Productos no encontrados: {', '.join(str(pk) for pk in missing)}.")
+        if duplicated:
+            errors.append(
+                "Cada producto solo puede aparecer una vez en el pedido. "
+                f"Repetidos: {', '.join(str(pk) for pk in duplicated)}."
+            )
+        if errors:
+            raise serializers.ValidationError(errors)
+        return products
+
 
 # Serializador para OrderItem cuando está ANIDADO dentro de Order
 # Esta clase es la que se usa dentro de OrderSerializer para la representación anidada.
@@ -42,13 +173,15 @@ class NestedOrderItemSerializer(serializers.ModelSerializer):
     # === CORRECCIÓN CLAVE AQUÍ ===
     # Para la entrada (POST/PUT/PATCH), acepta solo el ID del producto.
     # NO es write_only=True porque el OrderSerializer necesita leer este campo para crear el OrderItem.
-    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    # Los productos de todas las líneas se resuelven juntos en NestedOrderItemListSerializer.
+    product = BatchedProductField(queryset=Product.objects.all())
     
     # product_name se muestra para legibilidad en la respuesta (solo lectura).
     product_name = serializers.CharField(source='product.name', read_only=True)
 
     class Meta:
         model = OrderItem
+        list_serializer_class = NestedOrderItemListSerializer
         # No incluimos 'order' aquí porque se infiere de la relación con el Order padre.
         # Incluimos 'price' para que se pueda establecer el precio unitario
         fields = ['id', 'product', 'product_name', 'quantity', 'price']
@@ -56,7 +189,7 @@ class NestedOrderItemSerializer(serializers.ModelSerializer):
 
 
 # Serializador principal para Order (con anidación writable)
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(StockReservationMixin, serializers.ModelSerializer):
     """
     Serializador para el modelo Order, con soporte para OrderItems anidados (lectura/escritura).
     """
@@ -69,22 +202,37 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         # Incluye 'items', 'customer_name' y 'total_amount' en los campos que se serializarán.
-        fields = ['id', 'customer', 'customer_name', 'order_date', 'total_amount', 'status', 'items']
-        read_only_fields = ('id', 'order_date', 'customer_name', 'total_amount',)
+        fields = ['id', 'customer', 'customer_name', 'order_date', 'updated_at', 'total_amount', 'status', 'items']
+        read_only_fields = ('id', 'order_date', 'updated_at', 'customer_name', 'total_amount',)
+
+    def validate_status(self, value):
+        # Al editar, solo se admiten los cambios de estado de ORDER_TRANSITIONS
+        if self.instance is not None and not can_transition(self.instance.status, value):
+            raise serializers.ValidationError(f"No se puede pasar de {self.instance.status} a {value}.")
+        return value
 
     # --- Método CREATE personalizado para manejar la creación de OrderItems anidados ---
     def create(self, validated_data):
         order_items_data = validated_data.pop('items')
 
         with transaction.atomic():
+            # El campo 'product' en cada item_data ya es una instancia de Product
+            # porque PrimaryKeyRelatedField en NestedOrderItemSerializer ya lo ha validado.
+            items = [OrderItem(**item_data) for item_data in order_items_data]
+
+            # Primero se reserva el stock: si alguna línea no tiene, no se escribe nada más
+            if validated_data.get('status') != ORDER_CANCELLED:
+                self._change_stock({}, self._quantities(items))
+
+            # El total se conoce antes de escribir: el pedido se inserta ya con él
+            # y las líneas se crean en un único INSERT (bulk_create no dispara señales).
+            validated_data['total_amount'] = sum((item.get_total for item in items), Decimal('0.00'))
             order = Order.objects.create(**validated_data)
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
 
-            for item_data in order_items_data:
-                # El campo 'product' en item_data ya es una instancia de Product
-                # porque PrimaryKeyRelatedField en NestedOrderItemSerializer
-                # ya lo ha validado y convertido.
-                # No necesitas la validación Product.objects.filter(...).exists() aquí.
-                OrderItem.objects.create(order=order, **item_data)
+        self._refresh_items_cache(order)
         return order
 
     # --- Método UPDATE personalizado para manejar la actualización de OrderItems anidados ---
@@ -92,13 +240,107 @@ class OrderSerializer(serializers.ModelSerializer):
         order_items_data = validated_data.pop('items', None)
 
         with transaction.atomic():
+            # Releemos el pedido bloqueado: otra petición puede haberlo cancelado o editado
+            # desde que se cargó, y el stock que se devuelve depende de su estado actual
+            locked = Order.objects.select_for_update().get(pk=instance.pk)
+            instance.customer_id, instance.status, instance.total_amount = (
+                locked.customer_id, locked.status, locked.total_amount
+            )
+            instance._loaded_counters = locked._loaded_counters
+            status = validated_data.get('status', instance.status)
+            if not can_transition(instance.status, status):
+                raise serializers.ValidationError({'status': [f"No se puede pasar de {instance.status} a {status}."]})
+
+            was_active = instance.status != ORDER_CANCELLED
             instance.customer = validated_data.get('customer', instance.customer)
-            instance.save()
+            instance.status = status
+            is_active = instance.status != ORDER_CANCELLED
 
-            if order_items_data is not None:
-                instance.items.all().delete() # Borra todos los OrderItems asociados a esta Order.
+            # El stock reservado pasa de las líneas actuales a las nuevas (o se devuelve
+            # entero si el pedido se cancela, y se vuelve a reservar si se reactiva)
+            if order_items_data is not None or was_active != is_active:
+                existing = list(OrderItem.objects.filter(order=instance))
+                new_items = existing if order_items_data is None else [OrderItem(**data) for data in order_items_data]
+                self._change_stock(
+                    self._quantities(existing) if was_active else {},
+                    self._quantities(new_items) if is_active else {},
+                )
+                if order_items_data is not None:
+                    instance.total_amount = self._sync_items(instance, order_items_data, existing)
 
-                for item_data in order_items_data:
-                    # Similar al create, 'product' en item_data ya es una instancia de Product.
-                    OrderItem.objects.create(order=instance, **item_data)
+            instance.save()
+
+        if order_items_data is not None:
+            self._refresh_items_cache(instance)
         return instance
+
+    def _sync_items(self, order, order_items_data, existing=None):
+        """
+        Aplica las líneas recibidas comparándolas con las existentes por producto
+        (unique_together order/product): borra las que ya no vienen, actualiza solo
+        las que cambian y crea las nuevas. Devuelve el nuevo total del pedido.
+        El número de consultas no depende del número de líneas.
+        """
+        if existing is None:
+            existing = OrderItem.objects.filter(order=order)
+        existing = {item.product_id: item for item in existing}
+        to_create, to_update = [], []
+        total = Decimal('0.00')
+
+        for item_data in order_items_data:
+            new_item = OrderItem(order=order, **item_data)
+            total += new_item.get_total
+            current = existing.pop(new_item.product_id, None)
+            if current is None:
+                to_create.append(new_item)
+            elif (current.quantity, current.price) != (new_item.quantity, new_item.price):
+                current.quantity = new_item.quantity
+                current.price = new_item.price
+                to_update.append(current)
+
+        with order_totals_suspended():
+            if existing:
+                OrderItem.objects.filter(pk__in=[item.pk for item in existing.values()]).delete()
+            if to_update:
+                OrderItem.objects.bulk_update(to_update, ['quantity', 'price'])
+            if to_create:
+                OrderItem.objects.bulk_create(to_create)
+        return total
+
+    def _refresh_items_cache(self, order):
+        # Deja las líneas (con su producto) precargadas para la respuesta en una sola consulta
+        order._prefetched_objects_cache = {}
+        prefetch_related_objects(
+            [order], Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('pk'))
+        )
+
+
+class CompiledNestedOrderItemSerializer(CompiledSerializer):
+    """Versión compilada de NestedOrderItemSerializer (líneas dentro de un pedido)."""
+    serializer_class = NestedOrderItemSerializer
+    extra_columns = ('order_id',)
+
+
+class CompiledOrderSerializer(CompiledSerializer):
+    """
+    Versión compilada de OrderSerializer para el listado: las líneas de todos los
+    pedidos de la página se leen con una única consulta de .values().
+    """
+    serializer_class = OrderSerializer
+    computed = {'items': 'get_items'}
+
+    def serialize(self, rows):
+        rows = list(rows)
+        self._items = {}
+        if self.field_names is not None and 'items' not in self.field_names:
+            return super().serialize(rows)
+        item_serializer = CompiledNestedOrderItemSerializer(self.context)
+        item_rows = item_serializer.values(
+            OrderItem.objects.filter(order_id__in=[row['pk'] for row in rows]).order_by('pk')
+        )
+        for item in item_rows:
+            self._items.setdefault(item['order_id'], []).append(item_serializer.to_representation(item))
+        return super().serialize(rows)
+
+    def get_items(self, row):
+        return self._items.get(row['pk'], [])
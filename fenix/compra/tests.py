@@ -1,14 +1,23 @@
-from django.test import TestCase, Client
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+import threading
+from unittest import mock
+
+from django.db import OperationalError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from datetime import date, datetime
 from decimal import Decimal
 
 # Importa los modelos y formularios necesarios
-from .models import Order, OrderItem
-from prenda.models import Product
+from .models import Order, OrderItem, recalculate_order_totals
+from .serializers import CompiledOrderSerializer, OrderSerializer
+from prenda.models import InsufficientStock, Product, change_stock
 from cliente.models import Customer
 from categoría.models import Category # <--- Asegúrate de que este import sea correcto para tu estructura
-from .forms import OrderForm, OrderItemForm # Asegúrate de que OrderItemForm esté definido en forms.py
 
 
 class OrderModelTest(TestCase):
@@ -134,13 +143,726 @@ class OrderItemModelTest(TestCase):
         # total_amount debería ser 61.00 (del primer item) + 20.00 (4*5.00 del segundo item) = 81.00
         self.assertEqual(self.order.total_amount, Decimal('81.00'))
 
+    def test_order_total_updates_on_item_change_and_delete(self):
+        """Test that editing or deleting an item applies only the difference to the order total."""
+        item = OrderItem.objects.get(pk=self.order_item.pk)
+        item.quantity = 3
+        item.save()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_amount, Decimal('91.50')) # 3 * 30.50
+
+        item.delete()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_amount, Decimal('0.00'))
+
+    @override_settings(ORDER_TOTALS_MODE='on_commit')
+    def test_order_total_recalculated_on_commit(self):
+        """Test that in 'on_commit' mode the total is recalculated once the transaction commits."""
+        product2 = Product.objects.create(
+            name="Gorra", size="U", color="Azul", price=Decimal('12.00'), stock=10, category=self.category
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderItem.objects.create(order=self.order, product=product2, quantity=2, price=product2.price)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_amount, Decimal('85.00')) # 61.00 + 24.00
+
+    @override_settings(ORDER_TOTALS_MODE='on_commit')
+    def test_rolled_back_writes_are_not_recalculated(self):
+        """Test that orders touched in a rolled back transaction are not recalculated by the next one."""
+        other = Order.objects.create(customer=self.customer, total_amount=Decimal('0.00'))
+        with mock.patch('compra.models.recalculate_order_totals', wraps=recalculate_order_totals) as recalculate:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError):
+                    with transaction.atomic():
+                        OrderItem.objects.filter(pk=self.order_item.pk).delete()
+                        raise RuntimeError
+                OrderItem.objects.create(order=other, product=self.product, quantity=1, price=Decimal('30.50'))
+        recalculate.assert_called_once_with({other.pk})
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_amount, Decimal('61.00'))
+
+    @override_settings(ORDER_TOTALS_MODE='on_commit')
+    def test_in_memory_order_is_refreshed_on_commit(self):
+        """Test that in 'on_commit' mode the order held in memory gets the recalculated total."""
+        order = Order.objects.get(pk=self.order.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderItem.objects.create(order=order, product=Product.objects.create(
+                name="Bufanda", price=Decimal('9.00'), stock=5, category=self.category,
+            ), quantity=1, price=Decimal('9.00'))
+        self.assertEqual(order.total_amount, Decimal('70.00'))
+
+    def test_item_change_touches_order_updated_at(self):
+        """Test that changing an item refreshes the order's updated_at (used for ETags)."""
+        before = self.order.updated_at
+        self.order_item.quantity = 5
+        self.order_item.save()
+        self.order.refresh_from_db()
+        self.assertGreater(self.order.updated_at, before)
+
+    def test_reconcile_order_totals_command(self):
+        """Test that the reconciliation command detects and fixes wrong totals."""
+        Order.objects.filter(pk=self.order.pk).update(total_amount=Decimal('1.00'))
+        out = StringIO()
+        call_command('reconcile_order_totals', stdout=out)
+        self.assertIn('1 pedidos con el total descuadrado', out.getvalue())
+
+        call_command('reconcile_order_totals', '--fix', stdout=StringIO())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_amount, Decimal('61.00'))
+
+    def test_recalculate_order_totals_without_items(self):
+        """Test that an order without items is recalculated to zero."""
+        OrderItem.objects.all().delete()
+        Order.objects.filter(pk=self.order.pk).update(total_amount=Decimal('5.00'))
+        recalculate_order_totals([self.order.pk])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_amount, Decimal('0.00'))
+
+
+class OrderSerializerBulkTest(TestCase):
+    """
+    Tests for the bulk write path of OrderSerializer.
+    """
+    def setUp(self):
+        self.category = Category.objects.create(name="Mayorista", description="Pedidos grandes")
+        self.products = [
+            Product.objects.create(
+                name=f"Prenda {i}", size="M", color="Rojo", price=Decimal('10.00'), stock=100, category=self.category
+            )
+            for i in range(12)
+        ]
+        self.customer = Customer.objects.create(name="Tienda Sol", email="sol@example.com", phone="600000000")
+
+    def _items(self, count, quantity=1):
+        return [
+            {'product': product.pk, 'quantity': quantity, 'price': str(product.price)}
+            for product in self.products[:count]
+        ]
+
+    def _save(self, data, instance=None):
+        serializer = OrderSerializer(instance, data=data, partial=instance is not None)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with CaptureQueriesContext(connection) as queries:
+            order = serializer.save()
+        return order, len(queries)
+
+    def test_create_uses_constant_number_of_queries(self):
+        """Test that creating an order only adds one stock UPDATE per item."""
+        _, few = self._save({'customer': self.customer.pk, 'items': self._items(2)})
+        order, many = self._save({'customer': self.customer.pk, 'items': self._items(10)})
+        # Cada línea solo añade su UPDATE condicional de stock; el resto es constante
+        self.assertEqual(many - few, 8)
+        order.refresh_from_db()
+        self.assertEqual(order.items.count(), 10)
+        self.assertEqual(order.total_amount, Decimal('100.00'))
+
+    def test_update_diffs_items_by_product(self):
+        """Test that updating items keeps unchanged lines and applies only the differences."""
+        order, _ = self._save({'customer': self.customer.pk, 'items': self._items(3)})
+        kept_ids = set(order.items.filter(product__in=self.products[:2]).values_list('id', flat=True))
+
+        items = self._items(2)
+        items[1]['quantity'] = 5
+        items.append({'product': self.products[5].pk, 'quantity': 2, 'price': '10.00'})
+        order, _ = self._save({'items': items}, instance=order)
+
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal('80.00')) # 10 + 50 + 20
+        self.assertTrue(kept_ids.issubset(set(order.items.values_list('id', flat=True))))
+        self.assertFalse(order.items.filter(product=self.products[2]).exists())
+        self.assertEqual(order.items.get(product=self.products[1]).quantity, 5)
+
+
+    def test_validation_resolves_products_in_one_query(self):
+        """Test that all item products are fetched with a single query during validation."""
+        serializer = OrderSerializer(data={'customer': self.customer.pk, 'items': self._items(10)})
+        with self.assertNumQueries(2): # cliente + productos (id__in)
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_validation_reports_missing_and_duplicated_products(self):
+        """Test that missing and duplicated products are reported together before writing."""
+        items = self._items(2) + [
+            {'product': self.products[0].pk, 'quantity': 1, 'price': '10.00'},
+            {'product': 9998, 'quantity': 1, 'price': '10.00'},
+            {'product': 9999, 'quantity': 1, 'price': '10.00'},
+        ]
+        serializer = OrderSerializer(data={'customer': self.customer.pk, 'items': items})
+        self.assertFalse(serializer.is_valid())
+        errors = [str(error) for error in serializer.errors['items']]
+        self.assertIn('Productos no encontrados: 9998, 9999.', errors)
+        self.assertTrue(any(str(self.products[0].pk) in error and 'Repetidos' in error for error in errors))
+        self.assertEqual(Order.objects.count(), 0)
+
+
+class CustomerCountersTest(TestCase):
+    """
+    Tests for Customer.order_count / lifetime_value / last_order_at maintained on order writes.
+    """
+    def setUp(self):
+        self.category = Category.objects.create(name="Contadores")
+        self.product = Product.objects.create(name="Camisa", price=Decimal('10.00'), stock=100, category=self.category)
+        self.other_product = Product.objects.create(name="Falda", price=Decimal('25.00'), stock=100, category=self.category)
+        self.customer = Customer.objects.create(name="Ana", email="ana@example.com")
+        self.other = Customer.objects.create(name="Luis", email="luis@example.com")
+
+    def _create(self, quantity=1, customer=None):
+        serializer = OrderSerializer(data={
+            'customer': (customer or self.customer).pk,
+            'items': [{'product': self.product.pk, 'quantity': quantity, 'price': '10.00'}],
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer.save()
+
+    def assertCounters(self, customer, order_count, lifetime_value):
+        customer.refresh_from_db()
+        self.assertEqual((customer.order_count, customer.lifetime_value), (order_count, Decimal(lifetime_value)))
+
+    def test_counters_follow_order_writes(self):
+        """Test that creating, editing items, cancelling and deleting orders adjust the counters."""
+        first = self._create(quantity=2)
+        second = self._create(quantity=1)
+        self.assertCounters(self.customer, 2, '30.00')
+        self.assertEqual(self.customer.last_order_at, second.order_date)
+
+        # Líneas sueltas (señales de OrderItem) y edición anidada del serializer
+        OrderItem.objects.create(order=first, product=self.other_product, quantity=1, price=Decimal('25.00'))
+        self.assertCounters(self.customer, 2, '55.00')
+        serializer = OrderSerializer(second, data={'items': [
+            {'product': self.product.pk, 'quantity': 3, 'price': '10.00'},
+        ]}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertCounters(self.customer, 2, '75.00')
+
+        # Un pedido cancelado sigue contando como pedido, pero no en el total comprado
+        second = Order.objects.get(pk=second.pk)
+        second.status = 'CANCELADO'
+        second.save()
+        self.assertCounters(self.customer, 2, '45.00')
+
+        second.delete()
+        self.assertCounters(self.customer, 1, '45.00')
+        self.assertEqual(self.customer.last_order_at, first.order_date)
+
+    def test_moving_order_to_another_customer(self):
+        """Test that reassigning an order moves it between both customers' counters."""
+        order = self._create(quantity=4)
+        order = Order.objects.get(pk=order.pk)
+        order.customer = self.other
+        order.save()
+        self.assertCounters(self.customer, 0, '0.00')
+        self.assertIsNone(self.customer.last_order_at)
+        self.assertCounters(self.other, 1, '40.00')
+
+    def test_list_orders_by_lifetime_value(self):
+        """Test that customers can be ordered by the maintained counters."""
+        self._create(quantity=1)
+        self._create(quantity=5, customer=self.other)
+        response = self.client.get('/api/customers/', {'ordering': '-lifetime_value'}, HTTP_ACCEPT='application/json')
+        results = response.json()['results']
+        self.assertEqual([customer['name'] for customer in results], ["Luis", "Ana"])
+        self.assertEqual(results[0]['order_count'], 1)
+
+    def test_rebuild_counters_fixes_drift(self):
+        """Test that rebuild_counters recomputes the counters from the orders."""
+        order = self._create(quantity=2)
+        Customer.objects.update(order_count=7, lifetime_value=Decimal('1.00'), last_order_at=None)
+        call_command('rebuild_counters', '--only', 'customers', stdout=StringIO())
+        self.assertCounters(self.customer, 1, '20.00')
+        self.assertEqual(self.customer.last_order_at, order.order_date)
+        self.assertCounters(self.other, 0, '0.00')
+
+
+class OrderStockTest(TestCase):
+    """
+    Tests for stock reservation when orders are placed, edited and cancelled.
+    """
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Stock")
+        self.shirt = Product.objects.create(name="Camisa", price=Decimal('10.00'), stock=5, category=self.category)
+        self.skirt = Product.objects.create(name="Falda", price=Decimal('20.00'), stock=3, category=self.category)
+        self.customer = Customer.objects.create(name="Eva", email="eva@example.com")
+        self.url = reverse('compra_api:order-list-create')
+
+    def _post(self, *lines):
+        items = [{'product': product.pk, 'quantity': quantity, 'price': str(product.price)} for product, quantity in lines]
+        return self.client.post(
+            self.url, {'customer': self.customer.pk, 'items': items},
+            content_type='application/json', HTTP_ACCEPT='application/json',
+        )
+
+    def _patch(self, order_id, data):
+        return self.client.patch(
+            reverse('compra_api:order-detail', args=[order_id]), data,
+            content_type='application/json', HTTP_ACCEPT='application/json',
+        )
+
+    def assertStock(self, shirt, skirt):
+        self.assertEqual(
+            list(Product.objects.filter(pk__in=[self.shirt.pk, self.skirt.pk]).order_by('pk').values_list('stock', flat=True)),
+            [shirt, skirt],
+        )
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.stock_total, shirt + skirt)
+
+    def test_create_reserves_stock(self):
+        """Test that placing an order decrements the stock of every line."""
+        response = self._post((self.shirt, 2), (self.skirt, 3))
+        self.assertEqual(response.status_code, 201)
+        self.assertStock(3, 0)
+
+    def test_oversold_lines_are_rejected_together(self):
+        """Test that every line without stock is reported and nothing is written."""
+        response = self._post((self.shirt, 6), (self.skirt, 4))
+        self.assertEqual(response.status_code, 400)
+        message = response.json()['items'][0]
+        self.assertIn(f"Producto {self.shirt.pk}: quedan 5", message)
+        self.assertIn(f"Producto {self.skirt.pk}: quedan 3", message)
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertStock(5, 3)
+
+        # Una línea con stock y otra sin él: tampoco se reserva la primera
+        self.assertEqual(self._post((self.shirt, 1), (self.skirt, 4)).status_code, 400)
+        self.assertStock(5, 3)
+
+    def test_edit_items_moves_the_reservation(self):
+        """Test that editing the lines reserves or returns only the difference."""
+        order_id = self._post((self.shirt, 2), (self.skirt, 1)).json()['id']
+        response = self._patch(order_id, {'items': [{'product': self.shirt.pk, 'quantity': 4, 'price': '10.00'}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertStock(1, 3)
+
+        response = self._patch(order_id, {'items': [{'product': self.shirt.pk, 'quantity': 6, 'price': '10.00'}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertStock(1, 3)
+        self.assertEqual(OrderItem.objects.get(order_id=order_id).quantity, 4)
+
+    def test_cancel_restores_and_reactivate_reserves(self):
+        """Test that cancelling returns the stock and reactivating reserves it again."""
+        order_id = self._post((self.shirt, 2), (self.skirt, 3)).json()['id']
+        response = self._patch(order_id, {'status': 'CANCELADO'})
+        self.assertEqual((response.status_code, response.json()['status']), (200, 'CANCELADO'))
+        self.assertStock(5, 3)
+
+        # Mientras está cancelado otro pedido se lleva las faldas
+        self.assertEqual(self._post((self.skirt, 2)).status_code, 201)
+        self.assertEqual(self._patch(order_id, {'status': 'PENDIENTE'}).status_code, 400)
+        self.assertEqual(Order.objects.get(pk=order_id).status, 'CANCELADO')
+        self.assertStock(5, 1)
+
+    def test_stale_instance_does_not_return_stock_twice(self):
+        """Test that an update uses the locked order status, not the one the instance was loaded with."""
+        order_id = self._post((self.shirt, 2)).json()['id']
+        stale = Order.objects.get(pk=order_id)
+        self.assertEqual(self._patch(order_id, {'status': 'CANCELADO'}).status_code, 200)
+        self.assertStock(5, 3)
+
+        serializer = OrderSerializer(stale, data={'status': 'CANCELADO'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertStock(5, 3)
+
+    def test_delete_returns_stock_unless_cancelled(self):
+        """Test that deleting an order returns its stock, but deleting a cancelled one does not."""
+        order_id = self._post((self.shirt, 2), (self.skirt, 1)).json()['id']
+        self.assertStock(3, 2)
+        response = self.client.delete(reverse('compra_api:order-detail', args=[order_id]), HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Order.objects.filter(pk=order_id).exists())
+        self.assertStock(5, 3)
+
+        order_id = self._post((self.shirt, 2)).json()['id']
+        self._patch(order_id, {'status': 'CANCELADO'})
+        self.client.delete(reverse('compra_api:order-detail', args=[order_id]), HTTP_ACCEPT='application/json')
+        self.assertStock(5, 3)
+
+    def test_item_endpoints_reserve_and_return_stock(self):
+        """Test that creating, editing and deleting single lines moves the reserved stock."""
+        order_id = self._post((self.shirt, 1)).json()['id']
+        items_url = reverse('compra_api:orderitem-list-create')
+        response = self.client.post(
+            items_url, {'order': order_id, 'product': self.skirt.pk, 'quantity': 2},
+            content_type='application/json', HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertStock(4, 1)
+
+        item_url = reverse('compra_api:orderitem-detail', args=[response.json()['id']])
+        response = self.client.patch(item_url, {'quantity': 3}, content_type='application/json', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertStock(4, 0)
+
+        response = self.client.patch(item_url, {'quantity': 4}, content_type='application/json', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quantity', response.json())
+        self.assertStock(4, 0)
+
+        self.assertEqual(self.client.delete(item_url, HTTP_ACCEPT='application/json').status_code, 204)
+        self.assertStock(4, 3)
+
+    def test_item_of_cancelled_order_reserves_nothing(self):
+        """Test that single lines of a cancelled order do not touch the stock."""
+        order_id = self._post((self.shirt, 1)).json()['id']
+        self._patch(order_id, {'status': 'CANCELADO'})
+        response = self.client.post(
+            reverse('compra_api:orderitem-list-create'), {'order': order_id, 'product': self.skirt.pk, 'quantity': 2},
+            content_type='application/json', HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.client.delete(reverse('compra_api:orderitem-detail', args=[response.json()['id']]), HTTP_ACCEPT='application/json')
+        self.assertStock(5, 3)
+
+    def test_customer_delete_returns_stock_of_active_orders(self):
+        """Test that deleting a customer returns the stock of its orders, except cancelled ones."""
+        self._post((self.shirt, 2))
+        cancelled_id = self._post((self.skirt, 1)).json()['id']
+        self._patch(cancelled_id, {'status': 'CANCELADO'})
+        self.assertStock(3, 3)
+
+        response = self.client.delete(reverse('cliente_api:customer-detail', args=[self.customer.pk]), HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Order.objects.exists())
+        self.assertStock(5, 3)
+
+    def test_stock_change_invalidates_catalog_cache(self):
+        """Test that the cached product list shows the stock left after an order."""
+        products_url = reverse('prenda_api:product-list-create')
+        self.client.get(products_url, HTTP_ACCEPT='application/json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post((self.shirt, 2))
+        stock = {p['id']: p['stock'] for p in self.client.get(products_url, HTTP_ACCEPT='application/json').json()['results']}
+        self.assertEqual(stock[self.shirt.pk], 3)
+
+
+class ConcurrentStockReservationTest(TransactionTestCase):
+    """
+    Tests that concurrent reservations of the same product never oversell it.
+    """
+    THREADS = 8
+    ATTEMPTS = 5
+
+    def test_concurrent_reservations_never_oversell(self):
+        """Test that many threads reserving the same product sell exactly the stock available."""
+        product = Product.objects.create(name="Última unidad", price=Decimal('5.00'), stock=12)
+        other = Product.objects.create(name="Acompañante", price=Decimal('5.00'), stock=1000)
+        results = {'sold': 0, 'rejected': 0}
+        lock = threading.Lock()
+        start = threading.Barrier(self.THREADS)
+
+        def buy():
+            try:
+                start.wait()
+                for _ in range(self.ATTEMPTS):
+                    while True:
+                        try:
+                            # Los dos productos en cada transacción, para comprobar que no hay interbloqueos
+                            with transaction.atomic():
+                                change_stock({other.pk: -1, product.pk: -1})
+                            outcome = 'sold'
+                        except InsufficientStock:
+                            outcome = 'rejected'
+                        except OperationalError:
+                            continue  # SQLite bloquea la base de datos entera: se reintenta
+                        break
+                    with lock:
+                        results[outcome] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=buy) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(results, {'sold': 12, 'rejected': self.THREADS * self.ATTEMPTS - 12})
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(other.stock, 1000 - 12)
+
+
+class OrderTransitionTest(TestCase):
+    """
+    Tests for the order status transition table and POST /api/orders/transition/.
+    """
+    def setUp(self):
+        self.category = Category.objects.create(name="Transiciones")
+        self.product = Product.objects.create(name="Camisa", price=Decimal('10.00'), stock=10, category=self.category)
+        self.customer = Customer.objects.create(name="Sara", email="sara@example.com")
+        self.url = reverse('compra_api:order-transition')
+
+    def _order(self, quantity=1, status=None):
+        data = {'customer': self.customer.pk, 'items': [{'product': self.product.pk, 'quantity': quantity, 'price': '10.00'}]}
+        serializer = OrderSerializer(data=data)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        order = serializer.save()
+        if status:
+            Order.objects.filter(pk=order.pk).update(status=status)
+        return order.pk
+
+    def _post(self, ids, target):
+        return self.client.post(
+            self.url, {'ids': ids, 'status': target}, content_type='application/json', HTTP_ACCEPT='application/json'
+        )
+
+    def _stock(self):
+        return Product.objects.get(pk=self.product.pk).stock
+
+    def test_legal_transitions_use_one_update(self):
+        """Test that legal transitions are applied with a single UPDATE and reported per id."""
+        pending, shipped, completed = self._order(), self._order(status='ENVIADO'), self._order(status='COMPLETADO')
+        before = Order.objects.get(pk=pending).updated_at
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post([completed, pending, 999, shipped], 'ENVIADO')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['updated'], 1)
+        self.assertEqual([(r['id'], r['ok'], r['from'], r['status']) for r in data['results']], [
+            (completed, False, 'COMPLETADO', 'COMPLETADO'),
+            (pending, True, 'PENDIENTE', 'ENVIADO'),
+            (999, False, None, None),
+            (shipped, True, 'ENVIADO', 'ENVIADO'),
+        ])
+        self.assertIn('COMPLETADO', data['results'][0]['error'])
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "compra_order"')]
+        self.assertEqual(len(updates), 1)
+        self.assertGreater(Order.objects.get(pk=pending).updated_at, before)
+
+    def test_cancel_restores_stock_in_bulk(self):
+        """Test that cancelling several orders returns their stock and updates the customer."""
+        first, second, shipped = self._order(2), self._order(3), self._order(1, status='ENVIADO')
+        self.assertEqual(self._stock(), 4)
+        data = self._post([first, second, shipped], 'CANCELADO').json()
+        self.assertEqual([r['ok'] for r in data['results']], [True, True, False])
+        self.assertEqual(self._stock(), 9)
+        self.customer.refresh_from_db()
+        self.assertEqual((self.customer.order_count, self.customer.lifetime_value), (3, Decimal('10.00')))
+
+        # Repetir la cancelación no devuelve el stock dos veces
+        self._post([first, second], 'CANCELADO')
+        self.assertEqual(self._stock(), 9)
+
+    def test_reactivation_reserves_stock_per_order(self):
+        """Test that reactivating cancelled orders only succeeds for those with stock left."""
+        first, second = self._order(4), self._order(5)
+        self._post([first, second], 'CANCELADO')
+        self._order(4)  # Quedan 6 unidades
+        data = self._post([first, second], 'PENDIENTE').json()
+        self.assertEqual([r['ok'] for r in data['results']], [True, False])
+        self.assertIn('Stock insuficiente', data['results'][1]['error'])
+        self.assertEqual(self._stock(), 2)
+        self.assertEqual(Order.objects.get(pk=second).status, 'CANCELADO')
+
+    def test_invalid_requests(self):
+        """Test that unknown statuses and empty id lists are rejected."""
+        order = self._order()
+        self.assertEqual(self._post([order], 'PERDIDO').status_code, 400)
+        self.assertEqual(self._post([], 'ENVIADO').status_code, 400)
+
+    def test_patch_follows_the_transition_table(self):
+        """Test that PATCH /orders/<id>/ rejects transitions outside the table."""
+        order = self._order(status='ENVIADO')
+        response = self.client.patch(
+            reverse('compra_api:order-detail', args=[order]), {'status': 'PENDIENTE'},
+            content_type='application/json', HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.json())
+        self.assertEqual(Order.objects.get(pk=order).status, 'ENVIADO')
+
+
+class OrderExportCSVTest(TestCase):
+    """
+    Tests for the order and order item CSV exports.
+    """
+    def setUp(self):
+        self.category = Category.objects.create(name="Bolsos", description="Complementos")
+        self.products = [
+            Product.objects.create(name=f"Bolso {i}", price=Decimal('20.00'), stock=10, category=self.category)
+            for i in range(3)
+        ]
+
+    def _create_orders(self, count):
+        start = Customer.objects.count()
+        for i in range(start, start + count):
+            customer = Customer.objects.create(name=f"Cliente {i}", email=f"cliente{i}@example.com")
+            order = Order.objects.create(customer=customer)
+            for product in self.products:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+
+    def _export_queries(self, url_name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(url_name))
+            content = b''.join(response.streaming_content).decode('utf-8')
+        return len(queries), content.splitlines()
+
+    def test_exports_use_fixed_number_of_queries(self):
+        """Test that exporting orders and items does not issue queries per row."""
+        self._create_orders(2)
+        orders_few, _ = self._export_queries('compra_api:order-export-csv')
+        items_few, _ = self._export_queries('compra_api:orderitem-export-csv')
+
+        self._create_orders(8)
+        orders_many, order_lines = self._export_queries('compra_api:order-export-csv')
+        items_many, item_lines = self._export_queries('compra_api:orderitem-export-csv')
+
+        self.assertEqual(orders_few, orders_many)
+        self.assertEqual(items_few, items_many)
+        self.assertEqual(len(order_lines), 11) # cabecera + 10 pedidos
+        self.assertEqual(len(item_lines), 31) # cabecera + 30 líneas
+
+    def test_export_rows_include_joined_names(self):
+        """Test that customer and product names are exported alongside their ids."""
+        self._create_orders(1)
+        order = Order.objects.get()
+        _, order_lines = self._export_queries('compra_api:order-export-csv')
+        self.assertEqual(order_lines[1].split(',')[:3], [str(order.pk), str(order.customer_id), 'Cliente 0'])
+
+        _, item_lines = self._export_queries('compra_api:orderitem-export-csv')
+        item = OrderItem.objects.order_by('pk').first()
+        self.assertEqual(
+            item_lines[1],
+            f"{item.pk},{order.pk},{item.product_id},{item.product.name},1"
+        )
+
+
+class CompiledOrderSerializerTest(TestCase):
+    """
+    Tests for the compiled (values()-based) order list serializer.
+    """
+    def setUp(self):
+        products = [Product.objects.create(name=f"Gorro {i}", price=Decimal('9.95'), stock=10) for i in range(3)]
+        for i in range(3):
+            customer = Customer.objects.create(name=f"Cliente {i}", email=f"compilado{i}@example.com")
+            order = Order.objects.create(customer=customer)
+            for product in products[i:]:
+                OrderItem.objects.create(order=order, product=product, quantity=i + 1, price=product.price)
+        self.url = reverse('compra_api:order-list-create')
+
+    def test_compiled_output_is_byte_identical(self):
+        """Test that the compiled order list (with nested items) matches the ModelSerializer output."""
+        default = self.client.get(self.url, {'serializer': 'default'}, HTTP_ACCEPT='application/json')
+        with self.assertNumQueries(4):  # validadores ETag + COUNT + pedidos + líneas
+            compiled = self.client.get(self.url, {'serializer': 'compiled'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(compiled.content, default.content)
+        self.assertEqual(len(compiled.json()['results'][0]['items']), 1)
+
+    def test_each_computed_field_with_sparse_fields(self):
+        """Test that every computed field requested alone with ?fields= matches the ModelSerializer."""
+        ids = ','.join(str(pk) for pk in Order.objects.order_by('-pk').values_list('pk', flat=True))
+        for field in CompiledOrderSerializer.computed:
+            for params in ({'fields': field}, {'fields': field, 'ids': ids}):
+                with self.subTest(field=field, **params):
+                    default = self.client.get(self.url, {'serializer': 'default', **params}, HTTP_ACCEPT='application/json')
+                    compiled = self.client.get(self.url, {'serializer': 'compiled', **params}, HTTP_ACCEPT='application/json')
+                    self.assertEqual(compiled.status_code, 200)
+                    self.assertEqual(compiled.content, default.content)
+
+
+class OrderRelatedNameETagTest(TestCase):
+    """
+    Tests that renaming a customer or a product changes the ETag of the orders showing it.
+    """
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Marta", email="marta.etag@example.com")
+        self.product = Product.objects.create(name="Falda", price=Decimal('25.00'), stock=10)
+        self.order = Order.objects.create(customer=self.customer)
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=1, price=self.product.price)
+
+    def _revalidate(self, url, rename):
+        etag = self.client.get(url, HTTP_ACCEPT='application/json')['ETag']
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        rename()
+        response = self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_customer_rename_refreshes_order_list(self):
+        """Test that renaming the customer invalidates the order list ETag."""
+        def rename():
+            customer = Customer.objects.get(pk=self.customer.pk)
+            customer.name = "Marta López"
+            customer.save()
+
+        data = self._revalidate(reverse('compra_api:order-list-create'), rename)
+        self.assertEqual(data['results'][0]['customer_name'], "Marta López")
+
+    def test_product_rename_refreshes_order_detail(self):
+        """Test that renaming a product invalidates the ETag of the orders containing it."""
+        def rename():
+            product = Product.objects.get(pk=self.product.pk)
+            product.name = "Falda larga"
+            product.save()
+
+        data = self._revalidate(reverse('compra_api:order-detail', args=[self.order.pk]), rename)
+        self.assertEqual(data['items'][0]['product_name'], "Falda larga")
+
+    def test_unrelated_save_keeps_etag(self):
+        """Test that saving a customer without renaming it keeps the orders' 304."""
+        url = reverse('compra_api:order-list-create')
+        etag = self.client.get(url, HTTP_ACCEPT='application/json')['ETag']
+        customer = Customer.objects.get(pk=self.customer.pk)
+        customer.phone = "600000000"
+        customer.save()
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class DashboardAPITest(TestCase):
+    """
+    Tests for the aggregated dashboard endpoint.
+    """
+    def setUp(self):
+        cache.clear()
+        self.shirt = Product.objects.create(name="Camisa", price=Decimal('20.00'), stock=2)
+        self.jeans = Product.objects.create(name="Vaqueros", price=Decimal('40.00'), stock=50)
+        self.customer = Customer.objects.create(name="Ana", email="ana@example.com")
+        Customer.objects.create(name="Luis", email="luis@example.com")
+        paid = Order.objects.create(customer=self.customer, status='COMPLETADO')
+        OrderItem.objects.create(order=paid, product=self.shirt, quantity=3, price=Decimal('20.00'))
+        OrderItem.objects.create(order=paid, product=self.jeans, quantity=1, price=Decimal('40.00'))
+        cancelled = Order.objects.create(customer=self.customer, status='CANCELADO')
+        OrderItem.objects.create(order=cancelled, product=self.jeans, quantity=5, price=Decimal('40.00'))
+        self.url = reverse('api-dashboard')
+
+    def test_dashboard_aggregates_in_fixed_number_of_queries(self):
+        """Test that the dashboard is computed with five queries and cached afterwards."""
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url, {'days': 7}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual(data['ingresos_totales'], 100.0)
+        por_estado = {row['estado']: row for row in data['por_estado']}
+        self.assertEqual(len(por_estado), len(Order.STATUS_CHOICES))
+        self.assertEqual(por_estado['CANCELADO']['pedidos'], 1)
+        self.assertEqual(por_estado['ENVIADO']['pedidos'], 0)
+
+        self.assertEqual(len(data['pedidos_por_dia']), 7)
+        self.assertEqual(data['pedidos_por_dia'][-1]['pedidos'], 2)
+        # Los pedidos cancelados no cuentan como ventas
+        self.assertEqual(
+            [(p['nombre'], p['unidades']) for p in data['productos_mas_vendidos']],
+            [("Camisa", 3), ("Vaqueros", 1)]
+        )
+        self.assertEqual(data['stock']['stock_bajo'], 1)
+        self.assertEqual(data['clientes'], {'total_clientes': 2, 'clientes_nuevos': 2, 'clientes_con_pedidos': 1})
+
+        with self.assertNumQueries(0):
+            self.client.get(self.url, {'days': 7}, HTTP_ACCEPT='application/json')
+
+    def test_invalid_days_parameter(self):
+        """Test that ?days= outside the allowed range is rejected."""
+        response = self.client.get(self.url, {'days': 'abc'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+
 
 class OrderViewTest(TestCase):
     """
-    Tests for the Order views.
+    Tests for the Order API views (/api/orders/).
     """
     def setUp(self):
-        self.client = Client() # El cliente de prueba para hacer peticiones HTTP
         # Crear objetos de prueba necesarios para las vistas
         self.category = Category.objects.create(name="Ropa", description="General")
         self.product = Product.objects.create(
@@ -162,116 +884,221 @@ class OrderViewTest(TestCase):
         self.order.refresh_from_db() # Refrescar para obtener el total actualizado por la señal
 
         # URLs con sus nombres definidos en compra/urls.py
-        self.list_url = reverse('compra:order_list')
-        self.detail_url = reverse('compra:order_detail', args=[self.order.pk])
-        self.create_url = reverse('compra:order_create')
-        self.update_url = reverse('compra:order_update', args=[self.order.pk])
-        self.delete_url = reverse('compra:order_delete', args=[self.order.pk])
+        self.list_url = reverse('compra_api:order-list-create')
+        self.detail_url = reverse('compra_api:order-detail', args=[self.order.pk])
 
-    def test_order_list_view(self):
-        """Test that the order list view is accessible and displays orders."""
-        response = self.client.get(self.list_url)
-        self.assertEqual(response.status_code, 200) # Verifica que la página carga correctamente
-        self.assertTemplateUsed(response, 'compra/order_list.html') # Verifica que usa la plantilla correcta
-        self.assertContains(response, self.order.customer.name)
+    def _send(self, method, url, data=None):
+        return getattr(self.client, method)(url, data, content_type='application/json', HTTP_ACCEPT='application/json')
 
-    def test_order_detail_view(self):
-        """Test that the order detail view is accessible and displays order details."""
-        response = self.client.get(self.detail_url)
+    def test_order_list_view(self):
+        """Test that the order list is accessible and includes the orders."""
+        response = self.client.get(self.list_url, HTTP_ACCEPT='application/json')
         self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, 'compra/order_detail.html')
-        self.assertContains(response, self.order.customer.name)
-        self.assertContains(response, self.product.name) # Verifica que el producto del OrderItem aparece
+        results = response.json()['results']
+        self.assertEqual([order['id'] for order in results], [self.order.pk])
+        self.assertEqual(results[0]['customer_name'], self.customer.name)
 
-    def test_order_create_view_get(self):
-        """Test that the order create view loads correctly (GET request)."""
-        response = self.client.get(self.create_url)
+    def test_order_detail_view(self):
+        """Test that the order detail includes the customer, the total and the items."""
+        response = self.client.get(self.detail_url, HTTP_ACCEPT='application/json')
         self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, 'compra/order_form.html')
-        self.assertIsInstance(response.context['form'], OrderForm) # Verifica que el formulario está en el contexto
+        data = response.json()
+        self.assertEqual(data['customer_name'], self.customer.name)
+        self.assertEqual(data['total_amount'], '50.00')
+        self.assertEqual(data['items'][0]['product_name'], self.product.name)
 
     def test_order_create_view_post_valid_data(self):
-        """Test that a new order can be created via POST request with valid data."""
+        """Test that a new order can be created via POST with valid data."""
         initial_order_count = Order.objects.count()
-        response = self.client.post(self.create_url, {
-            'customer': self.customer.pk, # Pk del cliente existente
-            'order_date': '2024-07-23T10:00', # Formato para DateTimeInput
-            'total_amount': '0.00', # Puedes poner 0.00 aquí, la señal lo ajustará si se añaden ítems
-            'status': 'PROCESANDO'
+        response = self._send('post', self.list_url, {
+            'customer': self.customer.pk,
+            'status': 'PROCESANDO',
+            'items': [{'product': self.product.pk, 'quantity': 2, 'price': '50.00'}],
         })
-        self.assertEqual(response.status_code, 302) # Debería redirigir después de crear
+        self.assertEqual(response.status_code, 201)
         self.assertEqual(Order.objects.count(), initial_order_count + 1)
-        # Se puede añadir un assert para verificar si el objeto recién creado tiene el customer correcto, etc.
-        new_order = Order.objects.latest('order_date') # Obtener el último pedido creado
+        new_order = Order.objects.get(pk=response.json()['id'])
         self.assertEqual(new_order.customer, self.customer)
-        # Ya no necesitamos verificar la redirección aquí porque get_absolute_url
-        # del modelo se encarga y el test de update ya lo verifica.
-
+        self.assertEqual(new_order.total_amount, Decimal('100.00'))
 
     def test_order_create_view_post_invalid_data(self):
-        """Test that new order is not created with invalid data (POST request)."""
+        """Test that no order is created with invalid data."""
         initial_order_count = Order.objects.count()
-        response = self.client.post(self.create_url, {
-            'customer': '', # Datos inválidos (cliente vacío si es requerido)
-            'order_date': 'invalid-date',
-            'total_amount': 'abc', # Dato inválido para total_amount
-            'status': 'PENDIENTE'
+        response = self._send('post', self.list_url, {
+            'customer': '',
+            'status': 'PENDIENTE',
+            'items': [{'product': self.product.pk, 'quantity': 'abc', 'price': '50.00'}],
         })
-        self.assertEqual(response.status_code, 200) # Debería renderizar el formulario de nuevo con errores
-        self.assertTemplateUsed(response, 'compra/order_form.html')
+        self.assertEqual(response.status_code, 400)
         self.assertEqual(Order.objects.count(), initial_order_count) # No se debe crear un nuevo pedido
-        self.assertContains(response, "This field is required.") # CAMBIO AQUÍ: Mensaje de error para customer
-        self.assertContains(response, "Enter a number.") # Mensaje de error para total_amount si es 'abc'
+        self.assertIn('customer', response.json())
+        self.assertIn('items', response.json())
 
-    def test_order_update_view_get(self):
-        """Test that the order update view loads correctly (GET request)."""
-        response = self.client.get(self.update_url)
+    def test_order_update_view_valid_data(self):
+        """Test that an existing order can be updated with valid data."""
+        response = self._send('patch', self.detail_url, {'status': 'ENVIADO'})
         self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, 'compra/order_form.html')
-        self.assertEqual(response.context['form'].instance, self.order) # Verifica que el formulario está precargado
-
-    def test_order_update_view_post_valid_data(self):
-        """Test that an existing order can be updated via POST request with valid data."""
-        new_status = 'ENVIADO'
-        response = self.client.post(self.update_url, {
-            'customer': self.customer.pk,
-            'order_date': '2024-05-20T12:00', # Misma fecha, o nueva si se desea
-            'total_amount': str(self.order.total_amount), # Mandar el valor actual como string
-            'status': new_status
-        })
-        self.assertEqual(response.status_code, 302) # Debería redirigir
         self.order.refresh_from_db() # Recargar el objeto desde la DB para ver los cambios
-        self.assertEqual(self.order.status, new_status)
-        self.assertRedirects(response, self.detail_url) # Verificar que redirige al detalle (ahora sí, por get_absolute_url)
+        self.assertEqual(self.order.status, 'ENVIADO')
 
-    def test_order_update_view_post_invalid_data(self):
-        """Test that an existing order is not updated with invalid data (POST request)."""
+    def test_order_update_view_invalid_data(self):
+        """Test that an existing order is not updated with invalid data."""
         original_status = self.order.status
-        response = self.client.post(self.update_url, {
-            'customer': '', # Datos inválidos
-            'order_date': 'invalid-date',
-            'total_amount': 'invalid_decimal', # Dato inválido
-            'status': 'INVALID_STATUS' # Esto sigue siendo inválido, está bien para este test
-        })
-        self.assertEqual(response.status_code, 200) # Debería renderizar el formulario de nuevo
-        self.assertTemplateUsed(response, 'compra/order_form.html')
+        response = self._send('put', self.detail_url, {'customer': '', 'status': 'INVALID_STATUS', 'items': []})
+        self.assertEqual(response.status_code, 400)
         self.order.refresh_from_db()
         self.assertEqual(self.order.status, original_status) # El estado no debe haber cambiado
-        self.assertContains(response, "This field is required.") # CAMBIO AQUÍ
-        self.assertContains(response, "Enter a number.")
-        self.assertContains(response, "Select a valid choice. INVALID_STATUS is not one of the available choices.")
+        self.assertIn('customer', response.json())
+        self.assertIn('"INVALID_STATUS" is not a valid choice.', response.json()['status'])
 
-    def test_order_delete_view_get(self):
-        """Test that the order delete confirmation page loads correctly (GET request)."""
-        response = self.client.get(self.delete_url)
-        self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, 'compra/order_confirm_delete.html')
-        self.assertContains(response, "Estás seguro de que quieres eliminar el pedido")
-
-    def test_order_delete_view_post(self):
-        """Test that an order can be deleted via POST request."""
+    def test_order_delete_view(self):
+        """Test that an order can be deleted."""
         initial_order_count = Order.objects.count()
-        response = self.client.post(self.delete_url)
-        self.assertEqual(response.status_code, 302) # Debería redirigir
+        response = self.client.delete(self.detail_url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 204)
         self.assertEqual(Order.objects.count(), initial_order_count - 1) # El pedido debe haber sido eliminado
-        self.assertRedirects(response, self.list_url) # Verificar que redirige a la lista
\ No newline at end of file
+        self.assertFalse(OrderItem.objects.filter(pk=self.order_item.pk).exists())
+
+
+class BootstrapAPITest(TestCase):
+    """
+    Tests for the composite /api/bootstrap/ endpoint.
+    """
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Camisas")
+        self.shirt = Product.objects.create(name="Camisa", price=Decimal('20.00'), stock=2, category=self.category)
+        self.jeans = Product.objects.create(name="Vaqueros", price=Decimal('40.00'), stock=50)
+        self.customer = Customer.objects.create(name="Ana", email="ana@example.com")
+        self.order = Order.objects.create(customer=self.customer, status='PENDIENTE')
+        OrderItem.objects.create(order=self.order, product=self.shirt, quantity=1, price=Decimal('20.00'))
+        Order.objects.create(customer=self.customer, status='ENVIADO')
+        self.url = reverse('api-bootstrap')
+
+    def _post(self, queries):
+        return self.client.post(self.url, {'queries': queries}, content_type='application/json', HTTP_ACCEPT='application/json')
+
+    def test_runs_all_queries_with_filters_and_fields(self):
+        """Test that each query reuses the list filters and returns only the requested fields."""
+        queries = [
+            {'resource': 'products', 'filters': {'stock_min': 1, 'price_max': 30}, 'fields': ['id', 'name', 'price']},
+            {'resource': 'orders', 'key': 'pendientes', 'filters': {'status': 'PENDIENTE'}},
+            {'resource': 'customers', 'fields': ['id', 'name']},
+        ]
+        # productos (1) + pedidos con sus líneas (2) + clientes (1), sin COUNT(*)
+        with CaptureQueriesContext(connection) as queries_run:
+            response = self._post(queries)
+        self.assertEqual(response.status_code, 200)
+        selects = [query['sql'] for query in queries_run.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 4)
+        self.assertFalse(any('COUNT(' in sql for sql in selects))
+        data = response.json()
+
+        self.assertEqual(data['products']['results'], [{'id': self.shirt.pk, 'name': "Camisa", 'price': "20.00"}])
+        self.assertEqual([order['id'] for order in data['pendientes']['results']], [self.order.pk])
+        self.assertEqual(len(data['pendientes']['results'][0]['items']), 1)
+        self.assertEqual(data['customers'], {
+            'resource': 'customers', 'count': 1, 'truncated': False,
+            'results': [{'id': self.customer.pk, 'name': "Ana"}],
+        })
+
+    def test_limit_and_compiled_serializers(self):
+        """Test that limit truncates the rows and the compiled serializers give the same output."""
+        queries = [{'resource': 'orders', 'limit': 1, 'filters': {'ordering': 'id'}}]
+        default = self._post(queries).json()['orders']
+        self.assertEqual((default['count'], default['truncated']), (1, True))
+
+        queries[0]['filters']['serializer'] = 'compiled'
+        self.assertEqual(self._post(queries).json()['orders'], default)
+
+    def test_invalid_queries_are_rejected_before_querying(self):
+        """Test that unknown resources, fields or filter values return 400 without running any query."""
+        response = self._post([{'resource': 'invoices'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('resource', response.json()['queries']['0'])
+
+        with self.assertNumQueries(0):
+            response = self._post([
+                {'resource': 'customers'},
+                {'resource': 'products', 'filters': {'price_min': 'barato'}},
+            ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('price_min', response.json()['queries']['1'])
+
+        response = self._post([{'resource': 'products', 'fields': ['id', 'coste']}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('coste', str(response.json()))
+
+
+class OrderSparseFieldsTest(TestCase):
+    """
+    Tests for ?fields= on the order list (joins and prefetches are dropped when not needed).
+    """
+    def setUp(self):
+        customer = Customer.objects.create(name="Ana", email="ana@example.com")
+        product = Product.objects.create(name="Camisa", price=Decimal('20.00'), stock=5)
+        self.order = Order.objects.create(customer=customer)
+        OrderItem.objects.create(order=self.order, product=product, quantity=2, price=Decimal('20.00'))
+        self.url = reverse('compra_api:order-list-create')
+
+    def test_fields_without_items_skip_prefetch(self):
+        """Test that the items query and the customer join only run when those fields are requested."""
+        for serializer in ('default', 'compiled'):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url, {'fields': 'id,status', 'serializer': serializer}, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.json()['results'], [{'id': self.order.pk, 'status': 'PENDIENTE'}])
+            sql = ' '.join(query['sql'] for query in queries.captured_queries)
+            self.assertNotIn('compra_orderitem', sql)
+            self.assertNotIn('JOIN', sql)
+
+        response = self.client.get(self.url, {'fields': 'id,customer_name,items'}, HTTP_ACCEPT='application/json')
+        order = response.json()['results'][0]
+        self.assertEqual(order['customer_name'], "Ana")
+        self.assertEqual(order['items'][0]['quantity'], 2)
+
+
+class OrderFetchByIdsTest(TestCase):
+    """
+    Tests for ?ids= and POST orders/by-ids/.
+    """
+    def setUp(self):
+        customer = Customer.objects.create(name="Ana", email="ana@example.com")
+        product = Product.objects.create(name="Camisa", price=Decimal('20.00'), stock=5)
+        self.orders = [Order.objects.create(customer=customer) for _ in range(3)]
+        OrderItem.objects.create(order=self.orders[0], product=product, quantity=1, price=Decimal('20.00'))
+        self.url = reverse('compra_api:order-list-create')
+        self.by_ids_url = reverse('compra_api:order-by-ids')
+
+    def test_ids_keep_request_order_and_report_missing(self):
+        """Test that ?ids= returns the orders in the requested order with the missing ids listed."""
+        first, second, third = (order.pk for order in self.orders)
+        ids = f'{third},999,{first},{third}'
+        for serializer in ('default', 'compiled'):
+            response = self.client.get(self.url, {'ids': ids, 'serializer': serializer}, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual([order['id'] for order in data['results']], [third, first])
+            self.assertEqual(data['missing'], [999])
+            self.assertEqual(len(data['results'][1]['items']), 1)
+
+    def test_post_by_ids_with_fields(self):
+        """Test that POST by-ids/ reads the ids from the body and honours ?fields=."""
+        first, second, _ = (order.pk for order in self.orders)
+        # validadores ETag no aplican al POST: pedidos (1) + sus líneas (1)
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                f'{self.by_ids_url}?fields=id,items', {'ids': [second, first]},
+                content_type='application/json', HTTP_ACCEPT='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([list(order) for order in response.json()['results']], [['id', 'items'], ['id', 'items']])
+        self.assertEqual([order['id'] for order in response.json()['results']], [second, first])
+
+    @override_settings(FETCH_BY_IDS_MAX=2)
+    def test_invalid_or_too_many_ids_are_rejected(self):
+        """Test that non-numeric ids and lists over FETCH_BY_IDS_MAX return 400."""
+        response = self.client.get(self.url, {'ids': '1,abc'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.by_ids_url, {'ids': [1, 2, 3]}, content_type='application/json', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ids', response.json())
@@ -1,11 +1,13 @@
 # compra/urls_api.py (Este archivo NO CAMBIA respecto a la versión anterior)
 from django.urls import path
+from fenix.batch import FetchByIdsAPIView
 from .api_views import (
     OrderListCreateAPIView,
     OrderRetrieveUpdateDestroyAPIView,
     OrderItemListCreateAPIView,
     OrderItemRetrieveUpdateDestroyAPIView,
-    export_orders_csv_api, export_order_items_csv_api # NUEVAS IMPORTACIONES
+    export_orders_csv_api, export_order_items_csv_api, # NUEVAS IMPORTACIONES
+    order_transition_api,
 )
 
 app_name = 'compra_api'
@@ -13,6 +15,10 @@ app_name = 'compra_api'
 urlpatterns = [
     path('orders/', OrderListCreateAPIView.as_view(), name='order-list-create'),
     path('orders/<int:pk>/', OrderRetrieveUpdateDestroyAPIView.as_view(), name='order-detail'),
+    # Varios pedidos por id (POST {"ids": [...]}, igual que GET /orders/?ids=...)
+    path('orders/by-ids/', FetchByIdsAPIView.as_view(list_view_class=OrderListCreateAPIView), name='order-by-ids'),
+    # Cambio de estado de varios pedidos (POST {"ids": [...], "status": "ENVIADO"})
+    path('orders/transition/', order_transition_api, name='order-transition'),
 
     # Estas URLs para OrderItem individual son opcionales si solo quieres gestionarlos a través de Order
     path('order-items/', OrderItemListCreateAPIView.as_view(), name='orderitem-list-create'),
@@ -1,6 +1,10 @@
+from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
+from .bootstrap import run_bootstrap
+from .cache import CATALOG_NAMESPACE, get_cache_stats
+from .dashboard import MAX_DASHBOARD_DAYS, get_dashboard
 
 @api_view(['GET'])
 def api_root(request, format=None):
@@ -15,23 +19,31 @@ def api_root(request, format=None):
             'categories': {
                 'list_create': reverse('categoría_api:category-list-create', request=request, format=format),
                 'detail': 'http://example.com/api/categories/{id}/',
-                'description': 'CRUD para categorías de productos'
+                'products': 'http://example.com/api/categories/{id}/products/',
+                'description': 'CRUD para categorías de productos (el detalle incluye el resumen de sus productos)'
             },
             'products': {
                 'list_create': reverse('prenda_api:product-list-create', request=request, format=format),
+                'by_ids': reverse('prenda_api:product-by-ids', request=request, format=format),
                 'detail': 'http://example.com/api/products/{id}/',
                 'export_csv': reverse('prenda_api:product-export-csv', request=request, format=format),
+                'lookup': reverse('prenda_api:product-lookup', request=request, format=format),
+                'stock': 'http://example.com/api/products/{id}/stock/?at=AAAA-MM-DD',
                 'description': 'CRUD para productos con soporte de imágenes y filtros avanzados'
             },
             'customers': {
                 'list_create': reverse('cliente_api:customer-list-create', request=request, format=format),
+                'by_ids': reverse('cliente_api:customer-by-ids', request=request, format=format),
                 'detail': 'http://example.com/api/customers/{id}/',
                 'export_csv': reverse('cliente_api:customer-export-csv', request=request, format=format),
+                'lookup': reverse('cliente_api:customer-lookup', request=request, format=format),
                 'description': 'CRUD para clientes'
             },
             'orders': {
                 'list_create': reverse('compra_api:order-list-create', request=request, format=format),
+                'by_ids': reverse('compra_api:order-by-ids', request=request, format=format),
                 'detail': 'http://example.com/api/orders/{id}/',
+                'transition': reverse('compra_api:order-transition', request=request, format=format),
                 'order_items': reverse('compra_api:orderitem-list-create', request=request, format=format),
                 'export_orders_csv': reverse('compra_api:order-export-csv', request=request, format=format),
                 'export_items_csv': reverse('compra_api:orderitem-export-csv', request=request, format=format),
@@ -39,6 +51,7 @@ def api_root(request, format=None):
             },
             'usuarias': {
                 'list_create': reverse('usuarias_api:usuaria-list-create', request=request, format=format),
+                'by_ids': reverse('usuarias_api:usuaria-by-ids', request=request, format=format),
                 'detail': 'http://example.com/api/usuarias/{id}/',
                 'export_csv': reverse('usuarias_api:usuaria-export-csv', request=request, format=format),
                 'statistics': reverse('usuarias_api:usuaria-statistics', request=request, format=format),
@@ -66,6 +79,49 @@ def api_root(request, format=None):
             'create_order': 'POST /api/orders/ with nested items',
             'upload_product_image': 'POST /api/products/ with multipart/form-data',
             'filter_usuarias': 'GET /api/usuarias/?role=ADMIN&is_active=true',
-            'usuarias_stats': 'GET /api/usuarias/statistics/'
-        }
+            'usuarias_stats': 'GET /api/usuarias/statistics/',
+            'sparse_fields': 'GET /api/products/?fields=id,name,price (o ?omit=description)',
+            'by_ids': 'GET /api/orders/?ids=7,3,5 (o POST /api/orders/by-ids/ con {"ids": [7, 3, 5]})',
+            'bulk_status': 'POST /api/orders/transition/ con {"ids": [7, 3, 5], "status": "ENVIADO"}'
+        },
+        'dashboard': reverse('api-dashboard', request=request, format=format),
+        'bootstrap': reverse('api-bootstrap', request=request, format=format),
+        'cache_stats': reverse('api-cache-stats', request=request, format=format),
     })
+
+@api_view(['GET'])
+def cache_stats_api(request):
+    """
+    Aciertos y fallos de la caché de respuestas del catálogo (productos y categorías).
+    Accesible via GET a /api/cache/stats/
+    """
+    return Response(get_cache_stats(CATALOG_NAMESPACE))
+
+@api_view(['GET'])
+def dashboard_api(request):
+    """
+    Resumen para el panel de control: ingresos por estado, pedidos por día,
+    productos más vendidos, stock bajo y clientes.
+    Accesible via GET a /api/dashboard/ (opcional ?days=N, entre 1 y 365)
+    """
+    days = request.query_params.get('days')
+    if days is not None:
+        try:
+            days = int(days)
+        except ValueError:
+            days = 0
+        if not 1 <= days <= MAX_DASHBOARD_DAYS:
+            return Response(
+                {'days': [f'Debe ser un número entre 1 y {MAX_DASHBOARD_DAYS}.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    return Response(get_dashboard(days))
+
+@api_view(['POST'])
+def bootstrap_api(request):
+    """
+    Varios listados en una sola petición (para cargar una pantalla de una vez).
+    Accesible via POST a /api/bootstrap/ con {"queries": [{"resource", "key", "filters", "fields", "limit"}]}.
+    Los filtros son los mismos parámetros que acepta el listado (/api/<resource>/?...).
+    """
+    return Response(run_bootstrap(request, request.data))
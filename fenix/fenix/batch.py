@@ -0,0 +1,125 @@
+# fenix/batch.py
+# Lectura de varios registros conocidos en una sola petición:
+#   GET  /api/<recurso>/?ids=3,1,2
+#   POST /api/<recurso>/by-ids/   {"ids": [3, 1, 2]}   (para listas largas)
+# Es una sola consulta (pk IN (...)) con el queryset, los filtros, ?fields= y el
+# serializador del listado. La respuesta no se pagina, respeta el orden pedido e indica
+# los ids que no existen (o que los filtros excluyen):
+#   {"count": 2, "results": [...], "missing": [2]}
+# Como mucho FETCH_BY_IDS_MAX ids por petición.
+
+from copy import copy
+
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .compiled import compiled_serializers_enabled
+
+IDS_QUERY_PARAM = 'ids'
+
+
+def get_fetch_by_ids_max():
+    return getattr(settings, 'FETCH_BY_IDS_MAX', 100)
+
+
+def parse_ids(value):
+    """'3,1,2' o [3, 1, 2] -> [3, 1, 2], sin repetidos y en el mismo orden."""
+    if isinstance(value, str):
+        items = [item.strip() for item in value.split(',') if item.strip()]
+    elif isinstance(value, list):
+        items = value
+    else:
+        raise ValidationError({IDS_QUERY_PARAM: ['Debe ser una lista de ids.']})
+
+    ids = []
+    for item in items:
+        try:
+            if isinstance(item, (bool, float)):
+                raise ValueError
+            ids.append(int(item))
+        except (TypeError, ValueError):
+            raise ValidationError({IDS_QUERY_PARAM: [f'Id no válido: {item}.']})
+    ids = list(dict.fromkeys(ids))
+
+    max_ids = get_fetch_by_ids_max()
+    if not ids:
+        raise ValidationError({IDS_QUERY_PARAM: ['Indica al menos un id.']})
+    if len(ids) > max_ids:
+        raise ValidationError({IDS_QUERY_PARAM: [f'Como máximo {max_ids} ids por petición.']})
+    return ids
+
+
+def build_read_view(view_class, request, query):
+    """
+    Instancia de view_class para un GET equivalente a la petición con los parámetros
+    `query` (QueryDict), sobre la misma petición HTTP. Pasa por autenticación, permisos
+    y throttling de la vista.
+    """
+    http_request = copy(request._request)
+    http_request.method = 'GET'
+    http_request.GET = query
+
+    view = view_class()
+    view.args, view.kwargs = (), {}
+    view.request = view.initialize_request(http_request)
+    view.headers = view.default_response_headers
+    view.initial(view.request)
+    return view
+
+
+class FetchByIdsMixin:
+    """
+    Mixin para las vistas de listado: con ?ids= el GET devuelve esos registros
+    (ver el comentario del módulo). Debe ir antes de CompiledListMixin en la herencia.
+    """
+
+    def get_requested_ids(self):
+        if not hasattr(self, '_requested_ids'):
+            values = self.request.query_params.getlist(IDS_QUERY_PARAM)
+            self._requested_ids = parse_ids(','.join(values)) if values else None
+        return self._requested_ids
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        ids = self.get_requested_ids() if self.request.method == 'GET' else None
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        ids = self.get_requested_ids()
+        if ids is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if getattr(self, 'compiled_serializer_class', None) and compiled_serializers_enabled(request):
+            serializer = self.get_compiled_serializer()
+            found = {row['pk']: row for row in serializer.values(queryset)}
+            results = serializer.serialize([found[pk] for pk in ids if pk in found])
+        else:
+            found = {obj.pk: obj for obj in queryset}
+            results = self.get_serializer([found[pk] for pk in ids if pk in found], many=True).data
+        return Response({
+            'count': len(results),
+            'results': results,
+            'missing': [pk for pk in ids if pk not in found],
+        })
+
+
+class FetchByIdsAPIView(APIView):
+    """
+    POST <recurso>/by-ids/ con {"ids": [...]}: lo mismo que GET <recurso>/?ids=..., para
+    cuando la lista no cabe cómodamente en la URL. Los demás parámetros (?fields=...)
+    se pasan en la URL igual que en el listado.
+    """
+    list_view_class = None
+
+    def post(self, request, *args, **kwargs):
+        data = request.data if isinstance(request.data, dict) else {}
+        ids = parse_ids(data.get(IDS_QUERY_PARAM))
+        query = request.query_params.copy()
+        query.setlist(IDS_QUERY_PARAM, [','.join(map(str, ids))])
+        view = build_read_view(self.list_view_class, request, query)
+        return view.list(view.request)
@@ -0,0 +1,137 @@
+# fenix/bootstrap.py
+# Carga de una pantalla en una sola petición (POST /api/bootstrap/).
+#
+# El cuerpo es una lista de consultas sobre los listados existentes:
+#   {"queries": [
+#       {"resource": "products", "filters": {"category": 1}, "fields": ["id", "name", "price"]},
+#       {"resource": "orders", "key": "pendientes", "filters": {"status": "PENDIENTE"}, "limit": 20}
+#   ]}
+# Cada consulta pasa por la vista de listado del recurso (mismo queryset, FilterSet,
+# búsqueda, ordenación y serializador, compilado incluido), pero sin paginar: se devuelven
+# como mucho `limit` filas sin COUNT(*). Todas se ejecutan seguidas en la conexión y la
+# transacción de la petición, y solo después de validar todos los filtros.
+
+from django.conf import settings
+from django.db import transaction
+from django.http import QueryDict
+from rest_framework.exceptions import APIException, ValidationError
+
+from categoría.views_api import CategoryListCreateAPIView
+from cliente.api_views import CustomerListCreateAPIView
+from compra.api_views import OrderListCreateAPIView
+from prenda.api_views import ProductListCreateAPIView
+from usuarias.api_views import UsuariaListCreateAPIView
+
+from .batch import build_read_view
+from .compiled import compiled_serializers_enabled
+from .sparse import FIELDS_QUERY_PARAM
+
+BOOTSTRAP_RESOURCES = {
+    'categories': CategoryListCreateAPIView,
+    'customers': CustomerListCreateAPIView,
+    'orders': OrderListCreateAPIView,
+    'products': ProductListCreateAPIView,
+    'usuarias': UsuariaListCreateAPIView,
+}
+
+
+def get_bootstrap_max_rows():
+    return getattr(settings, 'BOOTSTRAP_MAX_ROWS', 500)
+
+
+def get_bootstrap_max_queries():
+    return getattr(settings, 'BOOTSTRAP_MAX_QUERIES', 10)
+
+
+class BootstrapQuery:
+    """Una consulta del lote, ya validada y con su queryset filtrado (sin ejecutar)."""
+
+    def __init__(self, request, spec):
+        self.resource = spec['resource']
+        self.key = spec.get('key') or self.resource
+        self.limit = spec['limit']
+        self.view = self._build_view(request, spec['filters'], spec['fields'])
+        self.queryset = self.view.filter_queryset(self.view.get_queryset())
+
+        if getattr(self.view, 'compiled_serializer_class', None) and compiled_serializers_enabled(self.view.request):
+            self.serializer = self.view.get_compiled_serializer()
+        else:
+            self.serializer = None
+
+    def _build_view(self, request, filters, fields):
+        # Petición GET equivalente a /api/<resource>/?<filters>
+        query = QueryDict(mutable=True)
+        for name, value in filters.items():
+            query.setlist(name, [str(item) for item in value] if isinstance(value, list) else [str(value)])
+        if fields:
+            # ?fields= de la vista: recorta el serializador y la consulta (fenix/sparse.py)
+            query.setlist(FIELDS_QUERY_PARAM, [','.join(fields)])
+        return build_read_view(BOOTSTRAP_RESOURCES[self.resource], request, query)
+
+    def execute(self):
+        # Una fila de más para saber si el resultado está truncado, sin COUNT(*)
+        if self.serializer is not None:
+            rows = list(self.serializer.values(self.queryset)[:self.limit + 1])
+            results = self.serializer.serialize(rows[:self.limit])
+        else:
+            rows = list(self.queryset[:self.limit + 1])
+            results = self.view.get_serializer(rows[:self.limit], many=True).data
+        return {
+            'resource': self.resource,
+            'count': len(results),
+            'truncated': len(rows) > self.limit,
+            'results': results,
+        }
+
+
+def parse_bootstrap_queries(data):
+    """Valida el cuerpo de la petición y devuelve la lista de consultas normalizadas."""
+    queries = data.get('queries') if isinstance(data, dict) else None
+    if not isinstance(queries, list) or not queries:
+        raise ValidationError({'queries': ['Debe ser una lista de consultas no vacía.']})
+    max_queries = get_bootstrap_max_queries()
+    if len(queries) > max_queries:
+        raise ValidationError({'queries': [f'Como máximo {max_queries} consultas por petición.']})
+
+    max_rows = get_bootstrap_max_rows()
+    specs, keys = [], set()
+    for index, query in enumerate(queries):
+        errors = {}
+        if not isinstance(query, dict):
+            raise ValidationError({'queries': {index: ['Cada consulta debe ser un objeto.']}})
+        resource = query.get('resource')
+        if resource not in BOOTSTRAP_RESOURCES:
+            errors['resource'] = [f'Recurso desconocido. Opciones: {", ".join(sorted(BOOTSTRAP_RESOURCES))}.']
+        filters = query.get('filters') or {}
+        if not isinstance(filters, dict):
+            errors['filters'] = ['Debe ser un objeto {filtro: valor}.']
+        fields = query.get('fields') or []
+        if not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+            errors['fields'] = ['Debe ser una lista de nombres de campo.']
+        limit = query.get('limit', max_rows)
+        if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= max_rows:
+            errors['limit'] = [f'Debe ser un número entre 1 y {max_rows}.']
+        key = query.get('key') or resource
+        if key in keys:
+            errors['key'] = [f'Clave repetida: {key}.']
+        if errors:
+            raise ValidationError({'queries': {index: errors}})
+        keys.add(key)
+        specs.append({'resource': resource, 'key': key, 'filters': filters, 'fields': fields, 'limit': limit})
+    return specs
+
+
+def run_bootstrap(request, data):
+    """
+    Ejecuta el lote y devuelve {clave: {resource, count, truncated, results}}.
+    Si un filtro no es válido se lanza ValidationError antes de consultar la base de datos.
+    """
+    prepared = []
+    for index, spec in enumerate(parse_bootstrap_queries(data)):
+        try:
+            prepared.append(BootstrapQuery(request, spec))
+        except APIException as exc:
+            exc.detail = {'queries': {index: exc.detail}}
+            raise
+    with transaction.atomic():
+        return {query.key: query.execute() for query in prepared}
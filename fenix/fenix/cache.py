@@ -0,0 +1,138 @@
+# fenix/cache.py
+# Caché de respuestas para endpoints de lectura que cambian poco (catálogo de productos y categorías).
+#
+# - Las claves llevan una "versión" por espacio de nombres (p. ej. 'catalog'); invalidar
+#   es simplemente incrementar la versión (las entradas viejas caducan solas).
+# - La clave incluye esquema, host, ruta y parámetros normalizados (ordenados): las
+#   respuestas llevan URLs absolutas de media, distintas en http y https.
+# - Protección contra estampidas: solo una petición recalcula una clave caducada;
+#   las demás esperan brevemente a que aparezca en caché.
+# - Contadores de aciertos/fallos por espacio de nombres (get_cache_stats).
+# El backend es el de CACHES['default'] (local-memory por defecto, Redis/Memcached en producción).
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+CATALOG_NAMESPACE = 'catalog'
+
+KEY_PREFIX = 'respcache'
+LOCK_TIMEOUT = 10         # segundos que se mantiene el cerrojo de recálculo
+LOCK_WAIT = 0.05          # segundos entre comprobaciones mientras otro recalcula
+LOCK_MAX_WAIT_STEPS = 20  # máximo de comprobaciones antes de calcular igualmente
+
+
+def response_cache_enabled():
+    return getattr(settings, 'RESPONSE_CACHE_ENABLED', True)
+
+
+def get_response_cache_timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def _version_key(namespace):
+    return f'{KEY_PREFIX}:{namespace}:version'
+
+
+def get_namespace_version(namespace):
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        # Si la versión se perdió (reinicio, expulsión) se empieza en un valor nuevo
+        cache.add(_version_key(namespace), time.time_ns(), None)
+        version = cache.get(_version_key(namespace))
+    return version
+
+
+def invalidate_namespace(namespace):
+    """Invalida todas las respuestas cacheadas de un espacio de nombres."""
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.set(_version_key(namespace), time.time_ns(), None)
+
+
+def _count(namespace, outcome):
+    key = f'{KEY_PREFIX}:{namespace}:{outcome}'
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def get_cache_stats(namespace=CATALOG_NAMESPACE):
+    hits = cache.get(f'{KEY_PREFIX}:{namespace}:hits', 0)
+    misses = cache.get(f'{KEY_PREFIX}:{namespace}:misses', 0)
+    total = hits + misses
+    return {
+        'namespace': namespace,
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+def build_cache_key(request, namespace):
+    params = sorted(
+        (key, tuple(values)) for key, values in request.query_params.lists()
+    )
+    raw = f'{request.scheme}|{request.get_host()}|{request.path}|{params}'
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{namespace}:{get_namespace_version(namespace)}:{digest}'
+
+
+def cached_response(request, namespace, compute):
+    """
+    Devuelve la respuesta cacheada para la petición o la calcula con compute().
+    Solo se guardan respuestas 200; la cabecera X-Cache indica HIT o MISS.
+    """
+    if not response_cache_enabled():
+        return compute()
+
+    key = build_cache_key(request, namespace)
+    lock_key = f'{key}:lock'
+    cached = cache.get(key)
+    locked = False
+
+    if cached is None:
+        locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+        if not locked:
+            # Otra petición está calculando esta misma clave: esperamos un poco
+            for _ in range(LOCK_MAX_WAIT_STEPS):
+                time.sleep(LOCK_WAIT)
+                cached = cache.get(key)
+                if cached is not None:
+                    break
+
+    if cached is not None:
+        _count(namespace, 'hits')
+        response = Response(cached)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    _count(namespace, 'misses')
+    try:
+        response = compute()
+        if response.status_code == 200:
+            cache.set(key, response.data, get_response_cache_timeout())
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+class CachedResponseMixin:
+    """
+    Mixin para vistas genéricas de DRF: cachea las respuestas GET en cache_namespace.
+    Debe ir antes de la vista genérica en la herencia.
+    """
+    cache_namespace = CATALOG_NAMESPACE
+
+    def get(self, request, *args, **kwargs):
+        return cached_response(
+            request, self.cache_namespace, lambda: super(CachedResponseMixin, self).get(request, *args, **kwargs)
+        )
@@ -0,0 +1,168 @@
+# fenix/compiled.py
+# Serializadores de lectura "compilados" para los listados.
+#
+# Un ModelSerializer recorre por cada fila y campo get_attribute/to_representation y
+# los SerializerMethodField. Aquí el serializador de siempre se inspecciona UNA vez y se
+# convierte en un plan (campo de salida, columna de .values(), conversión), que luego
+# se aplica a filas de .values() sin crear instancias de modelo.
+# La salida es idéntica (mismas claves, mismo orden y mismo formato) a la del
+# serializador original, que sigue siendo la referencia y el que se usa por defecto.
+#
+# Se activa con COMPILED_READ_SERIALIZERS=True o por petición con ?serializer=compiled
+# (?serializer=default fuerza el de siempre).
+
+from django.conf import settings
+from rest_framework import fields, relations
+from rest_framework.response import Response
+
+from .sparse import SparseFieldsetMixin
+
+SERIALIZER_QUERY_PARAM = 'serializer'
+
+
+def compiled_serializers_enabled(request):
+    choice = request.query_params.get(SERIALIZER_QUERY_PARAM)
+    if choice == 'compiled':
+        return True
+    if choice == 'default':
+        return False
+    return getattr(settings, 'COMPILED_READ_SERIALIZERS', False)
+
+
+_SKIP = object()
+
+
+def _missing_value(field):
+    """Lo que hace Field.get_attribute cuando falta un objeto intermedio del source."""
+    if field.default is not fields.empty:
+        return field.get_default()
+    if field.allow_null:
+        return None
+    return _SKIP
+
+
+def _identity(value):
+    return value
+
+
+def _converter(field):
+    """Conversión equivalente a field.to_representation, directa para los tipos simples."""
+    field_type = type(field)
+    if field_type in (fields.CharField, fields.EmailField):
+        return str
+    if field_type is fields.IntegerField:
+        return int
+    if field_type is fields.BooleanField:
+        return bool
+    if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+        return _identity
+    return field.to_representation
+
+
+class CompiledSerializer:
+    """
+    Base de los serializadores compilados. Las subclases indican:
+    - serializer_class: el serializador de referencia (de él salen campos y formatos).
+    - columns: {campo: columna de .values()} cuando no se deduce del source del campo.
+    - computed: {campo: nombre de método(row)} para campos calculados (SerializerMethodField,
+      propiedades...). Las columnas que necesiten se declaran en extra_columns.
+    """
+    serializer_class = None
+    columns = {}
+    computed = {}
+    extra_columns = ()
+
+    _plans = {}
+
+    def __init__(self, context=None, fields=None):
+        self.context = context or {}
+        # Solo estos campos de salida (?fields= / ?omit=, ver fenix/sparse.py); None = todos
+        self.field_names = None if fields is None else set(fields)
+
+    @classmethod
+    def get_plan(cls):
+        plan = CompiledSerializer._plans.get(cls)
+        if plan is None:
+            plan = CompiledSerializer._plans[cls] = cls._compile()
+        return plan
+
+    @classmethod
+    def _compile(cls):
+        plan = []
+        for name, field in cls.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if name in cls.computed:
+                plan.append((name, None, cls.computed[name], (), None))
+                continue
+            column = cls.columns.get(name) or '__'.join(field.source_attrs)
+            # Con source='relacion.campo' y la relación a NULL, DRF omite el campo (o usa
+            # None / el default): se replica comprobando las FK intermedias de la fila.
+            hops = tuple('__'.join(field.source_attrs[:i]) for i in range(1, len(field.source_attrs)))
+            plan.append((name, column, _converter(field), hops, _missing_value(field)))
+        return plan
+
+    def get_field_plan(self):
+        plan = self.get_plan()
+        if self.field_names is None:
+            return plan
+        return [step for step in plan if step[0] in self.field_names]
+
+    def get_columns(self):
+        columns = []
+        for _, column, _, hops, _ in self.get_field_plan():
+            for needed in (*hops, column):
+                if needed is not None and needed not in columns:
+                    columns.append(needed)
+        columns += [column for column in self.extra_columns if column not in columns]
+        return columns
+
+    def values(self, queryset, *extra):
+        """Queryset de filas (dict) con las columnas necesarias y 'pk'; prefetch_related no aplica."""
+        columns = self.get_columns()
+        columns += [column for column in ('pk', *extra) if column not in columns]
+        return queryset.prefetch_related(None).values(*columns)
+
+    def to_representation(self, row):
+        data = {}
+        for name, column, convert, hops, missing in self.get_field_plan():
+            if column is None:
+                data[name] = getattr(self, convert)(row)
+                continue
+            if hops and any(row[hop] is None for hop in hops):
+                if missing is not _SKIP:
+                    data[name] = missing
+                continue
+            value = row[column]
+            data[name] = None if value is None else convert(value)
+        return data
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class CompiledListMixin(SparseFieldsetMixin):
+    """
+    Mixin para vistas ListAPIView/ListCreateAPIView: si los serializadores compilados
+    están activos, el GET del listado usa compiled_serializer_class sobre .values().
+    Filtros, búsqueda, ordenación, paginación y ?fields= / ?omit= son los mismos de la vista.
+    """
+    compiled_serializer_class = None
+
+    def get_compiled_serializer(self):
+        return self.compiled_serializer_class(context=self.get_serializer_context(), fields=self.get_sparse_fields())
+
+    def list(self, request, *args, **kwargs):
+        if self.compiled_serializer_class is None or not compiled_serializers_enabled(request):
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_compiled_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        # Los campos de ordenación hacen falta en la fila para la paginación por cursor
+        ordering_fields = self.ordering_fields if isinstance(self.ordering_fields, (list, tuple)) else ()
+        rows = serializer.values(queryset, *ordering_fields)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(rows))
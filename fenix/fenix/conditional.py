@@ -0,0 +1,105 @@
+# fenix/conditional.py
+# Peticiones GET condicionales (ETag / Last-Modified) para listados y detalles.
+#
+# Los validadores se calculan sin serializar nada:
+#   - detalle: updated_at de la fila (una consulta de una columna).
+#   - listado: MAX(updated_at) + COUNT(*) del queryset ya filtrado (una agregación).
+# Si el cliente envía If-None-Match / If-Modified-Since y no hay cambios se responde
+# 304 Not Modified sin ejecutar el serializador.
+#
+# Las respuestas también muestran datos de filas relacionadas (nombre del cliente en los
+# pedidos, de los productos en sus líneas, de la categoría en los productos). Al cambiar
+# ese nombre se actualiza updated_at de las filas que lo muestran (ver name_changed y los
+# receptores post_save de cada modelo), así que el validador sigue siendo una sola columna.
+
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .cache import build_cache_key, get_response_cache_timeout, response_cache_enabled
+
+
+def remember_loaded_name(instance):
+    """Guarda el nombre con el que se cargó la fila (llamar desde Model.from_db)."""
+    instance._loaded_name = instance.__dict__.get('name')
+
+
+def name_changed(instance, created, update_fields=None):
+    """True si al guardar una fila existente ha cambiado su nombre (o no se sabe con cuál se cargó)."""
+    if created or (update_fields is not None and 'name' not in update_fields):
+        return False
+    loaded = getattr(instance, '_loaded_name', None)
+    instance._loaded_name = instance.name
+    return loaded != instance.name
+
+
+class ConditionalGetMixin:
+    """
+    Mixin para vistas genéricas de DRF con un campo de fecha de modificación.
+    Debe ir el primero en la herencia (antes de CachedResponseMixin).
+    """
+    last_modified_field = 'updated_at'
+
+    def _is_detail_request(self):
+        return (self.lookup_url_kwarg or self.lookup_field) in self.kwargs
+
+    def get_conditional_validators(self, request):
+        """Devuelve (etag, last_modified) para la petición, o (None, None) si no aplica."""
+        field = self.last_modified_field
+        if self._is_detail_request():
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            row = (
+                self.get_queryset()
+                .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+                .values_list('pk', field)
+                .first()
+            )
+            if row is None or row[1] is None:
+                return None, None
+            pk, last_modified = row
+            raw = f'{pk}:{last_modified.isoformat()}'
+        else:
+            validators = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+                last_modified=Max(field), count=Count('pk')
+            )
+            last_modified = validators['last_modified']
+            raw = f"{validators['count']}:{last_modified.isoformat() if last_modified else ''}"
+
+        etag = 'W/"%s"' % hashlib.md5(raw.encode('utf-8'), usedforsecurity=False).hexdigest()
+        return etag, last_modified
+
+    def _get_validators(self, request):
+        # Si la vista también cachea respuestas (CachedResponseMixin), los validadores se
+        # guardan en el mismo espacio versionado y se invalidan con él.
+        namespace = getattr(self, 'cache_namespace', None)
+        if namespace is None or not response_cache_enabled():
+            return self.get_conditional_validators(request)
+        key = f'{build_cache_key(request, namespace)}:validators'
+        validators = cache.get(key)
+        if validators is None:
+            validators = self.get_conditional_validators(request)
+            cache.set(key, validators, get_response_cache_timeout())
+        return validators
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self._get_validators(request)
+        last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+
+        if etag is not None:
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified_ts)
+            if not_modified is not None:
+                patch_vary_headers(not_modified, ['Accept'])
+                return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if etag is not None and response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified_ts is not None:
+                response['Last-Modified'] = http_date(last_modified_ts)
+            # El navegador guarda la respuesta pero revalida siempre con el ETag
+            response['Cache-Control'] = 'no-cache'
+            patch_vary_headers(response, ['Accept'])
+        return response
@@ -0,0 +1,139 @@
+# fenix/dashboard.py
+# Datos agregados del panel de control (/api/dashboard/).
+#
+# Todo se calcula en la base de datos con un número fijo de consultas (una por bloque,
+# cinco en total) sin importar cuántos pedidos, productos o clientes haya. El resultado
+# se guarda en la caché durante DASHBOARD_CACHE_TTL segundos.
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from cliente.models import Customer
+from compra.models import Order, OrderItem, order_line_total
+from prenda.models import Product
+
+DASHBOARD_CACHE_KEY = 'dashboard'
+MAX_DASHBOARD_DAYS = 365
+TOP_PRODUCTS_LIMIT = 5
+
+
+def get_dashboard_days():
+    return getattr(settings, 'DASHBOARD_DAYS', 30)
+
+
+def get_dashboard_cache_ttl():
+    return getattr(settings, 'DASHBOARD_CACHE_TTL', 60)
+
+
+def get_low_stock_threshold():
+    return getattr(settings, 'LOW_STOCK_THRESHOLD', 5)
+
+
+def _revenue_by_status():
+    rows = {
+        row['status']: row
+        for row in Order.objects.order_by().values('status').annotate(
+            pedidos=Count('pk'), ingresos=Sum('total_amount')
+        )
+    }
+    # Se incluyen todos los estados, aunque no tengan pedidos
+    return [
+        {
+            'estado': value,
+            'nombre': label,
+            'pedidos': rows.get(value, {}).get('pedidos', 0),
+            'ingresos': rows.get(value, {}).get('ingresos') or Decimal('0.00'),
+        }
+        for value, label in Order.STATUS_CHOICES
+    ]
+
+
+def _orders_per_day(since, days):
+    rows = {
+        row['day']: row
+        for row in Order.objects.filter(order_date__gte=since).order_by()
+        .annotate(day=TruncDate('order_date'))
+        .values('day')
+        .annotate(pedidos=Count('pk'), ingresos=Sum('total_amount'))
+    }
+    # Serie continua (los días sin pedidos van a cero) para poder pintarla directamente
+    first_day = since.date()
+    series = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        row = rows.get(day, {})
+        series.append({
+            'fecha': day.isoformat(),
+            'pedidos': row.get('pedidos', 0),
+            'ingresos': row.get('ingresos') or Decimal('0.00'),
+        })
+    return series
+
+
+def _top_products(limit):
+    return list(
+        OrderItem.objects.exclude(order__status='CANCELADO').order_by()
+        .values('product_id', 'product__name')
+        .annotate(unidades=Sum('quantity'), ingresos=Sum(order_line_total()))
+        .order_by('-unidades', '-ingresos', 'product_id')[:limit]
+        .values('product_id', 'product__name', 'unidades', 'ingresos')
+    )
+
+
+def _stock_summary():
+    threshold = get_low_stock_threshold()
+    summary = Product.objects.aggregate(
+        total_productos=Count('pk'),
+        stock_bajo=Count('pk', filter=Q(stock__gt=0, stock__lte=threshold)),
+        sin_stock=Count('pk', filter=Q(stock__lte=0)),
+    )
+    summary['umbral_stock_bajo'] = threshold
+    return summary
+
+
+def _customer_summary(since):
+    has_orders = Exists(Order.objects.filter(customer=OuterRef('pk')))
+    return Customer.objects.aggregate(
+        total_clientes=Count('pk'),
+        clientes_nuevos=Count('pk', filter=Q(created_at__gte=since)),
+        clientes_con_pedidos=Count('pk', filter=Q(has_orders)),
+    )
+
+
+def build_dashboard(days=None):
+    """Calcula los datos del panel para los últimos `days` días (sin caché)."""
+    days = days or get_dashboard_days()
+    today = timezone.localdate()
+    since = timezone.make_aware(datetime.combine(today - timedelta(days=days - 1), time.min))
+    por_estado = _revenue_by_status()
+    return {
+        'periodo_dias': days,
+        'ingresos_totales': sum(
+            (row['ingresos'] for row in por_estado if row['estado'] != 'CANCELADO'), Decimal('0.00')
+        ),
+        'por_estado': por_estado,
+        'pedidos_por_dia': _orders_per_day(since, days),
+        'productos_mas_vendidos': [
+            {'id': row['product_id'], 'nombre': row['product__name'],
+             'unidades': row['unidades'], 'ingresos': row['ingresos']}
+            for row in _top_products(TOP_PRODUCTS_LIMIT)
+        ],
+        'stock': _stock_summary(),
+        'clientes': _customer_summary(since),
+        'generado': timezone.now().isoformat(),
+    }
+
+
+def get_dashboard(days=None):
+    """Datos del panel, servidos desde la caché mientras no caduquen."""
+    days = days or get_dashboard_days()
+    ttl = get_dashboard_cache_ttl()
+    if ttl <= 0:
+        return build_dashboard(days)
+    return cache.get_or_set(f'{DASHBOARD_CACHE_KEY}:{days}', lambda: build_dashboard(days), ttl)
@@ -0,0 +1,83 @@
+# fenix/exports.py
+# Exportación CSV en streaming compartida por todas las apps.
+# Las filas se leen por bloques (keyset sobre la pk, sin OFFSET ni caché del queryset)
+# y se envían al cliente a medida que se generan, así la memoria no crece con el tamaño de la tabla.
+
+import csv
+import zlib
+from operator import attrgetter
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+# Filas de CSV que se agrupan en cada trozo enviado al cliente
+ROWS_PER_CHUNK = 500
+
+
+class Echo:
+    """Pseudo-buffer para csv.writer: devuelve la línea escrita en vez de guardarla."""
+    def write(self, value):
+        return value
+
+
+def get_export_chunk_size():
+    return getattr(settings, 'CSV_EXPORT_CHUNK_SIZE', 2000)
+
+
+def iter_keyset(queryset, chunk_size=None, key=attrgetter('pk')):
+    """
+    Recorre el queryset en orden de pk por bloques de chunk_size filas
+    (WHERE pk > último ORDER BY pk LIMIT n). Funciona con instancias o con
+    values_list indicando en key cómo obtener la pk de cada fila.
+    """
+    chunk_size = chunk_size or get_export_chunk_size()
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = key(rows[-1])
+
+
+def _csv_chunks(header, rows):
+    writer = csv.writer(Echo())
+    buffer = [writer.writerow(header)]
+    for row in rows:
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= ROWS_PER_CHUNK:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _gzip_chunks(chunks):
+    # wbits=31 -> cabecera y cola en formato gzip (.gz)
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def wants_gzip(request):
+    return request.GET.get('compress', '').lower() == 'gzip'
+
+
+def stream_csv_response(request, filename, header, rows):
+    """
+    Devuelve un StreamingHttpResponse con el CSV (cabecera + filas).
+    Con ?compress=gzip el fichero se comprime al vuelo y se descarga como <filename>.gz.
+    """
+    chunks = _csv_chunks(header, rows)
+    if wants_gzip(request):
+        response = StreamingHttpResponse(_gzip_chunks(chunks), content_type='application/gzip')
+        filename = f"{filename}.gz"
+    else:
+        response = StreamingHttpResponse(chunks, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,158 @@
+# fenix/images.py
+# Variantes redimensionadas (WebP) de las imágenes subidas.
+#
+# La imagen original se guarda tal cual; a partir de ella se generan versiones más
+# ligeras (p. ej. thumb/medium/full para productos) que son las que deben usar los
+# listados. El trabajo con Pillow se hace fuera de la petición: al confirmar la
+# transacción se encola en un pool de hilos del propio proceso (IMAGE_PROCESSING_MODE=
+# 'background', por defecto) o se hace en el momento con 'sync' (tests, scripts).
+# Para las imágenes ya existentes hay comandos de backfill con un pool de procesos.
+
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .storage import is_media_referenced, is_shared_storage
+
+logger = logging.getLogger(__name__)
+
+IMAGE_PROCESSING_BACKGROUND = 'background'
+IMAGE_PROCESSING_SYNC = 'sync'
+
+_executor = None
+
+
+def get_image_processing_mode():
+    return getattr(settings, 'IMAGE_PROCESSING_MODE', IMAGE_PROCESSING_BACKGROUND)
+
+
+def get_webp_quality():
+    return getattr(settings, 'IMAGE_WEBP_QUALITY', 80)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2), thread_name_prefix='images'
+        )
+    return _executor
+
+
+def _run_task(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Error generando variantes de imagen (%s)', func.__name__)
+    finally:
+        # Los hilos del pool abren sus propias conexiones a la base de datos
+        close_old_connections()
+
+
+def schedule_image_task(func, *args):
+    """
+    Ejecuta func(*args) cuando se confirme la transacción actual: en segundo plano
+    o en el momento según IMAGE_PROCESSING_MODE.
+    """
+    def run():
+        if get_image_processing_mode() == IMAGE_PROCESSING_SYNC:
+            func(*args)
+        else:
+            _get_executor().submit(_run_task, func, *args)
+    transaction.on_commit(run)
+
+
+def open_image(source):
+    """Abre una imagen aplicando la orientación EXIF (las fotos de móvil vienen giradas)."""
+    image = Image.open(source)
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    return image
+
+
+def encode_webp(image, quality=None):
+    """Codifica en WebP sin metadatos (EXIF, GPS...)."""
+    buffer = BytesIO()
+    image.save(buffer, format='WEBP', quality=quality or get_webp_quality(), method=4)
+    return buffer.getvalue()
+
+
+def resize_to_fit(image, max_size):
+    """Copia reducida para que el lado mayor no pase de max_size (nunca amplía)."""
+    resized = image.copy()
+    resized.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    return resized
+
+
+def crop_to_square(image, size):
+    """Recorte centrado a un cuadrado de size x size (avatars)."""
+    return ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+
+
+def save_hashed(storage, directory, content, extension='webp'):
+    """
+    Guarda el contenido con un nombre derivado de su hash (directorio/<sha256>.ext).
+    Si ya existe un fichero con ese contenido se reutiliza. Como el nombre cambia
+    cuando cambia el contenido, la URL se puede cachear como inmutable.
+    """
+    digest = hashlib.sha256(content).hexdigest()[:32]
+    name = f'{directory}/{digest}.{extension}'
+    if storage.exists(name):
+        return name
+    return storage.save(name, ContentFile(content))
+
+
+def variant_name(name, variant):
+    """products/foto.jpg -> products/variants/foto__thumb.webp"""
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f'{stem}__{variant}.webp')
+
+
+def save_variant(storage, name, content):
+    """Guarda (sobrescribiendo) una variante con el nombre exacto indicado."""
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(content))
+
+
+def delete_file(storage, name):
+    """
+    Borra un fichero que ya no se usa. Si el storage comparte ficheros entre registros,
+    solo se borra cuando ningún otro registro lo referencia.
+    """
+    if is_shared_storage(storage) and is_media_referenced(name):
+        return
+    storage.delete(name)
+
+
+def delete_variants(storage, variants):
+    if is_shared_storage(storage):
+        return
+    for name in (variants or {}).values():
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.warning('No se pudo borrar la variante %s', name)
+
+
+def generate_resized_variants(storage, name, sizes, quality=None):
+    """
+    Genera una variante WebP por cada (variante, lado máximo) de sizes a partir de la
+    imagen `name` del storage. Devuelve {variante: nombre guardado}.
+    """
+    with storage.open(name, 'rb') as source:
+        image = open_image(source)
+        image.load()
+    return {
+        variant: save_variant(storage, variant_name(name, variant), encode_webp(resize_to_fit(image, max_size), quality))
+        for variant, max_size in sizes.items()
+    }
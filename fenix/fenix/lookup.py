@@ -0,0 +1,52 @@
+# fenix/lookup.py
+# Endpoints de "lookup" para desplegables y autocompletado.
+#
+# Devuelven toda la tabla (o lo que empiece por ?q=) en una sola respuesta y en formato
+# compacto: una lista de filas [id, etiqueta, ...] más la lista de nombres de columna,
+# sin serializadores ni paginación. El filtro por prefijo usa UPPER(campo) LIKE 'TEXTO%',
+# que en PostgreSQL aprovecha un índice UPPER(campo) text_pattern_ops.
+# Las vistas concretas añaden ConditionalGetMixin (ETag / Last-Modified), así que el
+# frontend puede revalidar la lista sin volver a descargarla.
+
+from django.db.models.functions import Upper
+from rest_framework import generics
+from rest_framework.response import Response
+
+
+class LookupAPIView(generics.GenericAPIView):
+    """
+    Vista base. Las subclases definen queryset, lookup_columns (columnas de values_list,
+    en orden) y label_field (campo por el que se ordena y se filtra con ?q=).
+    """
+    lookup_columns = ('id', 'name')
+    label_field = 'name'
+    prefix_query_param = 'q'
+    limit_query_param = 'limit'
+    pagination_class = None
+    filter_backends = []
+
+    def filter_queryset(self, queryset):
+        queryset = queryset.annotate(lookup_label=Upper(self.label_field))
+        prefix = self.request.query_params.get(self.prefix_query_param, '').strip()
+        if prefix:
+            queryset = queryset.filter(lookup_label__startswith=prefix.upper())
+        # Orden alfabético sin distinguir mayúsculas, como se muestra en los desplegables
+        return queryset.order_by('lookup_label', 'pk')
+
+    def format_row(self, row):
+        return list(row)
+
+    def get(self, request, *args, **kwargs):
+        rows = self.filter_queryset(self.get_queryset()).values_list(*self.lookup_columns)
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, 0))
+        except ValueError:
+            limit = 0
+        if limit > 0:
+            rows = rows[:limit]
+        results = [self.format_row(row) for row in rows]
+        return Response({
+            'fields': list(self.lookup_columns),
+            'count': len(results),
+            'results': results,
+        })
@@ -0,0 +1,55 @@
+# fenix/media.py
+# URLs de los ficheros subidos (imágenes de productos, avatars) para las respuestas.
+#
+# En vez de llamar a request.build_absolute_uri(field.url) en cada fila, la URL base
+# ("https://host/media/" o la del CDN) se calcula una vez por petición y por storage,
+# y para cada fichero solo se concatena el nombre ya codificado.
+# Con MEDIA_CDN_ORIGIN (p. ej. https://cdn.example.com) las URLs apuntan al CDN
+# aunque no haya petición.
+# Los storages que no son de sistema de ficheros (S3, etc.) construyen sus propias
+# URLs: para ellos se sigue usando storage.url().
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+
+
+def get_media_cdn_origin():
+    return getattr(settings, 'MEDIA_CDN_ORIGIN', '').rstrip('/')
+
+
+def get_media_base_url(storage, request=None):
+    """URL base (terminada en /) de los ficheros de un storage, cacheada en la petición."""
+    cache = getattr(request, '_media_base_urls', None) if request is not None else None
+    if cache is not None and id(storage) in cache:
+        return cache[id(storage)]
+
+    base_url = storage.base_url
+    cdn_origin = get_media_cdn_origin()
+    if cdn_origin and base_url.startswith('/') and not base_url.startswith('//'):
+        base_url = cdn_origin + base_url
+    elif request is not None:
+        base_url = request.build_absolute_uri(base_url)
+
+    if request is not None:
+        if cache is None:
+            cache = {}
+            request._media_base_urls = cache
+        cache[id(storage)] = base_url
+    return base_url
+
+
+def media_url(file_or_name, request=None, storage=None):
+    """
+    URL pública de un fichero: acepta un FieldFile (obj.image) o el nombre guardado
+    en la base de datos junto con su storage. Devuelve None si no hay fichero.
+    """
+    name = getattr(file_or_name, 'name', file_or_name)
+    if not name:
+        return None
+    storage = storage or file_or_name.storage
+
+    if not isinstance(storage, FileSystemStorage):
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return get_media_base_url(storage, request) + filepath_to_uri(name).lstrip('/')
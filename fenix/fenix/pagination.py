@@ -0,0 +1,112 @@
+# fenix/pagination.py
+# Paginación para los listados grandes (pedidos, líneas de pedido y productos).
+
+from collections import OrderedDict
+
+from django.template import loader
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class StableCursorPagination(CursorPagination):
+    """
+    Paginación por cursor que respeta el ?ordering= de la vista y añade la pk
+    como desempate, de modo que el orden es estable aunque el primer campo se repita
+    (p. ej. varios productos con el mismo precio).
+    """
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view))
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            descending = ordering[0].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        return tuple(ordering)
+
+
+class FlexiblePagination(PageNumberPagination):
+    """
+    Paginación por páginas (?page=) como hasta ahora, con dos opciones:
+    - ?pagination=cursor (y después ?cursor=...): paginación por cursor, sin COUNT(*) ni OFFSET.
+      Es la recomendada para recorrer listados largos desde el frontend.
+    - ?count=false: páginas numeradas sin calcular el total exacto ("count": null).
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+
+    def __init__(self):
+        self._cursor_paginator = None
+        self._without_count = False
+
+    def use_cursor(self, request):
+        return (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self._cursor_paginator = StableCursorPagination()
+            self._cursor_paginator.page_size = self.page_size
+            page = self._cursor_paginator.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self._cursor_paginator.display_page_controls
+            return page
+
+        if request.query_params.get(self.count_query_param, '').lower() == 'false':
+            return self._paginate_without_count(queryset, request)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def _paginate_without_count(self, queryset, request):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        try:
+            page_number = int(request.query_params.get(self.page_query_param, 1))
+        except (TypeError, ValueError):
+            page_number = 0
+        if page_number < 1:
+            raise NotFound('Página no válida.')
+
+        offset = (page_number - 1) * page_size
+        # Se pide una fila de más para saber si hay página siguiente sin hacer COUNT(*)
+        rows = list(queryset[offset:offset + page_size + 1])
+        if not rows and page_number > 1:
+            raise NotFound('Página no válida.')
+
+        self._without_count = True
+        self.request = request
+        self._page_number = page_number
+        self._has_next = len(rows) > page_size
+        self.display_page_controls = self.template is not None and (self._has_next or page_number > 1)
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if self._cursor_paginator is not None:
+            return self._cursor_paginator.get_paginated_response(data)
+        if self._without_count:
+            return Response(OrderedDict([
+                ('count', None),
+                ('next', self._get_uncounted_link(self._page_number + 1) if self._has_next else None),
+                ('previous', self._get_uncounted_link(self._page_number - 1) if self._page_number > 1 else None),
+                ('results', data),
+            ]))
+        return super().get_paginated_response(data)
+
+    def _get_uncounted_link(self, page_number):
+        url = self.request.build_absolute_uri()
+        if page_number == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, page_number)
+
+    def to_html(self):
+        if self._cursor_paginator is not None:
+            return self._cursor_paginator.to_html()
+        if self._without_count:
+            template = loader.get_template(StableCursorPagination.template)
+            return template.render({
+                'previous_url': self._get_uncounted_link(self._page_number - 1) if self._page_number > 1 else None,
+                'next_url': self._get_uncounted_link(self._page_number + 1) if self._has_next else None,
+            })
+        return super().to_html()
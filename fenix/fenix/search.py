@@ -0,0 +1,101 @@
+# fenix/search.py
+# Backend de búsqueda para los listados (?search=).
+#
+# En PostgreSQL se busca en una columna search_vector (SearchVectorField con índice GIN)
+# que se mantiene al guardar cada modelo, y además por similitud trigram en los campos
+# de nombre (tolerante a erratas y a palabras incompletas, también con índice GIN).
+# Los resultados se ordenan por relevancia salvo que se pida ?ordering=.
+# En otras bases de datos (SQLite en los tests) o con SEARCH_BACKEND='basic' se usa el
+# SearchFilter de DRF de siempre (icontains sobre search_fields).
+
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity,
+)
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from rest_framework import filters
+
+
+def get_search_config():
+    return getattr(settings, 'SEARCH_CONFIG', 'spanish')
+
+
+def full_text_enabled(using='default'):
+    """True si la búsqueda completa está activa y la base de datos es PostgreSQL."""
+    backend = getattr(settings, 'SEARCH_BACKEND', 'postgres')
+    return backend == 'postgres' and connections[using].vendor == 'postgresql'
+
+
+def weighted_search_vector(weighted_fields):
+    """
+    Construye el SearchVector de un modelo a partir de [(campo, peso), ...],
+    p. ej. [('name', 'A'), ('description', 'B')].
+    """
+    config = get_search_config()
+    vectors = [SearchVector(field, weight=weight, config=config) for field, weight in weighted_fields]
+    return reduce(lambda left, right: left + right, vectors)
+
+
+def refresh_search_vector(instance, weighted_fields, update_fields=None):
+    """
+    Recalcula la columna search_vector de una instancia ya guardada (solo PostgreSQL).
+    Si el guardado se limitó a campos que no intervienen en la búsqueda, no hace nada.
+    """
+    if not full_text_enabled(instance._state.db):
+        return
+    if update_fields is not None and not {field for field, _ in weighted_fields} & set(update_fields):
+        return
+    type(instance)._default_manager.using(instance._state.db).filter(pk=instance.pk).update(
+        search_vector=weighted_search_vector(weighted_fields)
+    )
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter con búsqueda de texto completo y trigram en PostgreSQL.
+
+    La vista puede definir:
+    - search_vector_field: columna SearchVectorField (por defecto 'search_vector').
+    - trigram_search_fields: campos para la búsqueda aproximada por trigramas.
+    """
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not full_text_enabled(queryset.db):
+            return super().filter_queryset(request, queryset, view)
+
+        text = ' '.join(terms)
+        vector_field = getattr(view, 'search_vector_field', 'search_vector')
+        trigram_fields = getattr(view, 'trigram_search_fields', [])
+
+        query = SearchQuery(text, search_type='websearch', config=get_search_config())
+        queryset = queryset.annotate(search_rank=SearchRank(F(vector_field), query))
+        conditions = [Q(**{vector_field: query})]
+        ranking = ['-search_rank']
+
+        if trigram_fields:
+            similarities = [TrigramWordSimilarity(text, field) for field in trigram_fields]
+            queryset = queryset.annotate(
+                search_similarity=similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+            )
+            conditions += [Q(**{f'{field}__trigram_word_similar': text}) for field in trigram_fields]
+            ranking.append('-search_similarity')
+
+        # Orden por relevancia; RankedOrderingFilter lo respeta si no se pide ?ordering=
+        return queryset.filter(reduce(or_, conditions)).order_by(*ranking, 'pk')
+
+
+class RankedOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter que no pisa el orden por relevancia de FullTextSearchFilter
+    cuando el cliente no ha pedido un ?ordering= explícito.
+    """
+    def filter_queryset(self, request, queryset, view):
+        ranked = 'search_rank' in queryset.query.annotations
+        if ranked and not request.query_params.get(self.ordering_param):
+            return queryset
+        return super().filter_queryset(request, queryset, view)
@@ -52,6 +52,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'django_filters',
@@ -107,6 +108,21 @@ DATABASES = {
 }
 
 
+# Cache
+# Local-memory por defecto; en producción se puede apuntar a Redis/Memcached, p. ej.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://...
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='fenix-default'),
+    }
+}
+
+# Caché de respuestas del catálogo (productos y categorías), ver fenix/cache.py
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -150,12 +166,65 @@ STATICFILES_DIRS = [
 # Media files (User uploaded content)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Origen opcional de un CDN delante de MEDIA_URL (p. ej. https://cdn.example.com);
+# las URLs de imágenes y avatars de la API se construyen con él (fenix/media.py)
+MEDIA_CDN_ORIGIN = config('MEDIA_CDN_ORIGIN', default='')
+# Imágenes y avatars con nombre = hash del contenido (deduplicados y cacheables como
+# inmutables, ver fenix/storage.py). Los huérfanos se borran con collect_orphan_media
+MEDIA_CONTENT_ADDRESSED = config('MEDIA_CONTENT_ADDRESSED', default=True, cast=bool)
+# Servir MEDIA_ROOT desde Django (con las cabeceras de caché de fenix/storage.py); solo
+# en desarrollo por defecto, en producción los sirve el servidor web o el CDN
+SERVE_MEDIA = config('SERVE_MEDIA', default=DEBUG, cast=bool)
+
+# Variantes WebP de las imágenes subidas (fenix/images.py):
+#   'background' -> se generan en un pool de hilos tras confirmar la transacción
+#   'sync'       -> se generan en el momento (tests, scripts)
+IMAGE_PROCESSING_MODE = config('IMAGE_PROCESSING_MODE', default='background')
+IMAGE_PROCESSING_WORKERS = config('IMAGE_PROCESSING_WORKERS', default=2, cast=int)
+IMAGE_WEBP_QUALITY = config('IMAGE_WEBP_QUALITY', default=80, cast=int)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Mantenimiento de Order.total_amount al escribir OrderItems:
+#   'incremental' -> UPDATE atómico con la diferencia de cada línea (por defecto)
+#   'on_commit'   -> un único recálculo por pedido al confirmar la transacción
+# Los totales se pueden verificar/corregir con: python manage.py reconcile_order_totals
+ORDER_TOTALS_MODE = config('ORDER_TOTALS_MODE', default='incremental')
+
+# Filas leídas por consulta en las exportaciones CSV en streaming (fenix/exports.py)
+CSV_EXPORT_CHUNK_SIZE = config('CSV_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Búsqueda (?search=) de productos, clientes y usuarias (fenix/search.py):
+#   'postgres' -> texto completo (SearchVector + índice GIN) y trigramas, ordenado por relevancia
+#   'basic'    -> SearchFilter de DRF (icontains). Es lo que se usa siempre fuera de PostgreSQL.
+SEARCH_BACKEND = config('SEARCH_BACKEND', default='postgres')
+SEARCH_CONFIG = config('SEARCH_CONFIG', default='spanish')
+
+# Panel de control (/api/dashboard/, ver fenix/dashboard.py): días mostrados por defecto,
+# segundos que se cachea el resultado (0 = sin caché) y umbral de "stock bajo"
+DASHBOARD_DAYS = config('DASHBOARD_DAYS', default=30, cast=int)
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=60, cast=int)
+LOW_STOCK_THRESHOLD = config('LOW_STOCK_THRESHOLD', default=5, cast=int)
+
+# Segundos que se reutiliza la instantánea de /api/usuarias/statistics/ (0 = sin caché).
+# Se invalida en cuanto se guarda o borra una usuaria.
+USUARIAS_STATISTICS_CACHE_TIMEOUT = config('USUARIAS_STATISTICS_CACHE_TIMEOUT', default=300, cast=int)
+
+# Serializadores de lectura compilados para los listados de productos, usuarias y pedidos
+# (fenix/compiled.py). Misma salida; por petición también con ?serializer=compiled
+COMPILED_READ_SERIALIZERS = config('COMPILED_READ_SERIALIZERS', default=False, cast=bool)
+
+# Carga de pantallas en una petición (POST /api/bootstrap/, ver fenix/bootstrap.py):
+# máximo de consultas por lote y de filas por consulta
+BOOTSTRAP_MAX_QUERIES = config('BOOTSTRAP_MAX_QUERIES', default=10, cast=int)
+BOOTSTRAP_MAX_ROWS = config('BOOTSTRAP_MAX_ROWS', default=500, cast=int)
+
+# Máximo de ids en ?ids= / <recurso>/by-ids/ (fenix/batch.py)
+FETCH_BY_IDS_MAX = config('FETCH_BY_IDS_MAX', default=100, cast=int)
+
 LOGGING = {
     'version': 1, # La versión de la configuración del logging
     'disable_existing_loggers': False, # No deshabilitar los loggers existentes (ej. los de Django)
@@ -251,5 +320,8 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Cabeceras que el frontend puede leer (peticiones condicionales y caché)
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified', 'X-Cache']
+
 # Permitir CORS preflight requests
 CORS_PREFLIGHT_MAX_AGE = 86400
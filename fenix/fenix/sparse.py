@@ -0,0 +1,156 @@
+# fenix/sparse.py
+# Campos a medida en las respuestas GET: ?fields=id,name,price o ?omit=description.
+#
+# Se recorta la salida del serializador y también la consulta: only() con las columnas
+# que necesitan los campos pedidos, y fuera los select_related / prefetch_related de
+# relaciones que no se van a mostrar. Los campos calculados (SerializerMethodField,
+# propiedades, métodos del modelo) declaran sus columnas en `sparse_sources` del
+# serializador; si alguno no se puede deducir, la consulta se deja entera y solo se
+# recorta la salida.
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_QUERY_PARAM = 'fields'
+OMIT_QUERY_PARAM = 'omit'
+
+
+def _requested(request, param):
+    return [name.strip() for value in request.query_params.getlist(param) for name in value.split(',') if name.strip()]
+
+
+def select_fields(available, request):
+    """
+    Campos a devolver según ?fields= / ?omit=, en el orden del serializador.
+    Devuelve None si no se pide ningún recorte.
+    """
+    fields = _requested(request, FIELDS_QUERY_PARAM)
+    omit = _requested(request, OMIT_QUERY_PARAM)
+    if not fields and not omit:
+        return None
+    errors = {}
+    for param, names in ((FIELDS_QUERY_PARAM, fields), (OMIT_QUERY_PARAM, omit)):
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            errors[param] = [f'Campos desconocidos: {", ".join(unknown)}. Disponibles: {", ".join(available)}.']
+    if errors:
+        raise ValidationError(errors)
+    return [name for name in available if (not fields or name in fields) and name not in omit]
+
+
+def _field_paths(serializer, names):
+    """
+    [(ruta ORM, objeto completo)] que necesitan los campos; objeto completo indica un
+    serializador anidado (hace falta la relación entera). None si no se puede deducir.
+    """
+    sources = getattr(serializer, 'sparse_sources', {})
+    paths = []
+    for name in names:
+        if name in sources:
+            paths.extend((path, False) for path in sources[name])
+            continue
+        field = serializer.fields[name]
+        if field.source == '*':
+            return None
+        nested = isinstance(field, serializers.BaseSerializer)
+        paths.append(('__'.join(field.source_attrs), nested))
+    return paths
+
+
+def _flatten_select_related(tree, prefix=''):
+    for name, subtree in tree.items():
+        path = f'{prefix}{name}'
+        yield path
+        yield from _flatten_select_related(subtree, f'{path}__')
+
+
+def prune_queryset(queryset, serializer, names):
+    """Limita columnas (only) y relaciones (select/prefetch_related) a lo que usan los campos."""
+    paths = _field_paths(serializer, names)
+    if paths is None:
+        return queryset
+
+    model = queryset.model
+    select_related = queryset.query.select_related
+    joined = set(_flatten_select_related(select_related)) if isinstance(select_related, dict) else set()
+    only, relations, whole = {model._meta.pk.name}, set(), set()
+    for path, nested in paths:
+        first, _, rest = path.partition('__')
+        try:
+            field = model._meta.get_field(first)
+        except FieldDoesNotExist:
+            return queryset
+        if not field.is_relation:
+            if rest:
+                return queryset
+            only.add(first)
+            continue
+        if field.concrete:
+            only.add(first)  # la FK (category_id); basta para un PrimaryKeyRelatedField
+        if nested or not field.concrete:
+            relations.add(first)
+            whole.add(first)
+        elif rest:
+            relations.add(first)
+            if first in joined:
+                only.add(path)
+
+    # Las columnas de ordenación se leen en la paginación por cursor
+    for ordering in queryset.query.order_by:
+        if isinstance(ordering, str):
+            name = ordering.lstrip('-')
+            try:
+                if not model._meta.get_field(name).is_relation:
+                    only.add(name)
+            except FieldDoesNotExist:
+                pass
+
+    # Con un serializador anidado se carga el objeto relacionado entero
+    only = {path for path in only if '__' not in path or path.split('__')[0] not in whole}
+
+    if isinstance(select_related, dict):
+        kept = [path for path in _flatten_select_related(select_related) if path.split('__')[0] in relations]
+        queryset = queryset.select_related(None)
+        if kept:
+            queryset = queryset.select_related(*kept)
+    lookups = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if (lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup).split('__')[0] in relations
+    ]
+    return queryset.prefetch_related(None).prefetch_related(*lookups).only(*only)
+
+
+class SparseFieldsetMixin:
+    """
+    Mixin para vistas genéricas de DRF: ?fields= / ?omit= en las peticiones GET.
+    Recorta el serializador (get_serializer) y la consulta (filter_queryset).
+    """
+
+    def get_sparse_fields(self):
+        """Campos pedidos, o None si se devuelven todos (o no es un GET)."""
+        if self.request is None or self.request.method != 'GET':
+            return None
+        if not hasattr(self, '_sparse_fields'):
+            serializer = super().get_serializer()
+            available = [name for name, field in serializer.fields.items() if not field.write_only]
+            self._sparse_fields = select_fields(available, self.request)
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        names = self.get_sparse_fields()
+        if names is not None:
+            target = serializer.child if isinstance(serializer, serializers.ListSerializer) else serializer
+            for name in list(target.fields):
+                if name not in names:
+                    target.fields.pop(name)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        names = self.get_sparse_fields()
+        if names is None:
+            return queryset
+        return prune_queryset(queryset, super().get_serializer(), names)
@@ -0,0 +1,127 @@
+# fenix/storage.py
+# Almacenamiento de ficheros subidos direccionado por contenido.
+#
+# Cada fichero se guarda como content/<aa>/<sha256>.<ext>, sin importar el nombre con el
+# que se subió ni el upload_to del campo. La extensión sale del formato que reconoce
+# Pillow, nunca del nombre subido (un .html o .svg se serviría como contenido activo):
+#   - dos subidas idénticas (aunque sean de productos o usuarias distintas) comparten fichero;
+#   - un fichero nunca cambia de contenido, así que se sirve con Cache-Control immutable
+#     (ver serve_media) y las URLs se pueden cachear indefinidamente en navegador y CDN.
+# Como los ficheros pueden estar compartidos, solo se borran al cambiar la imagen de un
+# registro si ningún otro lo usa (ver fenix.images.delete_file); el resto de huérfanos
+# se eliminan con python manage.py collect_orphan_media.
+# Con MEDIA_CONTENT_ADDRESSED=False se usa el almacenamiento por defecto de siempre.
+
+import hashlib
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Q
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+from PIL import Image
+
+CONTENT_DIR = 'content'
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MUTABLE_MAX_AGE = 60 * 60
+
+
+# Formato verificado por Pillow -> extensión; el resto se guarda sin extensión
+# (y se sirve como application/octet-stream)
+IMAGE_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+
+
+def content_addressed_enabled():
+    return getattr(settings, 'MEDIA_CONTENT_ADDRESSED', True)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage que ignora el nombre propuesto y usa el hash del contenido."""
+    content_addressed = True
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        hexdigest = digest.hexdigest()
+        return f'{CONTENT_DIR}/{hexdigest[:2]}/{hexdigest}{self.image_extension(content)}'
+
+    @staticmethod
+    def image_extension(content):
+        try:
+            with Image.open(content) as image:
+                image_format = image.format
+        except (OSError, ValueError):
+            return ''
+        finally:
+            content.seek(0)
+        return IMAGE_EXTENSIONS.get(image_format, '')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        # Deduplicación: si ya existe, es exactamente el mismo contenido
+        if self.exists(name):
+            return name
+        return self._save(name, content)
+
+
+_content_storage = None
+
+
+def get_media_storage():
+    """Storage de los campos de imagen (callable para que las migraciones no dependan del ajuste)."""
+    global _content_storage
+    if not content_addressed_enabled():
+        return default_storage
+    if _content_storage is None:
+        _content_storage = ContentAddressedStorage()
+    return _content_storage
+
+
+def is_shared_storage(storage):
+    """True si los ficheros del storage pueden estar compartidos (no se deben borrar sueltos)."""
+    return getattr(storage, 'content_addressed', False)
+
+
+# (modelo, campo de fichero, campo JSON con las variantes) que referencian ficheros subidos
+MEDIA_REFERENCES = [
+    ('prenda.Product', 'image', 'image_variants'),
+    ('usuarias.Usuaria', 'avatar', 'avatar_variants'),
+]
+
+
+def is_media_referenced(name):
+    """True si algún registro usa el fichero `name`, como fichero o como variante."""
+    for model_label, file_field, variants_field in MEDIA_REFERENCES:
+        model = apps.get_model(model_label)
+        lookup = Q(**{file_field: name}) | Q(**{f'{variants_field}__icontains': name})
+        if model._default_manager.filter(lookup).exists():
+            return True
+    return False
+
+
+def serve_media(request, path):
+    """
+    Sirve MEDIA_ROOT. Los ficheros direccionados por contenido se marcan como inmutables
+    (un año); el resto (nombres antiguos, que se pueden sobrescribir) se cachea poco.
+    Con nosniff y CSP sandbox el navegador no ejecuta nada de lo servido.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['Content-Security-Policy'] = "default-src 'none'; sandbox"
+    if response.status_code == 200:
+        if path.startswith(f'{CONTENT_DIR}/'):
+            patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=MUTABLE_MAX_AGE)
+    return response
@@ -1,13 +1,17 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from .api_views import api_root
+from .api_views import api_root, bootstrap_api, cache_stats_api, dashboard_api
+from .storage import serve_media
 from django.conf import settings
 
 urlpatterns = [
     path('', api_root, name='api-root'),
     path('api/', api_root, name='api-root-api'),
+    path('api/cache/stats/', cache_stats_api, name='api-cache-stats'),
+    path('api/dashboard/', dashboard_api, name='api-dashboard'),
+    path('api/bootstrap/', bootstrap_api, name='api-bootstrap'),
     path('admin/', admin.site.urls),
     path('api/', include('prenda.urls')),
     path('api/', include('cliente.urls')),
@@ -16,6 +20,12 @@ urlpatterns = [
     path('api/', include('usuarias.urls')),
 ]
 
+# Ficheros subidos (imágenes y avatars); los direccionados por contenido con caché inmutable
+if settings.SERVE_MEDIA:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
+    ]
+
 # Serve media files during development
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
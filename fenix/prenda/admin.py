@@ -1,4 +1,25 @@
 from django.contrib import admin
-from .models import Product 
+from .models import InventoryMovement, InventorySnapshot, Product
 # Registra tu modelo aquí
-admin.site.register(Product)
\ No newline at end of file
+admin.site.register(Product)
+
+
+# El libro de inventario solo se consulta: los movimientos los generan los cambios de stock
+@admin.register(InventoryMovement)
+class InventoryMovementAdmin(admin.ModelAdmin):
+    list_display = ('product', 'kind', 'quantity', 'created_at')
+    list_filter = ('kind',)
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('product',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(InventorySnapshot)
+class InventorySnapshotAdmin(admin.ModelAdmin):
+    list_display = ('product', 'stock', 'taken_at')
+    raw_id_fields = ('product',)
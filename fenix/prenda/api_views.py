@@ -1,12 +1,24 @@
-from rest_framework import generics, status, filters
+from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
-import csv
-from .models import Product
-from .serializers import ProductSerializer, ProductListSerializer
+from fenix.batch import FetchByIdsMixin
+from fenix.cache import CachedResponseMixin
+from fenix.compiled import CompiledListMixin
+from fenix.conditional import ConditionalGetMixin
+from fenix.exports import iter_keyset, stream_csv_response
+from fenix.lookup import LookupAPIView
+from fenix.search import FullTextSearchFilter, RankedOrderingFilter
+from fenix.pagination import FlexiblePagination
+from fenix.sparse import SparseFieldsetMixin
+from datetime import datetime, time
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from .models import Product, ledger_stock
+from .serializers import ProductSerializer, ProductListSerializer, CompiledProductListSerializer
 from django_filters import rest_framework as django_filters
 
 class ProductFilter(django_filters.FilterSet):
@@ -23,7 +35,7 @@ class ProductFilter(django_filters.FilterSet):
             'color': ['exact', 'icontains'],
         }
 
-class ProductListCreateAPIView(generics.ListCreateAPIView):
+class ProductListCreateAPIView(ConditionalGetMixin, CachedResponseMixin, FetchByIdsMixin, CompiledListMixin, generics.ListCreateAPIView):
     """
     Vista para listar todos los productos o crear uno nuevo.
     - GET /api/products/ (Lista todos los productos con filtros)
@@ -37,15 +49,23 @@ class ProductListCreateAPIView(generics.ListCreateAPIView):
     - ?price_min=10&price_max=100 (rango de precios)
     - ?stock_min=5 (stock mínimo)
     - ?ordering=price,-created_at (ordena por campos)
+    - ?ids=3,1,2 (solo esos productos, en ese orden y sin paginar; ver fenix/batch.py)
     
     Para subir imagen: usar Content-Type: multipart/form-data
+
+    Las respuestas GET se cachean (cabecera X-Cache) y se invalidan al guardar o
+    borrar cualquier producto o categoría.
+    Con ?serializer=compiled (o COMPILED_READ_SERIALIZERS) el listado usa el serializador compilado.
     """
     queryset = Product.objects.all().select_related('category')
     serializer_class = ProductSerializer
+    compiled_serializer_class = CompiledProductListSerializer
     parser_classes = [MultiPartParser, FormParser, JSONParser]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = FlexiblePagination
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter]
     filterset_class = ProductFilter
     search_fields = ['name', 'description']
+    trigram_search_fields = ['name']
     ordering_fields = ['name', 'price', 'stock', 'created_at']
     ordering = ['-created_at']
     
@@ -62,7 +82,7 @@ class ProductListCreateAPIView(generics.ListCreateAPIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ProductRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ProductRetrieveUpdateDestroyAPIView(ConditionalGetMixin, SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Vista para recuperar, actualizar o eliminar un producto específico.
     - GET /api/products/{id}/ (Obtiene los detalles de un producto)
@@ -86,40 +106,73 @@ class ProductRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class ProductLookupAPIView(ConditionalGetMixin, CachedResponseMixin, LookupAPIView):
+    """
+    Lista compacta de productos para desplegables: [id, nombre, precio, stock].
+    - GET /api/products/lookup/ (todos los productos, ordenados por nombre)
+    - ?q=cam (solo los que empiezan por "cam", sin distinguir mayúsculas)
+    - ?limit=20 (máximo de filas, para autocompletado)
+    """
+    queryset = Product.objects.all()
+    lookup_columns = ('id', 'name', 'price', 'stock')
+
+    def format_row(self, row):
+        product_id, name, price, stock = row
+        return [product_id, name, f'{price:f}', stock]  # precio como en los serializadores ("19.90")
+
 # --- NUEVA VISTA DE API para exportar productos a CSV ---
 @api_view(['GET']) # Indica que esta vista solo acepta solicitudes GET
 def export_products_csv_api(request):
     """
     Vista de API para exportar todos los productos a un archivo CSV.
-    Accesible via GET a /api/products/export-csv/
-    """
-    # 1. Crear la respuesta HTTP con el tipo de contenido CSV
-    response = HttpResponse(content_type='text/csv')
-    
-    # 2. Establecer el encabezado 'Content-Disposition' para forzar la descarga
-    response['Content-Disposition'] = 'attachment; filename="productos.csv"'
+    Accesible via GET a /api/products/export-csv/ (?compress=gzip para descargarlo comprimido)
 
-    # 3. Crear un escritor CSV que escribirá directamente en la respuesta HTTP
-    writer = csv.writer(response)
-
-    # 4. Escribir la fila de encabezados (nombres de las columnas)
-    writer.writerow(['ID', 'Nombre', 'Talla', 'Color', 'Precio', 'Stock', 'ID Categoria', 'Fecha Creacion'])
-
-    # 5. Obtener los datos de los productos y escribirlos en el CSV
-    products = Product.objects.all().order_by('id')
+    El CSV se envía en streaming: los productos se leen por bloques ordenados por id.
+    """
+    header = ['ID', 'Nombre', 'Talla', 'Color', 'Precio', 'Stock', 'ID Categoria', 'Fecha Creacion']
 
-    for product in products:
-        category_id = product.category.id if product.category else ''
-        writer.writerow([
+    rows = (
+        [
             product.id,
             product.name,
             product.size,
             product.color,
             product.price,
             product.stock,
-            category_id,
+            product.category_id or '',
             product.created_at.strftime('%Y-%m-%d %H:%M:%S') # Formatear la fecha
-        ])
+        ]
+        for product in iter_keyset(Product.objects.all())
+    )
+    return stream_csv_response(request, 'productos.csv', header, rows)
+
 
-    return response
+def _parse_ledger_moment(value):
+    """'2025-01-31' (final de ese día) o fecha y hora ISO -> datetime con zona horaria."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = datetime.combine(day, time.max) if day else None
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValidationError({'at': ['Fecha no válida. Usa AAAA-MM-DD o fecha y hora ISO 8601.']})
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
 
+
+@api_view(['GET'])
+def product_stock_api(request, pk):
+    """
+    Stock de un producto según el libro de inventario (ver prenda/models.py).
+    - GET /api/products/{id}/stock/ (stock actual: columna y libro)
+    - GET /api/products/{id}/stock/?at=2025-01-31 (stock al final de ese día)
+    """
+    product = get_object_or_404(Product.objects.only('pk', 'stock'), pk=pk)
+    at = _parse_ledger_moment(request.query_params['at']) if request.query_params.get('at') else timezone.now()
+    return Response({
+        'id': product.pk,
+        'at': at,
+        'stock': ledger_stock([product.pk], at=at).get(product.pk, 0),
+        'current_stock': product.stock,
+    })
@@ -0,0 +1,88 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from prenda.models import InventoryMovement, Product, compact_inventory, ledger_stock
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    Compara la lectura del stock de la columna Product.stock con el cálculo desde el
+    libro de inventario (instantánea + movimientos), antes y después de compactar, y
+    comprueba que ambos dan el mismo resultado.
+    Con --movements se añaden movimientos de prueba (que se compensan entre sí) repartidos
+    en los últimos --days días; todo se ejecuta en una transacción que se deshace al final.
+
+    Uso: python manage.py benchmark_inventory [--products 20] [--movements 500] [--repeat 200]
+    """
+    help = 'Mide el cálculo del stock con el libro de inventario frente a la columna'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20, help='Productos por lectura')
+        parser.add_argument('--movements', type=int, default=500, help='Movimientos de prueba por producto')
+        parser.add_argument('--days', type=int, default=90, help='Días en los que se reparten los movimientos')
+        parser.add_argument('--repeat', type=int, default=200, help='Repeticiones de cada medición')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, options):
+        repeat = max(options['repeat'], 1)
+        ids = list(Product.objects.order_by('pk').values_list('pk', flat=True)[:max(options['products'], 1)])
+        if not ids:
+            self.stdout.write("Sin productos, se omite.")
+            return
+        self._add_movements(ids, options['movements'], options['days'])
+
+        def column():
+            return dict(Product.objects.filter(pk__in=ids).values_list('pk', 'stock'))
+
+        def ledger():
+            return ledger_stock(ids)
+
+        cases = [('columna Product.stock', column), ('libro sin compactar', ledger)]
+        results = {label: self._time(func, repeat) for label, func in cases}
+        identical = column() == ledger()
+
+        created, _, _ = compact_inventory(timezone.now() - timedelta(days=1))
+        results[f'libro compactado ({created} instantáneas)'] = self._time(ledger, repeat)
+        identical = identical and column() == ledger()
+
+        baseline = results['columna Product.stock']
+        for label, elapsed in results.items():
+            self.stdout.write(
+                f"{label}: {len(ids) * repeat / elapsed:,.0f} productos/s | x{baseline / elapsed:.2f} frente a la columna"
+            )
+        style = self.style.SUCCESS if identical else self.style.ERROR
+        self.stdout.write(style('Stock idéntico' if identical else 'Stock DISTINTO'))
+
+    def _add_movements(self, ids, per_product, days):
+        # Parejas entrada/salida de la misma cantidad: el stock final no cambia
+        now = timezone.now()
+        movements = []
+        for product_id in ids:
+            for _ in range(per_product // 2):
+                quantity = random.randint(1, 5)
+                moment = now - timedelta(seconds=random.randint(1, days * 86400))
+                movements.append(InventoryMovement(product_id=product_id, kind=InventoryMovement.RECEIPT, quantity=quantity, created_at=moment))
+                movements.append(InventoryMovement(product_id=product_id, kind=InventoryMovement.SALE, quantity=-quantity, created_at=moment))
+        InventoryMovement.objects.bulk_create(movements, batch_size=1000)
+
+    def _time(self, func, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return time.perf_counter() - start
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from fenix.storage import MEDIA_REFERENCES, get_media_storage
+
+
+def referenced_media_names():
+    names = set()
+    for model_label, file_field, variants_field in MEDIA_REFERENCES:
+        model = apps.get_model(model_label)
+        for name, variants in model._default_manager.values_list(file_field, variants_field).iterator():
+            if name:
+                names.add(name)
+            names.update((variants or {}).values())
+    return names
+
+
+def walk_storage(storage, directory=''):
+    try:
+        directories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for filename in files:
+        yield f'{directory}/{filename}' if directory else filename
+    for subdirectory in directories:
+        yield from walk_storage(storage, f'{directory}/{subdirectory}' if directory else subdirectory)
+
+
+class Command(BaseCommand):
+    """
+    Borra los ficheros subidos (imágenes, avatars y sus variantes) que ya no referencia
+    ningún producto ni usuaria. Con el almacenamiento por contenido (fenix/storage.py)
+    los ficheros se comparten y no se borran al sustituirlos, así que esta es la única
+    forma de liberar espacio.
+    Solo se borran ficheros con más de --min-age horas, para no tocar subidas en curso.
+
+    Uso: python manage.py collect_orphan_media [--dry-run] [--min-age 24]
+    """
+    help = 'Elimina los ficheros de media huérfanos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Solo lista lo que se borraría')
+        parser.add_argument('--min-age', type=float, default=24, help='Antigüedad mínima en horas')
+
+    def handle(self, *args, **options):
+        storage = get_media_storage()
+        referenced = referenced_media_names()
+        cutoff = timezone.now() - timedelta(hours=options['min_age'])
+
+        removed = freed = 0
+        for name in walk_storage(storage):
+            if name in referenced or storage.get_modified_time(name) > cutoff:
+                continue
+            size = storage.size(name)
+            if options['verbosity'] > 1 or options['dry_run']:
+                self.stdout.write(f"{name} ({size} bytes)")
+            if not options['dry_run']:
+                storage.delete(name)
+            removed += 1
+            freed += size
+
+        action = 'se borrarían' if options['dry_run'] else 'borrados'
+        self.stdout.write(self.style.SUCCESS(f"{removed} ficheros huérfanos {action} ({freed} bytes)."))
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from prenda.models import compact_inventory
+
+
+class Command(BaseCommand):
+    """
+    Guarda una instantánea del libro de inventario con la fecha de corte (ahora menos
+    --keep-days) para los productos que han tenido movimientos desde la anterior, de modo
+    que calcular el stock solo tenga que sumar los movimientos recientes.
+    Con --prune borra además los movimientos anteriores al corte (ya incluidos en las
+    instantáneas) y las instantáneas que quedan obsoletas.
+
+    Uso: python manage.py compact_inventory [--keep-days 30] [--prune] [--batch-size 1000]
+    """
+    help = 'Compacta el libro de inventario en instantáneas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=float, default=30, help='Días de movimientos que quedan sin compactar')
+        parser.add_argument('--prune', action='store_true', help='Borra los movimientos ya compactados')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Productos por lote')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['keep_days'])
+        created, removed_movements, removed_snapshots = compact_inventory(
+            before, prune=options['prune'], batch_size=max(options['batch_size'], 1)
+        )
+        message = f"{created} instantáneas a fecha {before:%Y-%m-%d %H:%M}."
+        if options['prune']:
+            message += f" Borrados {removed_movements} movimientos y {removed_snapshots} instantáneas obsoletas."
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,73 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from operator import itemgetter
+
+import django
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from fenix.cache import CATALOG_NAMESPACE, invalidate_namespace
+from fenix.exports import iter_keyset
+from fenix.images import delete_variants, generate_resized_variants
+from prenda.models import Product
+
+
+def _init_worker():
+    # Con el método 'spawn' los procesos hijos arrancan sin Django configurado
+    django.setup()
+
+
+def _render(product_id, image_name):
+    """Se ejecuta en un proceso hijo: solo trabaja con ficheros, nunca con la base de datos."""
+    storage = Product._meta.get_field('image').storage
+    try:
+        return product_id, image_name, generate_resized_variants(storage, image_name, Product.IMAGE_VARIANT_SIZES), None
+    except Exception as exc:
+        return product_id, image_name, None, str(exc)
+
+
+class Command(BaseCommand):
+    """
+    Genera las variantes WebP (thumb/medium/full) de las imágenes de producto ya subidas.
+    El trabajo con Pillow se reparte en un pool de procesos; la base de datos solo
+    se toca desde este proceso.
+
+    Uso: python manage.py generate_image_variants [--all] [--workers 4]
+    """
+    help = 'Genera las variantes WebP de las imágenes de producto existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenera también las que ya tienen variantes')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Procesos en paralelo')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            products = products.filter(image_variants={})
+
+        pending = list(iter_keyset(products.values_list('pk', 'image'), key=itemgetter(0)))
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('No hay imágenes pendientes.'))
+            return
+
+        storage = Product._meta.get_field('image').storage
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1), initializer=_init_worker) as pool:
+            futures = [pool.submit(_render, product_id, image_name) for product_id, image_name in pending]
+            for future in as_completed(futures):
+                product_id, image_name, variants, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f"Producto #{product_id} ({image_name}): {error}")
+                    continue
+                updated = Product.objects.filter(pk=product_id, image=image_name).update(
+                    image_variants=variants, updated_at=timezone.now()
+                )
+                if updated:
+                    done += 1
+                else:
+                    delete_variants(storage, variants)
+
+        if done:
+            invalidate_namespace(CATALOG_NAMESPACE)
+        self.stdout.write(self.style.SUCCESS(f"{done} imágenes procesadas, {failed} con errores."))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:37
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+from django.contrib.postgres.operations import TrigramExtension
+
+
+def populate_search_vector(apps, schema_editor):
+    """Rellena search_vector de las filas existentes (solo PostgreSQL)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from fenix.search import weighted_search_vector
+    Product = apps.get_model('prenda', 'Product')
+    Product.objects.update(search_vector=weighted_search_vector([('name', 'A'), ('description', 'B'), ('color', 'C')]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categoría', '0001_initial'),
+        ('prenda', '0003_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='products_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='products_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
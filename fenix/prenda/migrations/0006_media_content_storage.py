@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:49
+
+import fenix.storage
+import prenda.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prenda', '0005_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Sube una imagen del producto (formatos: JPG, PNG, WEBP)', null=True, storage=fenix.storage.get_media_storage, upload_to=prenda.models.product_image_upload_path, verbose_name='Imagen del Producto'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def snapshot_current_stock(apps, schema_editor):
+    # El libro empieza con una instantánea del stock actual de cada producto
+    Product = apps.get_model('prenda', 'Product')
+    InventorySnapshot = apps.get_model('prenda', 'InventorySnapshot')
+    now = django.utils.timezone.now()
+    snapshots = [
+        InventorySnapshot(product_id=pk, stock=stock, taken_at=now)
+        for pk, stock in Product.objects.values_list('pk', 'stock').iterator()
+    ]
+    InventorySnapshot.objects.bulk_create(snapshots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prenda', '0007_name_upper_prefix_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ENTRADA', 'Entrada'), ('VENTA', 'Venta'), ('DEVOLUCION', 'Devolución'), ('AJUSTE', 'Ajuste')], max_length=12, verbose_name='Tipo')),
+                ('quantity', models.IntegerField(verbose_name='Cantidad')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_movements', to='prenda.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Inventario',
+                'verbose_name_plural': 'Movimientos de Inventario',
+                'db_table': 'inventory_movements',
+                'indexes': [models.Index(fields=['product', 'created_at'], name='inventory_m_product_cf6250_idx'), models.Index(fields=['created_at'], name='inventory_m_created_c2f39c_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.IntegerField(verbose_name='Stock')),
+                ('taken_at', models.DateTimeField(verbose_name='Fecha')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='prenda.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Instantánea de Inventario',
+                'verbose_name_plural': 'Instantáneas de Inventario',
+                'db_table': 'inventory_snapshots',
+                'unique_together': {('product', 'taken_at')},
+            },
+        ),
+        migrations.RunPython(snapshot_current_stock, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,17 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from datetime import datetime, timezone as dt_timezone
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from fenix.cache import CATALOG_NAMESPACE, invalidate_namespace
+from fenix.conditional import name_changed, remember_loaded_name
+from fenix.images import delete_variants, generate_resized_variants, schedule_image_task
+from fenix.search import refresh_search_vector
+from fenix.storage import get_media_storage
 from categoría.models import Category
 import os
 
@@ -24,11 +37,15 @@ class Product(models.Model):
     # Campo de imagen para el producto
     image = models.ImageField(
         upload_to=product_image_upload_path,
+        storage=get_media_storage,
         null=True,
         blank=True,
         verbose_name="Imagen del Producto",
         help_text="Sube una imagen del producto (formatos: JPG, PNG, WEBP)"
     )
+    # Versiones WebP redimensionadas de la imagen ({'thumb': nombre, ...}), se generan
+    # en segundo plano tras subirla (ver build_product_image_variants)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Variantes de la Imagen")
     description = models.TextField(
         max_length=500,
         null=True,
@@ -40,6 +57,14 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='products', verbose_name="Categoría")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de Actualización")
+    # Columna de búsqueda de texto completo (PostgreSQL), se actualiza al guardar
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
+    # Campos (y peso) que alimentan search_vector
+    SEARCH_FIELDS = [('name', 'A'), ('description', 'B'), ('color', 'C')]
+
+    # Variantes de la imagen: lado mayor máximo en píxeles
+    IMAGE_VARIANT_SIZES = {'thumb': 160, 'medium': 640, 'full': 1600}
 
     class Meta:
         db_table = 'products'
@@ -48,7 +73,353 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=['category']),
             models.Index(fields=['name']),
+            # Índices compuestos (campo, id) para la paginación por cursor estable
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['price', 'id']),
+            # Búsqueda: texto completo y trigramas sobre el nombre
+            GinIndex(fields=['search_vector'], name='products_search_gin'),
+            GinIndex(fields=['name'], name='products_name_trgm', opclasses=['gin_trgm_ops']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.size}, {self.color})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Recordamos la imagen con la que se cargó para detectar cuándo se cambia
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image = instance.__dict__.get('image')
+        instance._remember_loaded_counters()
+        # Nombre con el que se cargó: las líneas de los pedidos lo muestran (ver compra/models.py)
+        remember_loaded_name(instance)
+        return instance
+
+    def _remember_loaded_counters(self):
+        # Categoría y stock con los que se cargó, para aplicar solo la diferencia
+        # a los contadores de la categoría cuando se guarde
+        loaded = self.__dict__
+        if all(name in loaded for name in ('category_id', 'stock')):
+            self._loaded_counters = (self.category_id, self.stock)
+        else:
+            self._loaded_counters = None
+
+
+# --- Libro de inventario ---
+# Cada cambio de stock queda registrado como un movimiento (solo se añaden filas).
+# Product.stock sigue siendo el stock actual que usan las reservas (change_stock);
+# el libro permite responder "¿cuánto stock había el día X?":
+#   stock en X = última instantánea anterior a X + movimientos entre ella y X
+# compact_inventory guarda instantáneas periódicas para que esa suma sea corta y,
+# opcionalmente, borra los movimientos ya incluidos en ellas.
+
+class InventoryMovement(models.Model):
+    """Movimiento de stock de un producto. quantity lleva signo: positivo entra, negativo sale."""
+    RECEIPT = 'ENTRADA'
+    SALE = 'VENTA'
+    RETURN = 'DEVOLUCION'
+    ADJUSTMENT = 'AJUSTE'
+    KIND_CHOICES = [
+        (RECEIPT, 'Entrada'),
+        (SALE, 'Venta'),
+        (RETURN, 'Devolución'),
+        (ADJUSTMENT, 'Ajuste'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='inventory_movements', verbose_name="Producto")
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES, verbose_name="Tipo")
+    quantity = models.IntegerField(verbose_name="Cantidad")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Fecha")
+
+    class Meta:
+        db_table = 'inventory_movements'
+        verbose_name = "Movimiento de Inventario"
+        verbose_name_plural = "Movimientos de Inventario"
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+            models.Index(fields=['created_at']),
         ]
 
     def __str__(self):
-        return f"{self.name} ({self.size}, {self.color})"
\ No newline at end of file
+        return f"{self.get_kind_display()} {self.quantity:+d} x {self.product_id} ({self.created_at:%Y-%m-%d %H:%M})"
+
+
+class InventorySnapshot(models.Model):
+    """Stock de un producto en taken_at (incluye los movimientos hasta ese instante)."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='inventory_snapshots', verbose_name="Producto")
+    stock = models.IntegerField(verbose_name="Stock")
+    taken_at = models.DateTimeField(verbose_name="Fecha")
+
+    class Meta:
+        db_table = 'inventory_snapshots'
+        verbose_name = "Instantánea de Inventario"
+        verbose_name_plural = "Instantáneas de Inventario"
+        unique_together = ('product', 'taken_at')
+
+    def __str__(self):
+        return f"{self.product_id}: {self.stock} ({self.taken_at:%Y-%m-%d %H:%M})"
+
+
+# Anterior a cualquier movimiento: productos que aún no tienen instantánea
+LEDGER_START = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def record_movements(deltas, kind=None, at=None):
+    """
+    Registra {product_id: cambio} en el libro con un único INSERT.
+    Sin kind, los negativos son ventas y los positivos devoluciones.
+    """
+    at = at or timezone.now()
+    InventoryMovement.objects.bulk_create([
+        InventoryMovement(
+            product_id=product_id,
+            kind=kind or (InventoryMovement.SALE if delta < 0 else InventoryMovement.RETURN),
+            quantity=delta,
+            created_at=at,
+        )
+        for product_id, delta in sorted(deltas.items()) if delta
+    ])
+
+
+def ledger_stock(product_ids=None, at=None):
+    """
+    {product_id: stock} calculado con el libro en el instante `at` (por defecto, ahora):
+    la última instantánea anterior más los movimientos posteriores, en una sola consulta.
+    """
+    at = at or timezone.now()
+    latest = InventorySnapshot.objects.filter(product=OuterRef('pk'), taken_at__lte=at).order_by('-taken_at')
+    movements = (
+        InventoryMovement.objects
+        .filter(product=OuterRef('pk'), created_at__gt=OuterRef('ledger_since'), created_at__lte=at)
+        .order_by().values('product').annotate(total=Sum('quantity')).values('total')
+    )
+    products = Product.objects.order_by()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    products = products.annotate(
+        ledger_base=Coalesce(Subquery(latest.values('stock')[:1]), 0),
+        ledger_since=Coalesce(Subquery(latest.values('taken_at')[:1]), Value(LEDGER_START)),
+    ).annotate(ledger_stock=F('ledger_base') + Coalesce(Subquery(movements), 0))
+    return dict(products.values_list('pk', 'ledger_stock'))
+
+
+def compact_inventory(before, prune=False, batch_size=1000):
+    """
+    Guarda una instantánea en `before` de los productos con movimientos desde su última
+    instantánea. Con prune borra los movimientos ya incluidos y las instantáneas que deja
+    obsoletas; el stock anterior a `before` solo se conoce entonces en las fechas de las
+    instantáneas. Devuelve (instantáneas creadas, movimientos borrados, instantáneas borradas).
+    """
+    last_taken = (
+        InventorySnapshot.objects.filter(product=OuterRef('product'), taken_at__lte=before)
+        .order_by('-taken_at').values('taken_at')[:1]
+    )
+    pending = sorted(set(
+        InventoryMovement.objects.filter(created_at__lte=before)
+        .annotate(since=Subquery(last_taken))
+        .filter(Q(since__isnull=True) | Q(created_at__gt=F('since')))
+        .values_list('product_id', flat=True)
+    ))
+
+    created = 0
+    for start in range(0, len(pending), batch_size):
+        with transaction.atomic():
+            stocks = ledger_stock(pending[start:start + batch_size], at=before)
+            InventorySnapshot.objects.bulk_create(
+                [InventorySnapshot(product_id=pk, stock=stock, taken_at=before) for pk, stock in stocks.items()],
+                ignore_conflicts=True,
+            )
+            created += len(stocks)
+
+    removed_movements = removed_snapshots = 0
+    if prune:
+        with transaction.atomic():
+            removed_movements, _ = InventoryMovement.objects.filter(created_at__lte=before).delete()
+            removed_snapshots, _ = InventorySnapshot.objects.filter(taken_at__lt=Subquery(last_taken)).delete()
+    return created, removed_movements, removed_snapshots
+
+
+def build_product_image_variants(product_id, image_name):
+    """
+    Genera las variantes WebP de la imagen de un producto y las guarda en image_variants.
+    Si mientras tanto la imagen del producto ha cambiado, se descartan.
+    """
+    storage = Product._meta.get_field('image').storage
+    variants = generate_resized_variants(storage, image_name, Product.IMAGE_VARIANT_SIZES)
+    updated = Product.objects.filter(pk=product_id, image=image_name).update(
+        image_variants=variants, updated_at=timezone.now()
+    )
+    if updated:
+        invalidate_namespace(CATALOG_NAMESPACE)
+    else:
+        delete_variants(storage, variants)
+    return variants
+
+
+# --- Contadores de la categoría (Category.product_count / stock_total) ---
+# Cada escritura de un producto aplica la diferencia con un UPDATE atómico
+# (product_count = product_count + 1, ...). Las escrituras en bloque que no disparan
+# señales deben llamar a apply_category_delta o a refresh_category_counters.
+
+def apply_category_delta(category_id, products=0, stock=0):
+    """Suma (o resta) productos y stock a los contadores de una categoría."""
+    if category_id is None or not (products or stock):
+        return
+    Category.objects.filter(pk=category_id).update(
+        product_count=F('product_count') + products,
+        stock_total=F('stock_total') + stock,
+    )
+
+
+def refresh_category_counters(category_ids=None):
+    """
+    Recalcula los contadores a partir de los productos con un único UPDATE.
+    Si no se indican categorías, recalcula todas. Devuelve el número de categorías actualizadas.
+    """
+    products = Product.objects.filter(category=OuterRef('pk')).order_by().values('category')
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(pk__in=category_ids)
+    return categories.update(
+        product_count=Coalesce(Subquery(products.annotate(count=Count('pk')).values('count')), 0),
+        stock_total=Coalesce(Subquery(products.annotate(total=Sum('stock')).values('total')), 0),
+    )
+
+
+# --- Stock de los pedidos ---
+# Los pedidos reservan y devuelven stock con un UPDATE por producto, sin leer antes la fila:
+#   reservar:  UPDATE products SET stock = stock - n WHERE id = ... AND stock >= n
+#   devolver:  UPDATE products SET stock = stock + n WHERE id = ...
+# La condición stock >= n hace que dos pedidos simultáneos no puedan vender la misma
+# unidad, y los productos se actualizan siempre en orden de id para que dos transacciones
+# con productos en común bloqueen las filas en el mismo orden (sin interbloqueos).
+
+class InsufficientStock(Exception):
+    """Alguna línea pide más de lo que hay; shortages = {product_id: stock disponible}."""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f"Stock insuficiente para los productos {', '.join(str(pk) for pk in shortages)}")
+
+
+def change_stock(deltas, kind=None):
+    """
+    Aplica {product_id: cambio} al stock (negativo = reservar, positivo = devolver).
+    Se intentan todas las reservas y, si alguna no tiene stock, se deshacen todos los
+    cambios y se lanza InsufficientStock con todas las que fallan.
+    También ajusta Category.stock_total, registra los movimientos en el libro de
+    inventario (con `kind`, o como ventas y devoluciones) e invalida la caché del
+    catálogo al confirmar.
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    now = timezone.now()
+    failed = []
+    with transaction.atomic():
+        for product_id in sorted(deltas):
+            delta = deltas[product_id]
+            products = Product.objects.filter(pk=product_id)
+            if delta < 0:
+                products = products.filter(stock__gte=-delta)
+            if not products.update(stock=F('stock') + delta, updated_at=now) and delta < 0:
+                failed.append(product_id)
+        if failed:
+            shortages = dict(Product.objects.filter(pk__in=failed).values_list('pk', 'stock'))
+            raise InsufficientStock({product_id: shortages.get(product_id, 0) for product_id in failed})
+
+        category_deltas = {}
+        for product_id, category_id in Product.objects.filter(pk__in=deltas).values_list('pk', 'category_id'):
+            category_deltas[category_id] = category_deltas.get(category_id, 0) + deltas[product_id]
+        for category_id, delta in sorted(category_deltas.items(), key=lambda item: item[0] or 0):
+            apply_category_delta(category_id, stock=delta)
+        record_movements(deltas, kind, at=now)
+    transaction.on_commit(lambda: invalidate_namespace(CATALOG_NAMESPACE))
+
+
+@receiver(post_save, sender=Product)
+def update_category_counters_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'category', 'category_id', 'stock'} & set(update_fields)):
+        return
+    previous = getattr(instance, '_loaded_counters', None)
+    instance._remember_loaded_counters()
+
+    if created:
+        apply_category_delta(instance.category_id, 1, instance.stock)
+        record_movements({instance.pk: instance.stock}, InventoryMovement.RECEIPT)
+        return
+    if previous is None:
+        # No sabemos con qué valores se cargó el producto: recalculamos su categoría
+        # y el ajuste es la diferencia con lo que dice el libro
+        refresh_category_counters([instance.category_id])
+        stock_delta = instance.stock - ledger_stock([instance.pk]).get(instance.pk, 0)
+    elif previous[0] != instance.category_id:
+        # El producto cambió de categoría: sale de la anterior y entra en la nueva
+        apply_category_delta(previous[0], -1, -previous[1])
+        apply_category_delta(instance.category_id, 1, instance.stock)
+        stock_delta = instance.stock - previous[1]
+    else:
+        stock_delta = instance.stock - previous[1]
+        apply_category_delta(instance.category_id, stock=stock_delta)
+    # Cambio de stock editado a mano (formulario / API de productos)
+    record_movements({instance.pk: stock_delta}, InventoryMovement.ADJUSTMENT)
+
+
+@receiver(post_delete, sender=Product)
+def update_category_counters_on_delete(sender, instance, **kwargs):
+    previous = getattr(instance, '_loaded_counters', None) or (instance.category_id, instance.stock)
+    apply_category_delta(previous[0], -1, -previous[1])
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_vector(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        refresh_search_vector(instance, Product.SEARCH_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=Product)
+def schedule_product_image_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'image' not in update_fields):
+        return
+    image_name = instance.image.name or ''
+    loaded_name = getattr(instance, '_loaded_image', None) or ''
+    if image_name == loaded_name:
+        return
+    instance._loaded_image = image_name
+
+    # Las variantes de la imagen anterior ya no sirven
+    old_variants = instance.image_variants
+    if old_variants:
+        Product.objects.filter(pk=instance.pk).update(image_variants={})
+        instance.image_variants = {}
+        storage = Product._meta.get_field('image').storage
+        transaction.on_commit(lambda: delete_variants(storage, old_variants))
+    if image_name:
+        schedule_image_task(build_product_image_variants, instance.pk, image_name)
+
+
+@receiver(post_delete, sender=Product)
+def delete_product_image_variants(sender, instance, **kwargs):
+    if instance.image_variants:
+        storage = Product._meta.get_field('image').storage
+        transaction.on_commit(lambda: delete_variants(storage, instance.image_variants))
+
+
+# El nombre de la categoría se muestra en los productos (category_name): al cambiarlo, o al
+# borrarla (SET_NULL no pasa por save), se marcan como modificados para que su ETag cambie
+# (ver fenix/conditional.py)
+@receiver(post_save, sender=Category)
+def touch_products_on_category_rename(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not raw and name_changed(instance, created, update_fields):
+        Product.objects.filter(category=instance).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Category)
+def touch_products_on_category_delete(sender, instance, **kwargs):
+    Product.objects.filter(category=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache_on_product_change(sender, **kwargs):
+    # Al confirmar: antes, otra petición podría volver a cachear los datos sin el cambio
+    transaction.on_commit(lambda: invalidate_namespace(CATALOG_NAMESPACE))
@@ -1,7 +1,17 @@
 from rest_framework import serializers
-from .models import Product
+from django.db import transaction
+from fenix.compiled import CompiledSerializer
+from fenix.media import media_url
+from .models import InsufficientStock, InventoryMovement, Product, change_stock
 from categoría.serializers import CategorySerializer
 
+
+def image_variant_urls(variants, request=None):
+    """{variante: nombre guardado} -> {variante: URL}"""
+    storage = Product._meta.get_field('image').storage
+    return {variant: media_url(name, request, storage) for variant, name in (variants or {}).items()}
+
+
 class ProductSerializer(serializers.ModelSerializer):
     """
     Serializador para el modelo Product con soporte para imágenes.
@@ -9,27 +19,32 @@ class ProductSerializer(serializers.ModelSerializer):
     """
     # Campo para mostrar la URL completa de la imagen
     image_url = serializers.SerializerMethodField()
+
+    # URLs de las versiones WebP redimensionadas ({} hasta que se generan)
+    image_variants = serializers.SerializerMethodField()
     
     # Campo para mostrar información de la categoría (solo lectura)
     category_name = serializers.CharField(source='category.name', read_only=True)
+
+    # Columnas que usan los campos calculados (?fields= / ?omit=, ver fenix/sparse.py)
+    sparse_sources = {'image_url': ('image',), 'image_variants': ('image_variants',)}
     
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'size', 'color', 'price', 'stock', 'description',
-            'image', 'image_url', 'category', 'category_name', 
+            'image', 'image_url', 'image_variants', 'category', 'category_name', 
             'created_at', 'updated_at'
         ]
-        read_only_fields = ('created_at', 'updated_at', 'image_url', 'category_name')
+        read_only_fields = ('created_at', 'updated_at', 'image_url', 'image_variants', 'category_name')
     
     def get_image_url(self, obj):
         """Devuelve la URL completa de la imagen"""
-        if obj.image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.image.url)
-            return obj.image.url
-        return None
+        return media_url(obj.image, self.context.get('request'))
+
+    def get_image_variants(self, obj):
+        """Devuelve las URLs de las variantes WebP (thumb, medium, full)"""
+        return image_variant_urls(obj.image_variants, self.context.get('request'))
     
     def validate_image(self, value):
         """Validar el archivo de imagen"""
@@ -49,25 +64,67 @@ class ProductSerializer(serializers.ModelSerializer):
         
         return value
 
+    def update(self, instance, validated_data):
+        # Las reservas de los pedidos cambian el stock sin pasar por aquí (change_stock):
+        # se guardan solo los campos enviados y un stock nuevo se aplica como diferencia
+        # con el que se cargó, para no deshacer las reservas hechas entretanto.
+        stock = validated_data.pop('stock', None)
+        with transaction.atomic():
+            loaded_stock = instance.stock
+            locked = Product.objects.select_for_update().get(pk=instance.pk)
+            instance.stock = locked.stock
+            instance._loaded_counters = locked._loaded_counters
+
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save(update_fields=[*validated_data, 'updated_at'])
+
+            if stock is not None and stock != loaded_stock:
+                try:
+                    change_stock({instance.pk: stock - loaded_stock}, InventoryMovement.ADJUSTMENT)
+                except InsufficientStock as exc:
+                    raise serializers.ValidationError({'stock': [
+                        f"No se pueden quitar {loaded_stock - stock} unidades: quedan {exc.shortages[instance.pk]}."
+                    ]})
+                instance.refresh_from_db(fields=['stock', 'updated_at'])
+                instance._remember_loaded_counters()
+        return instance
+
 class ProductListSerializer(serializers.ModelSerializer):
     """
     Serializador simplificado para listado de productos (sin imagen completa)
     """
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     category_name = serializers.CharField(source='category.name', read_only=True)
+    sparse_sources = ProductSerializer.sparse_sources
     
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'size', 'color', 'price', 'stock',
-            'image_url', 'category', 'category_name', 'created_at'
+            'image_url', 'image_variants', 'category', 'category_name', 'created_at'
         ]
     
     def get_image_url(self, obj):
         """Devuelve la URL completa de la imagen"""
-        if obj.image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.image.url)
-            return obj.image.url
-        return None
+        return media_url(obj.image, self.context.get('request'))
+
+    def get_image_variants(self, obj):
+        """Devuelve las URLs de las variantes WebP (thumb, medium, full)"""
+        return image_variant_urls(obj.image_variants, self.context.get('request'))
+
+
+class CompiledProductListSerializer(CompiledSerializer):
+    """
+    Versión compilada de ProductListSerializer (misma salida) sobre filas de .values().
+    """
+    serializer_class = ProductListSerializer
+    computed = {'image_url': 'get_image_url', 'image_variants': 'get_image_variants'}
+    extra_columns = ('image', 'image_variants')
+
+    def get_image_url(self, row):
+        return media_url(row['image'], self.context.get('request'), Product._meta.get_field('image').storage)
+
+    def get_image_variants(self, row):
+        return image_variant_urls(row['image_variants'], self.context.get('request'))
@@ -1,3 +1,617 @@
-from django.test import TestCase
+import gzip
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from fenix.cache import get_cache_stats
+from fenix.pagination import FlexiblePagination
+from fenix.storage import get_media_storage
+from .models import (
+    InventoryMovement, InventorySnapshot, Product, change_stock, compact_inventory, ledger_stock, record_movements,
+)
+from categoría.models import Category
+from .serializers import CompiledProductListSerializer, ProductSerializer
+
+
+class ProductExportCSVTest(TestCase):
+    """
+    Tests for the streaming CSV export of products.
+    """
+    def setUp(self):
+        self.category = Category.objects.create(name="Abrigos", description="Invierno")
+        for i in range(5):
+            Product.objects.create(
+                name=f"Abrigo {i}", size="L", color="Gris", price=Decimal('80.00'), stock=i,
+                category=self.category if i % 2 else None
+            )
+        self.url = reverse('prenda_api:product-export-csv')
+
+    @override_settings(CSV_EXPORT_CHUNK_SIZE=2)
+    def test_export_streams_every_product_in_id_order(self):
+        """Test that the export is streamed and includes all rows across several chunks."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="productos.csv"')
+
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'ID,Nombre,Talla,Color,Precio,Stock,ID Categoria,Fecha Creacion')
+        self.assertEqual(len(lines), 6)
+        ids = [int(line.split(',')[0]) for line in lines[1:]]
+        self.assertEqual(ids, sorted(Product.objects.values_list('id', flat=True)))
+        self.assertTrue(lines[1].split(',')[6] == '') # Producto sin categoría
+
+    def test_export_can_be_gzipped(self):
+        """Test that ?compress=gzip returns the same CSV compressed."""
+        plain = b''.join(self.client.get(self.url).streaming_content)
+        response = self.client.get(self.url, {'compress': 'gzip'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="productos.csv.gz"')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+
+class ProductPaginationTest(TestCase):
+    """
+    Tests for the cursor and count-less pagination modes of the product list.
+    """
+    def setUp(self):
+        patcher = mock.patch.object(FlexiblePagination, 'page_size', 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Precios repetidos para comprobar que el cursor es estable con empates
+        for i in range(8):
+            Product.objects.create(name=f"Falda {i}", price=Decimal('25.00') if i % 2 else Decimal('30.00'), stock=1)
+        self.url = reverse('prenda_api:product-list-create')
+
+    def _walk(self, params):
+        ids, url = [], self.url
+        response = self.client.get(url, params, HTTP_ACCEPT='application/json')
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids += [product['id'] for product in response.json()['results']]
+            next_url = response.json()['next']
+            if not next_url:
+                return ids, response
+            response = self.client.get(next_url, HTTP_ACCEPT='application/json')
+
+    def test_cursor_pagination_is_stable_with_repeated_values(self):
+        """Test that walking all cursor pages by price returns every product exactly once."""
+        ids, response = self._walk({'pagination': 'cursor', 'ordering': 'price'})
+        self.assertNotIn('count', response.json())
+        expected = list(Product.objects.order_by('price', 'pk').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_page_number_pagination_without_count(self):
+        """Test that ?count=false paginates without the total count."""
+        ids, response = self._walk({'count': 'false', 'ordering': '-created_at'})
+        self.assertIsNone(response.json()['count'])
+        self.assertEqual(sorted(ids), sorted(Product.objects.values_list('id', flat=True)))
+
+    def test_default_pagination_still_counts(self):
+        """Test that the default page-number pagination keeps the exact count."""
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['count'], 8)
+
+
+class ProductResponseCacheTest(TestCase):
+    """
+    Tests for the response cache of the product list.
+    """
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name="Blusa", price=Decimal('19.90'), stock=4)
+        self.url = reverse('prenda_api:product-list-create')
+
+    def _get(self, **params):
+        return self.client.get(self.url, params, HTTP_ACCEPT='application/json')
+
+    def test_second_request_is_served_from_cache(self):
+        """Test that repeated requests hit the cache without querying the database."""
+        self.assertEqual(self._get()['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self._get()
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_query_params_are_normalized(self):
+        """Test that the same params in a different order share the cache entry."""
+        self.client.get(f'{self.url}?stock_min=1&ordering=price', HTTP_ACCEPT='application/json')
+        response = self.client.get(f'{self.url}?ordering=price&stock_min=1', HTTP_ACCEPT='application/json')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_scheme_is_part_of_the_key(self):
+        """Test that http and https requests do not share cached bodies (they hold absolute media URLs)."""
+        self.product.image = 'products/blusa.jpg'
+        self.product.save()
+        cache.clear()
+        http = self._get()
+        https = self.client.get(self.url, HTTP_ACCEPT='application/json', secure=True)
+        self.assertEqual((http['X-Cache'], https['X-Cache']), ('MISS', 'MISS'))
+        self.assertTrue(http.json()['results'][0]['image_url'].startswith('http://'))
+        self.assertTrue(https.json()['results'][0]['image_url'].startswith('https://'))
+
+    def test_product_change_invalidates_cache(self):
+        """Test that saving a product invalidates the cached listings."""
+        self._get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = "Blusa de lino"
+            self.product.save()
+        response = self._get()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['name'], "Blusa de lino")
+
+        stats = get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 2))
+
+    def test_invalidation_waits_for_commit(self):
+        """Test that the cache is only invalidated once the transaction commits."""
+        self._get()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Category.objects.create(name="Novedades")
+            self.product.save()
+            self.assertEqual(self._get()['X-Cache'], 'HIT')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._get()['X-Cache'], 'MISS')
+
+
+class CompiledProductSerializerTest(TestCase):
+    """
+    Tests for the compiled (values()-based) product list serializer.
+    """
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Vestidos")
+        for i in range(4):
+            Product.objects.create(
+                name=f"Vestido {i}", size="S", color="Rojo", price=Decimal('49.9') if i % 2 else Decimal('55.00'),
+                stock=i, category=category if i % 2 else None, image='products/vestido.jpg' if i == 2 else None
+            )
+        self.url = reverse('prenda_api:product-list-create')
+
+    def _get(self, **params):
+        return self.client.get(self.url, params, HTTP_ACCEPT='application/json')
+
+    def test_compiled_output_is_byte_identical(self):
+        """Test that ?serializer=compiled renders exactly the same JSON as the ModelSerializer."""
+        for params in ({}, {'ordering': 'price'}, {'pagination': 'cursor', 'ordering': '-stock'}):
+            default = self._get(serializer='default', **params)
+            compiled = self._get(serializer='compiled', **params)
+            self.assertEqual(compiled.status_code, 200)
+            self.assertEqual(compiled.content, default.content)
+
+    @override_settings(COMPILED_READ_SERIALIZERS=True)
+    def test_compiled_serializer_can_be_enabled_globally(self):
+        """Test that the setting turns the compiled list on and it keeps to one query per page."""
+        with self.assertNumQueries(3):  # validadores ETag + COUNT + página
+            response = self._get(ordering='name')
+        self.assertEqual(response.json()['results'][0]['name'], "Vestido 0")
+
+    def test_each_computed_field_with_sparse_fields(self):
+        """Test that every computed field requested alone with ?fields= matches the ModelSerializer."""
+        ids = ','.join(str(pk) for pk in Product.objects.order_by('-pk').values_list('pk', flat=True))
+        for field in CompiledProductListSerializer.computed:
+            for params in ({'fields': field}, {'fields': field, 'ids': ids}):
+                with self.subTest(field=field, **params):
+                    default = self._get(serializer='default', **params)
+                    compiled = self._get(serializer='compiled', **params)
+                    self.assertEqual(compiled.status_code, 200)
+                    self.assertEqual(compiled.content, default.content)
+
+
+class ProductImageURLTest(TestCase):
+    """
+    Tests for the per-request media URL resolution of product images.
+    """
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            name="Bolso", price=Decimal('35.00'), stock=3, image='products/bolso de piel.jpg'
+        )
+        self.url = reverse('prenda_api:product-list-create')
+
+    def test_image_url_matches_storage_url(self):
+        """Test that the resolved URL is the same one the storage would build."""
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        expected = 'http://testserver' + self.product.image.url
+        self.assertEqual(response.json()['results'][0]['image_url'], expected)
+        self.assertIn('bolso%20de%20piel.jpg', expected)
+
+    @override_settings(MEDIA_CDN_ORIGIN='https://cdn.example.com/')
+    def test_image_url_uses_cdn_origin(self):
+        """Test that a configured CDN origin replaces the request host."""
+        detail = reverse('prenda_api:product-detail', args=[self.product.pk])
+        response = self.client.get(detail, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['image_url'], 'https://cdn.example.com/media/products/bolso%20de%20piel.jpg')
+
+
+@override_settings(IMAGE_PROCESSING_MODE='sync')
+class ProductImageVariantsTest(TestCase):
+    """
+    Tests for the WebP variants generated from product images.
+    """
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        patcher = override_settings(MEDIA_ROOT=media_root)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def _upload(self, size=(2000, 1000)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, format='JPEG')
+        return SimpleUploadedFile('foto.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_variants_are_generated_after_upload(self):
+        """Test that saving an image produces resized WebP variants exposed by the API."""
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name="Chaqueta", price=Decimal('60.00'), image=self._upload())
+        product.refresh_from_db()
+        self.assertEqual(set(product.image_variants), {'thumb', 'medium', 'full'})
+
+        storage = product.image.storage
+        with storage.open(product.image_variants['thumb']) as thumb:
+            image = Image.open(thumb)
+            self.assertEqual((image.format, image.size), ('WEBP', (160, 80)))
+
+        response = self.client.get(reverse('prenda_api:product-list-create'), HTTP_ACCEPT='application/json')
+        variants = response.json()['results'][0]['image_variants']
+        self.assertTrue(variants['thumb'].startswith('http://testserver/media/content/'))
+        self.assertTrue(variants['thumb'].endswith('.webp'))
+
+    def test_backfill_command_processes_existing_images(self):
+        """Test that generate_image_variants fills in products without variants."""
+        with override_settings(IMAGE_PROCESSING_MODE='background'):
+            product = Product.objects.create(name="Pañuelo", price=Decimal('12.00'), image=self._upload((300, 300)))
+        self.assertEqual(product.image_variants, {})
+
+        out = StringIO()
+        call_command('generate_image_variants', '--workers', '1', stdout=out)
+        product.refresh_from_db()
+        self.assertEqual(set(product.image_variants), {'thumb', 'medium', 'full'})
+        self.assertIn('1 imágenes procesadas', out.getvalue())
+
+
+class ContentAddressedMediaTest(TestCase):
+    """
+    Tests for the content-addressed media storage, media serving and orphan collection.
+    """
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        patcher = override_settings(MEDIA_ROOT=media_root)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def _upload(self, name='foto.PNG', color='green'):
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10), color).save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_identical_uploads_share_one_file(self):
+        """Test that files are named by content hash and deduplicated across records."""
+        first = Product.objects.create(name="Falda", price=Decimal('20.00'), image=self._upload('a.PNG'))
+        second = Product.objects.create(name="Top", price=Decimal('15.00'), image=self._upload('b.png'))
+        self.assertRegex(first.image.name, r'^content/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(first.image.name, second.image.name)
+
+        other = Product.objects.create(name="Blusa", price=Decimal('15.00'), image=self._upload(color='blue'))
+        self.assertNotEqual(other.image.name, first.image.name)
+
+    def test_content_addressed_files_are_served_as_immutable(self):
+        """Test that media under content/ is served with a far-future immutable Cache-Control."""
+        product = Product.objects.create(name="Falda", price=Decimal('20.00'), image=self._upload())
+        response = self.client.get(product.image.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        response.close()
+
+    def test_extension_comes_from_the_verified_image_format(self):
+        """Test that the stored extension ignores the uploaded name and non-images get none."""
+        product = Product.objects.create(name="Falda", price=Decimal('20.00'), image=self._upload('foto.html'))
+        self.assertRegex(product.image.name, r'^content/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+
+        storage = get_media_storage()
+        name = storage.save('pagina.svg', ContentFile(b'<svg onload="alert(1)"></svg>'))
+        self.assertRegex(name, r'^content/[0-9a-f]{2}/[0-9a-f]{64}$')
+        response = self.client.get(storage.url(name))
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+        self.assertIn('sandbox', response['Content-Security-Policy'])
+        response.close()
+
+    def test_collect_orphan_media_keeps_referenced_files(self):
+        """Test that only files no longer referenced by any record are removed."""
+        kept = Product.objects.create(name="Falda", price=Decimal('20.00'), image=self._upload())
+        replaced = Product.objects.create(name="Top", price=Decimal('15.00'), image=self._upload(color='red'))
+        orphan_name = replaced.image.name
+        replaced.image = None
+        replaced.save()
+        storage = kept.image.storage
+
+        out = StringIO()
+        call_command('collect_orphan_media', '--min-age', '0', stdout=out)
+        self.assertIn('1 ficheros huérfanos borrados', out.getvalue())
+        self.assertFalse(storage.exists(orphan_name))
+        self.assertTrue(storage.exists(kept.image.name))
+
+
+class ProductLookupTest(TestCase):
+    """
+    Tests for the compact product lookup (/api/products/lookup/).
+    """
+    def setUp(self):
+        cache.clear()
+        Product.objects.create(name="Camisa", price=Decimal('19.90'), stock=4)
+        Product.objects.create(name="camiseta", price=Decimal('9.50'), stock=0)
+        Product.objects.create(name="Pantalón", price=Decimal('35.00'), stock=2)
+        self.url = reverse('prenda_api:product-lookup')
+
+    def _get(self, **params):
+        return self.client.get(self.url, params, HTTP_ACCEPT='application/json')
+
+    def test_returns_all_rows_as_tuples(self):
+        """Test that the lookup returns every product as [id, name, price, stock], ordered by name."""
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['fields'], ['id', 'name', 'price', 'stock'])
+        self.assertEqual(data['count'], 3)
+        self.assertEqual([row[1:] for row in data['results']], [
+            ["Camisa", "19.90", 4], ["camiseta", "9.50", 0], ["Pantalón", "35.00", 2],
+        ])
+
+    def test_prefix_filter_is_case_insensitive(self):
+        """Test that ?q= keeps only the names starting with the prefix, and ?limit= caps the rows."""
+        self.assertEqual([row[1] for row in self._get(q='CAM').json()['results']], ["Camisa", "camiseta"])
+        self.assertEqual([row[1] for row in self._get(q='cam', limit=1).json()['results']], ["Camisa"])
+        self.assertEqual(self._get(q='isa').json()['count'], 0)
+
+    def test_etag_revalidation(self):
+        """Test that a matching If-None-Match gets a 304 until a product changes."""
+        etag = self._get()['ETag']
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Vestido", price=Decimal('49.00'), stock=1)
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 4)
+
+
+class ProductCategoryNameETagTest(TestCase):
+    """
+    Tests that renaming a category changes the ETag of its products.
+    """
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Vestidos")
+        self.product = Product.objects.create(name="Vestido corto", price=Decimal('39.00'), stock=3, category=self.category)
+        self.url = reverse('prenda_api:product-detail', args=[self.product.pk])
+
+    def test_category_rename_refreshes_product_detail(self):
+        """Test that a category rename gives a 200 with the new category_name instead of a stale 304."""
+        etag = self.client.get(self.url, HTTP_ACCEPT='application/json')['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        category = Category.objects.get(pk=self.category.pk)
+        category.name = "Vestidos de fiesta"
+        category.save()
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['category_name'], "Vestidos de fiesta")
+
+    def test_category_delete_refreshes_product_list_and_detail(self):
+        """Test that deleting the category gives a 200 without category_name instead of a stale 304."""
+        list_url = reverse('prenda_api:product-list-create')
+        etags = {url: self.client.get(url, HTTP_ACCEPT='application/json')['ETag'] for url in (self.url, list_url)}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.get(pk=self.category.pk).delete()
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['results'][0]['category'])
+        self.assertIsNone(self.client.get(self.url, HTTP_ACCEPT='application/json').json()['category'])
+
+
+class ProductSparseFieldsTest(TestCase):
+    """
+    Tests for ?fields= / ?omit= on the product endpoints.
+    """
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Camisas")
+        self.product = Product.objects.create(
+            name="Camisa", price=Decimal('19.90'), stock=4, category=category, description="Algodón"
+        )
+        self.url = reverse('prenda_api:product-list-create')
+
+    def _get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params, HTTP_ACCEPT='application/json')
+        return response, queries.captured_queries[-1]['sql'] if queries.captured_queries else ''
+
+    def test_fields_trim_output_and_columns(self):
+        """Test that ?fields= returns only those keys and selects only the needed columns."""
+        response, sql = self._get(self.url, fields='id,name,category_name')
+        self.assertEqual(response.json()['results'], [{'id': self.product.pk, 'name': "Camisa", 'category_name': "Camisas"}])
+        self.assertNotIn('"products"."price"', sql)
+        self.assertIn('"categories"."name"', sql)
+
+        response, sql = self._get(self.url, fields='id,price')
+        self.assertEqual(response.json()['results'], [{'id': self.product.pk, 'price': "19.90"}])
+        self.assertNotIn('JOIN', sql)
+
+    def test_omit_on_detail_and_compiled_list(self):
+        """Test that ?omit= drops fields from the detail and from the compiled list."""
+        detail = reverse('prenda_api:product-detail', args=[self.product.pk])
+        response, sql = self._get(detail, omit='description,image,image_url,image_variants')
+        self.assertNotIn('description', response.json())
+        self.assertNotIn('"products"."description"', sql)
+        self.assertEqual(response.json()['name'], "Camisa")
+
+        default, _ = self._get(self.url, omit='image_url,image_variants')
+        compiled, _ = self._get(self.url, omit='image_url,image_variants', serializer='compiled')
+        self.assertEqual(compiled.json(), default.json())
+        self.assertNotIn('image_url', compiled.json()['results'][0])
+
+    def test_unknown_field_is_rejected(self):
+        """Test that an unknown field name returns 400 without querying the products."""
+        response, sql = self._get(self.url, fields='id,coste')
+        self.assertEqual(sql, '')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('coste', response.json()['fields'][0])
+
+
+class ProductStockUpdateTest(TestCase):
+    """
+    Tests that editing a product keeps the stock reserved by orders in the meantime.
+    """
+    def setUp(self):
+        self.category = Category.objects.create(name="Abrigos")
+        self.product = Product.objects.create(name="Abrigo", price=Decimal('80.00'), stock=5, category=self.category)
+        self.stale = Product.objects.get(pk=self.product.pk)
+        change_stock({self.product.pk: -2})  # un pedido reserva dos unidades tras cargar el producto
+
+    def _update(self, data):
+        serializer = ProductSerializer(self.stale, data=data, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer.save()
+
+    def assertStock(self, stock):
+        self.product.refresh_from_db()
+        self.category.refresh_from_db()
+        self.assertEqual((self.product.stock, self.category.stock_total), (stock, stock))
+        self.assertEqual(ledger_stock([self.product.pk])[self.product.pk], stock)
+
+    def test_edit_without_stock_keeps_reservations(self):
+        """Test that saving other fields does not write back the stock the product was loaded with."""
+        self.assertEqual(self._update({'name': "Abrigo largo"}).stock, 3)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, "Abrigo largo")
+        self.assertStock(3)
+
+    def test_stock_is_applied_as_a_delta(self):
+        """Test that a new stock adds the difference with the loaded value as an adjustment."""
+        self.assertEqual(self._update({'stock': 8}).stock, 6)
+        self.assertStock(6)
+        movement = InventoryMovement.objects.filter(product=self.product).latest('pk')
+        self.assertEqual((movement.kind, movement.quantity), (InventoryMovement.ADJUSTMENT, 3))
+
+    def test_category_change_moves_current_stock(self):
+        """Test that moving the product to another category moves the stock it has now."""
+        other = Category.objects.create(name="Chaquetas")
+        self._update({'category': other.pk})
+        self.category.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.category.stock_total, other.stock_total), (0, 3))
+
+    def test_removing_reserved_units_is_rejected(self):
+        """Test that taking away more units than are left is a validation error and changes nothing."""
+        serializer = ProductSerializer(self.stale, data={'stock': 0, 'name': "Otro"}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.assertRaises(ValidationError) as raised:
+            serializer.save()
+        self.assertIn("quedan 3", raised.exception.detail['stock'][0])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, "Abrigo")
+        self.assertStock(3)
+
+
+class InventoryLedgerTest(TestCase):
+    """
+    Tests for the inventory ledger: movements, historical stock and snapshot compaction.
+    """
+    def setUp(self):
+        self.product = Product.objects.create(name="Camisa", price=Decimal('10.00'), stock=10)
+        self.now = timezone.now()
+
+    def _kinds(self):
+        return list(self.product.inventory_movements.order_by('pk').values_list('kind', 'quantity'))
+
+    def test_stock_changes_are_recorded(self):
+        """Test that creation, manual edits and order reservations append movements."""
+        product = Product.objects.get(pk=self.product.pk)
+        product.stock = 7
+        product.save()
+        change_stock({product.pk: -2})
+        change_stock({product.pk: 1})
+        self.assertEqual(self._kinds(), [
+            (InventoryMovement.RECEIPT, 10), (InventoryMovement.ADJUSTMENT, -3),
+            (InventoryMovement.SALE, -2), (InventoryMovement.RETURN, 1),
+        ])
+        self.assertEqual(ledger_stock([product.pk]), {product.pk: 6})
+        self.assertEqual(Product.objects.get(pk=product.pk).stock, 6)
+
+    def test_stock_at_a_past_date(self):
+        """Test that the ledger answers the stock at any past moment."""
+        # Movimientos con fecha antigua (la entrada inicial se mueve al principio)
+        InventoryMovement.objects.filter(product=self.product).update(created_at=self.now - timedelta(days=10))
+        record_movements({self.product.pk: -4}, at=self.now - timedelta(days=5))
+        record_movements({self.product.pk: 6}, InventoryMovement.RECEIPT, at=self.now - timedelta(days=2))
+
+        def stock(days_ago):
+            return ledger_stock([self.product.pk], at=self.now - timedelta(days=days_ago))[self.product.pk]
+
+        self.assertEqual([stock(11), stock(7), stock(3), stock(0)], [0, 10, 6, 12])
+
+    def test_compaction_keeps_the_same_answers(self):
+        """Test that snapshots (and pruning) do not change current or recent stock."""
+        InventoryMovement.objects.filter(product=self.product).update(created_at=self.now - timedelta(days=60))
+        record_movements({self.product.pk: -3}, at=self.now - timedelta(days=40))
+        record_movements({self.product.pk: -1}, at=self.now - timedelta(days=5))
+        before = self.now - timedelta(days=30)
+        expected = [ledger_stock(at=moment)[self.product.pk] for moment in (before, self.now - timedelta(days=10), self.now)]
+
+        created, removed_movements, _ = compact_inventory(before, prune=True)
+        self.assertEqual((created, removed_movements), (1, 2))
+        self.assertEqual(InventorySnapshot.objects.get(product=self.product).stock, 7)
+        self.assertEqual(
+            [ledger_stock(at=moment)[self.product.pk] for moment in (before, self.now - timedelta(days=10), self.now)],
+            expected,
+        )
+        self.assertEqual(expected[-1], 6)
+
+        # Sin movimientos nuevos no hay nada que compactar
+        self.assertEqual(compact_inventory(before)[0], 0)
+
+    def test_stock_endpoint(self):
+        """Test that /products/<id>/stock/ returns current and historical stock."""
+        InventoryMovement.objects.filter(product=self.product).update(created_at=self.now - timedelta(days=10))
+        change_stock({self.product.pk: -4})
+        url = reverse('prenda_api:product-stock', args=[self.product.pk])
+        data = self.client.get(url, HTTP_ACCEPT='application/json').json()
+        self.assertEqual((data['stock'], data['current_stock']), (6, 6))
+
+        yesterday = (timezone.localdate() - timedelta(days=1)).isoformat()
+        self.assertEqual(self.client.get(url, {'at': yesterday}, HTTP_ACCEPT='application/json').json()['stock'], 10)
+        self.assertEqual(self.client.get(url, {'at': 'ayer'}, HTTP_ACCEPT='application/json').status_code, 400)
+
+    def test_benchmark_command_leaves_no_trace(self):
+        """Test that the benchmark reports identical stock and rolls back its movements."""
+        out = StringIO()
+        call_command('benchmark_inventory', '--movements', '20', '--repeat', '2', stdout=out)
+        self.assertIn('Stock idéntico', out.getvalue())
+        self.assertEqual(InventoryMovement.objects.count(), 1)
+        self.assertFalse(InventorySnapshot.objects.exists())
@@ -1,8 +1,11 @@
 from django.urls import path
+from fenix.batch import FetchByIdsAPIView
 from .api_views import (
     ProductListCreateAPIView,
     ProductRetrieveUpdateDestroyAPIView,
+    ProductLookupAPIView,
     export_products_csv_api,
+    product_stock_api,
 )
 
 app_name = 'prenda_api'  # Namespace para la API de prendas
@@ -10,10 +13,16 @@ app_name = 'prenda_api'  # Namespace para la API de prendas
 urlpatterns = [
     # Ruta para exportar productos en CSV (antes que <int:pk> para evitar conflictos)
     path('products/export-csv/', export_products_csv_api, name='product-export-csv'),
+    # Lista compacta (id, nombre, precio, stock) para desplegables
+    path('products/lookup/', ProductLookupAPIView.as_view(), name='product-lookup'),
     
     # Listar productos y crear uno nuevo
     path('products/', ProductListCreateAPIView.as_view(), name='product-list-create'),
+    # Varios productos por id (POST {"ids": [...]}, igual que GET /products/?ids=...)
+    path('products/by-ids/', FetchByIdsAPIView.as_view(list_view_class=ProductListCreateAPIView), name='product-by-ids'),
     
     # Obtener, actualizar o eliminar producto por id
     path('products/<int:pk>/', ProductRetrieveUpdateDestroyAPIView.as_view(), name='product-detail'),
+    # Stock actual o en una fecha (?at=) según el libro de inventario
+    path('products/<int:pk>/stock/', product_stock_api, name='product-stock'),
 ]
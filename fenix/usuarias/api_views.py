@@ -1,12 +1,21 @@
-from rest_framework import generics, status, filters
+from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
-import csv
-from .models import Usuaria
-from .serializers import UsuariaSerializer, UsuariaListSerializer, UsuariaCreateSerializer
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min, Q
+from django.utils import timezone
+from fenix.cache import get_namespace_version
+from fenix.batch import FetchByIdsMixin
+from fenix.compiled import CompiledListMixin
+from fenix.conditional import ConditionalGetMixin
+from fenix.exports import iter_keyset, stream_csv_response
+from fenix.search import FullTextSearchFilter, RankedOrderingFilter
+from fenix.sparse import SparseFieldsetMixin
+from .models import USUARIAS_NAMESPACE, Usuaria
+from .serializers import UsuariaSerializer, UsuariaListSerializer, UsuariaCreateSerializer, CompiledUsuariaListSerializer
 from django_filters import rest_framework as django_filters
 
 class UsuariaFilter(django_filters.FilterSet):
@@ -24,7 +33,7 @@ class UsuariaFilter(django_filters.FilterSet):
             'is_active': ['exact'],
         }
 
-class UsuariaListCreateAPIView(generics.ListCreateAPIView):
+class UsuariaListCreateAPIView(ConditionalGetMixin, FetchByIdsMixin, CompiledListMixin, generics.ListCreateAPIView):
     """
     Vista para listar todas las usuarias activas o crear una nueva.
     - GET /api/usuarias/ (Lista todas las usuarias activas con filtros)
@@ -42,14 +51,19 @@ class UsuariaListCreateAPIView(generics.ListCreateAPIView):
     - ?hire_date_from=2023-01-01&hire_date_to=2023-12-31 (rango de fechas contratación)
     - ?salary_min=1000&salary_max=5000 (rango salarial)
     - ?ordering=first_name,-created_at (ordena por campos)
+    - ?ids=3,1,2 (solo esas usuarias, en ese orden y sin paginar; ver fenix/batch.py)
+    
+    - ?serializer=compiled (listado con el serializador compilado, ver fenix/compiled.py)
     
     Para subir avatar: usar Content-Type: multipart/form-data
     """
     queryset = Usuaria.objects.filter(is_active=True)
+    compiled_serializer_class = CompiledUsuariaListSerializer
     parser_classes = [MultiPartParser, FormParser, JSONParser]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter]
     filterset_class = UsuariaFilter
     search_fields = ['first_name', 'last_name', 'username', 'email']
+    trigram_search_fields = ['first_name', 'last_name', 'username']
     ordering_fields = ['first_name', 'last_name', 'username', 'created_at', 'hire_date']
     ordering = ['-created_at']
     
@@ -80,7 +94,7 @@ class UsuariaListCreateAPIView(generics.ListCreateAPIView):
             return Response(response_serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class UsuariaRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class UsuariaRetrieveUpdateDestroyAPIView(ConditionalGetMixin, SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Vista para recuperar, actualizar o eliminar una usuaria específica.
     - GET /api/usuarias/{id}/ (Obtiene los detalles de una usuaria)
@@ -119,20 +133,14 @@ class UsuariaRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView)
 def export_usuarias_csv_api(request):
     """
     Vista de API para exportar todas las usuarias a un archivo CSV.
-    Accesible via GET a /api/usuarias/export-csv/
+    Accesible via GET a /api/usuarias/export-csv/ (?compress=gzip para descargarlo comprimido)
     """
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="usuarias.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow([
+    header = [
         'ID', 'Username', 'Nombre', 'Apellido', 'Email', 'Teléfono',
         'Rol', 'Estado', 'Fecha Contratación', 'Salario', 'Activa', 'Fecha Creación'
-    ])
-
-    usuarias = Usuaria.objects.all().order_by('id')
-    for usuaria in usuarias:
-        writer.writerow([
+    ]
+    rows = (
+        [
             usuaria.id,
             usuaria.username,
             usuaria.first_name,
@@ -145,9 +153,10 @@ def export_usuarias_csv_api(request):
             usuaria.salary or '',
             'Sí' if usuaria.is_active else 'No',
             usuaria.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
-    return response
+        ]
+        for usuaria in iter_keyset(Usuaria.objects.all())
+    )
+    return stream_csv_response(request, 'usuarias.csv', header, rows)
 
 @api_view(['POST'])
 def reactivate_usuaria_api(request, pk):
@@ -173,31 +182,105 @@ def reactivate_usuaria_api(request, pk):
             status=status.HTTP_404_NOT_FOUND
         )
 
+# Tramos de antigüedad (años desde hire_date) de las estadísticas: (clave, desde, hasta)
+TENURE_COHORTS = [
+    ('menos_de_1', 0, 1),
+    ('de_1_a_3', 1, 3),
+    ('de_3_a_5', 3, 5),
+    ('mas_de_5', 5, None),
+]
+
+
+def _years_ago(today, years):
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:  # 29 de febrero
+        return today.replace(year=today.year - years, day=28)
+
+
+def build_usuarias_statistics(today=None):
+    """
+    Calcula todas las estadísticas de usuarias con una sola consulta
+    (agregación condicional: COUNT/AVG/MIN/MAX ... FILTER (WHERE ...)).
+    """
+    today = today or timezone.localdate()
+    with_salary = Q(salary__isnull=False)
+
+    aggregates = {
+        'total': Count('pk'),
+        'activas': Count('pk', filter=Q(is_active=True)),
+        'salario_promedio': Avg('salary', filter=with_salary),
+        'sin_fecha': Count('pk', filter=Q(hire_date__isnull=True)),
+    }
+    for role, _ in Usuaria.ROLE_CHOICES:
+        role_filter = Q(role=role)
+        aggregates[f'rol_{role}'] = Count('pk', filter=role_filter)
+        aggregates[f'rol_{role}_con_salario'] = Count('pk', filter=role_filter & with_salary)
+        aggregates[f'rol_{role}_min'] = Min('salary', filter=role_filter)
+        aggregates[f'rol_{role}_max'] = Max('salary', filter=role_filter)
+        aggregates[f'rol_{role}_avg'] = Avg('salary', filter=role_filter & with_salary)
+    for status_value, _ in Usuaria.STATUS_CHOICES:
+        aggregates[f'estado_{status_value}'] = Count('pk', filter=Q(status=status_value))
+    for key, years_from, years_to in TENURE_COHORTS:
+        cohort = Q(hire_date__lte=_years_ago(today, years_from))
+        if years_to is not None:
+            cohort &= Q(hire_date__gt=_years_ago(today, years_to))
+        aggregates[f'antiguedad_{key}'] = Count('pk', filter=cohort)
+
+    row = Usuaria.objects.aggregate(**aggregates)
+
+    return {
+        'total_usuarias': row['total'],
+        'usuarias_activas': row['activas'],
+        'usuarias_inactivas': row['total'] - row['activas'],
+        # Mismo formato que antes: solo los valores presentes, ordenados
+        'por_rol': [
+            {'role': role, 'count': row[f'rol_{role}']}
+            for role in sorted(role for role, _ in Usuaria.ROLE_CHOICES)
+            if row[f'rol_{role}']
+        ],
+        'por_estado': [
+            {'status': value, 'count': row[f'estado_{value}']}
+            for value in sorted(value for value, _ in Usuaria.STATUS_CHOICES)
+            if row[f'estado_{value}']
+        ],
+        'salario_promedio': row['salario_promedio'],
+        'salario_por_rol': [
+            {
+                'role': role,
+                'nombre': label,
+                'con_salario': row[f'rol_{role}_con_salario'],
+                'minimo': row[f'rol_{role}_min'],
+                'maximo': row[f'rol_{role}_max'],
+                'promedio': row[f'rol_{role}_avg'],
+            }
+            for role, label in Usuaria.ROLE_CHOICES
+        ],
+        'antiguedad': {
+            **{key: row[f'antiguedad_{key}'] for key, _, _ in TENURE_COHORTS},
+            'sin_fecha': row['sin_fecha'],
+        },
+    }
+
+
+def get_usuarias_statistics():
+    """
+    Estadísticas servidas desde una instantánea en caché, que se invalida al guardar
+    o borrar cualquier usuaria (ver usuarias/models.py).
+    Con USUARIAS_STATISTICS_CACHE_TIMEOUT=0 se calculan siempre al momento.
+    """
+    timeout = getattr(settings, 'USUARIAS_STATISTICS_CACHE_TIMEOUT', 300)
+    if timeout <= 0:
+        return build_usuarias_statistics()
+    today = timezone.localdate()
+    key = f'{USUARIAS_NAMESPACE}:statistics:{get_namespace_version(USUARIAS_NAMESPACE)}:{today.isoformat()}'
+    return cache.get_or_set(key, lambda: build_usuarias_statistics(today), timeout)
+
+
 @api_view(['GET'])
 def usuarias_statistics_api(request):
     """
     Vista de API para obtener estadísticas de usuarias.
     Accesible via GET a /api/usuarias/statistics/
     """
-    from django.db.models import Count, Avg
-    
-    stats = {
-        'total_usuarias': Usuaria.objects.count(),
-        'usuarias_activas': Usuaria.objects.filter(is_active=True).count(),
-        'usuarias_inactivas': Usuaria.objects.filter(is_active=False).count(),
-        'por_rol': list(
-            Usuaria.objects.values('role')
-            .annotate(count=Count('role'))
-            .order_by('role')
-        ),
-        'por_estado': list(
-            Usuaria.objects.values('status')
-            .annotate(count=Count('status'))
-            .order_by('status')
-        ),
-        'salario_promedio': Usuaria.objects.filter(
-            salary__isnull=False
-        ).aggregate(avg_salary=Avg('salary'))['avg_salary']
-    }
-    
-    return Response(stats, status=status.HTTP_200_OK)
+    return Response(get_usuarias_statistics(), status=status.HTTP_200_OK)
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:37
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+from django.contrib.postgres.operations import TrigramExtension
+
+
+def populate_search_vector(apps, schema_editor):
+    """Rellena search_vector de las filas existentes (solo PostgreSQL)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from fenix.search import weighted_search_vector
+    Usuaria = apps.get_model('usuarias', 'Usuaria')
+    Usuaria.objects.update(search_vector=weighted_search_vector([('first_name', 'A'), ('last_name', 'A'), ('username', 'A'), ('email', 'B')]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarias', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='usuaria',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='usuaria',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='usuarias_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='usuaria',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['first_name'], name='usuarias_first_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='usuaria',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['last_name'], name='usuarias_last_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='usuaria',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['username'], name='usuarias_username_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
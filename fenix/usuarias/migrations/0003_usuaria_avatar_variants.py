@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarias', '0002_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuaria',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Variantes del Avatar'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:49
+
+import fenix.storage
+import usuarias.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarias', '0003_usuaria_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usuaria',
+            name='avatar',
+            field=models.ImageField(blank=True, help_text='Foto de perfil de la usuaria', null=True, storage=fenix.storage.get_media_storage, upload_to=usuarias.models.usuaria_avatar_upload_path, verbose_name='Avatar'),
+        ),
+    ]
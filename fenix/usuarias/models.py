@@ -1,7 +1,23 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from fenix.cache import invalidate_namespace
+from fenix.images import crop_to_square, delete_file, encode_webp, open_image, save_hashed, schedule_image_task
+from fenix.storage import get_media_storage
+from fenix.search import refresh_search_vector
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 
+# Espacio de caché de las estadísticas de usuarias (ver usuarias/api_views.py)
+USUARIAS_NAMESPACE = 'usuarias'
+
+# Los avatars procesados se guardan con nombre = hash del contenido en este directorio
+# (con MEDIA_CONTENT_ADDRESSED van a content/<aa>/<sha>, ver fenix/storage.py)
+AVATAR_NORMALIZED_DIR = 'usuarias/avatars/normalized'
+
 def usuaria_avatar_upload_path(instance, filename):
     """Generate upload path for usuaria avatars"""
     ext = filename.split('.')[-1]
@@ -77,12 +93,22 @@ class Usuaria(models.Model):
     
     avatar = models.ImageField(
         upload_to=usuaria_avatar_upload_path,
+        storage=get_media_storage,
         null=True,
         blank=True,
         verbose_name="Avatar",
         help_text="Foto de perfil de la usuaria"
     )
     
+    # Tamaños cuadrados WebP del avatar ({'small': nombre, ...}); se generan en segundo
+    # plano tras subirlo y el propio avatar pasa a ser la versión 'large'
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Variantes del Avatar"
+    )
+    
     hire_date = models.DateField(
         null=True,
         blank=True,
@@ -119,6 +145,17 @@ class Usuaria(models.Model):
         verbose_name="Fecha de Actualización"
     )
     
+    # Columna de búsqueda de texto completo (PostgreSQL), se actualiza al guardar
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    
+    # Campos (y peso) que alimentan search_vector
+    SEARCH_FIELDS = [
+        ('first_name', 'A'), ('last_name', 'A'), ('username', 'A'), ('email', 'B'),
+    ]
+    
+    # Tamaños (lado en píxeles) de los avatars procesados
+    AVATAR_SIZES = {'small': 64, 'medium': 256, 'large': 512}
+    
     class Meta:
         db_table = 'usuarias'
         verbose_name = "Usuaria"
@@ -128,6 +165,11 @@ class Usuaria(models.Model):
             models.Index(fields=['username']),
             models.Index(fields=['email']),
             models.Index(fields=['role']),
+            # Búsqueda: texto completo y trigramas sobre nombre, apellido y username
+            GinIndex(fields=['search_vector'], name='usuarias_search_gin'),
+            GinIndex(fields=['first_name'], name='usuarias_first_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['last_name'], name='usuarias_last_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['username'], name='usuarias_username_trgm', opclasses=['gin_trgm_ops']),
         ]
     
     def __str__(self):
@@ -142,3 +184,81 @@ class Usuaria(models.Model):
         """Devuelve el nombre del rol en español"""
         role_dict = dict(self.ROLE_CHOICES)
         return role_dict.get(self.role, self.role)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Recordamos el avatar con el que se cargó para detectar cuándo se cambia
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_avatar = instance.__dict__.get('avatar')
+        return instance
+
+
+def normalize_usuaria_avatar(usuaria_id, avatar_name):
+    """
+    Procesa el avatar subido: recorte cuadrado a cada tamaño de AVATAR_SIZES, WebP sin
+    EXIF y nombre con el hash del contenido. El avatar pasa a ser la versión 'large'
+    y se borra en el momento el fichero original (que conserva los metadatos de la foto),
+    salvo que con el almacenamiento por contenido lo use también otro registro.
+    Las versiones anteriores no se borran aquí: al ir por hash pueden estar compartidas
+    (las limpia la recolección de ficheros huérfanos).
+    """
+    storage = Usuaria._meta.get_field('avatar').storage
+    with storage.open(avatar_name, 'rb') as source:
+        image = open_image(source)
+        image.load()
+    variants = {
+        size_name: save_hashed(storage, f'{AVATAR_NORMALIZED_DIR}/{size}', encode_webp(crop_to_square(image, size)))
+        for size_name, size in Usuaria.AVATAR_SIZES.items()
+    }
+    updated = Usuaria.objects.filter(pk=usuaria_id, avatar=avatar_name).update(
+        avatar=variants['large'], avatar_variants=variants, updated_at=timezone.now()
+    )
+    if updated:
+        delete_file(storage, avatar_name)
+    return variants
+
+
+def is_normalized_avatar(name):
+    """
+    True si `name` es una versión ya procesada de algún avatar. Con el almacenamiento por
+    contenido el nombre no indica nada (content/<aa>/<sha>), así que se busca entre las
+    versiones guardadas; con el de siempre basta el directorio.
+    """
+    if name.startswith(f'{AVATAR_NORMALIZED_DIR}/'):
+        return True
+    return Usuaria.objects.filter(avatar_variants__icontains=name).exists()
+
+
+@receiver(post_save, sender=Usuaria)
+def update_usuaria_search_vector(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        refresh_search_vector(instance, Usuaria.SEARCH_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=Usuaria)
+def schedule_avatar_normalization(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'avatar' not in update_fields):
+        return
+    avatar_name = instance.avatar.name or ''
+    loaded_name = getattr(instance, '_loaded_avatar', None) or ''
+    if avatar_name == loaded_name:
+        return
+    instance._loaded_avatar = avatar_name
+
+    # Un avatar ya procesado (una de sus propias versiones o reasignado desde otra
+    # usuaria) no se vuelve a procesar
+    normalized = bool(avatar_name) and (
+        avatar_name in (instance.avatar_variants or {}).values() or is_normalized_avatar(avatar_name)
+    )
+    if instance.avatar_variants:
+        Usuaria.objects.filter(pk=instance.pk).update(avatar_variants={})
+        instance.avatar_variants = {}
+    if avatar_name and not normalized:
+        schedule_image_task(normalize_usuaria_avatar, instance.pk, avatar_name)
+
+
+@receiver(post_save, sender=Usuaria)
+@receiver(post_delete, sender=Usuaria)
+def invalidate_usuarias_statistics(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_namespace(USUARIAS_NAMESPACE)
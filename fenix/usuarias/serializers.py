@@ -1,7 +1,16 @@
 from rest_framework import serializers
+from fenix.compiled import CompiledSerializer
+from fenix.media import media_url
 from .models import Usuaria
 from django.core.validators import validate_email
 
+
+def avatar_variant_urls(variants, request=None):
+    """{tamaño: nombre guardado} -> {tamaño: URL}"""
+    storage = Usuaria._meta.get_field('avatar').storage
+    return {size: media_url(name, request, storage) for size, name in (variants or {}).items()}
+
+
 class UsuariaSerializer(serializers.ModelSerializer):
     """
     Serializador completo para el modelo Usuaria con soporte para avatars.
@@ -9,33 +18,43 @@ class UsuariaSerializer(serializers.ModelSerializer):
     # Campo para mostrar la URL completa del avatar
     avatar_url = serializers.SerializerMethodField()
     
+    # URLs de los avatars cuadrados procesados ({} hasta que se generan)
+    avatar_variants = serializers.SerializerMethodField()
+    
     # Campo para mostrar el nombre completo (solo lectura)
     full_name = serializers.CharField(read_only=True)
     
     # Campo para mostrar el rol en español (solo lectura)
     role_display = serializers.CharField(source='get_role_display', read_only=True)
+
+    # Columnas que usan los campos calculados (?fields= / ?omit=, ver fenix/sparse.py)
+    sparse_sources = {
+        'avatar_url': ('avatar',),
+        'avatar_variants': ('avatar_variants',),
+        'full_name': ('first_name', 'last_name'),
+        'role_display': ('role',),
+    }
     
     class Meta:
         model = Usuaria
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name', 'full_name',
-            'phone', 'role', 'role_display', 'status', 'avatar', 'avatar_url',
+            'phone', 'role', 'role_display', 'status', 'avatar', 'avatar_url', 'avatar_variants',
             'hire_date', 'salary', 'address', 'is_active', 
             'created_at', 'updated_at'
         ]
-        read_only_fields = ('created_at', 'updated_at', 'avatar_url', 'full_name', 'role_display')
+        read_only_fields = ('created_at', 'updated_at', 'avatar_url', 'avatar_variants', 'full_name', 'role_display')
         extra_kwargs = {
             'salary': {'write_only': True},  # El salario no se muestra en respuestas por seguridad
         }
     
     def get_avatar_url(self, obj):
         """Devuelve la URL completa del avatar"""
-        if obj.avatar:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.avatar.url)
-            return obj.avatar.url
-        return None
+        return media_url(obj.avatar, self.context.get('request'))
+    
+    def get_avatar_variants(self, obj):
+        """Devuelve las URLs de los avatars procesados (small, medium, large)"""
+        return avatar_variant_urls(obj.avatar_variants, self.context.get('request'))
     
     def validate_email(self, value):
         """Validar formato de email"""
@@ -77,24 +96,51 @@ class UsuariaListSerializer(serializers.ModelSerializer):
     Serializador simplificado para listado de usuarias (sin información sensible)
     """
     avatar_url = serializers.SerializerMethodField()
+    avatar_variants = serializers.SerializerMethodField()
     full_name = serializers.CharField(read_only=True)
     role_display = serializers.CharField(source='get_role_display', read_only=True)
+    sparse_sources = UsuariaSerializer.sparse_sources
     
     class Meta:
         model = Usuaria
         fields = [
             'id', 'username', 'full_name', 'email', 'role', 'role_display',
-            'status', 'avatar_url', 'is_active', 'created_at'
+            'status', 'avatar_url', 'avatar_variants', 'is_active', 'created_at'
         ]
     
     def get_avatar_url(self, obj):
         """Devuelve la URL completa del avatar"""
-        if obj.avatar:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.avatar.url)
-            return obj.avatar.url
-        return None
+        return media_url(obj.avatar, self.context.get('request'))
+    
+    def get_avatar_variants(self, obj):
+        """Devuelve las URLs de los avatars procesados (small, medium, large)"""
+        return avatar_variant_urls(obj.avatar_variants, self.context.get('request'))
+
+class CompiledUsuariaListSerializer(CompiledSerializer):
+    """
+    Versión compilada de UsuariaListSerializer (misma salida) sobre filas de .values().
+    """
+    serializer_class = UsuariaListSerializer
+    computed = {
+        'full_name': 'get_full_name',
+        'role_display': 'get_role_display',
+        'avatar_url': 'get_avatar_url',
+        'avatar_variants': 'get_avatar_variants',
+    }
+    extra_columns = ('first_name', 'last_name', 'role', 'avatar', 'avatar_variants')
+    role_labels = dict(Usuaria.ROLE_CHOICES)
+
+    def get_full_name(self, row):
+        return f"{row['first_name']} {row['last_name']}"
+
+    def get_role_display(self, row):
+        return str(self.role_labels.get(row['role'], row['role']))
+
+    def get_avatar_url(self, row):
+        return media_url(row['avatar'], self.context.get('request'), Usuaria._meta.get_field('avatar').storage)
+
+    def get_avatar_variants(self, row):
+        return avatar_variant_urls(row['avatar_variants'], self.context.get('request'))
 
 class UsuariaCreateSerializer(serializers.ModelSerializer):
     """
@@ -1,3 +1,236 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .models import Usuaria, normalize_usuaria_avatar
+from .serializers import CompiledUsuariaListSerializer
+
+
+class UsuariaConditionalGetTest(TestCase):
+    """
+    Tests for ETag / Last-Modified support on the usuaria endpoints.
+    """
+    def setUp(self):
+        self.usuaria = Usuaria.objects.create(
+            username="marta", email="marta@example.com", first_name="Marta", last_name="Ruiz"
+        )
+        self.detail_url = reverse('usuarias_api:usuaria-detail', args=[self.usuaria.pk])
+        self.list_url = reverse('usuarias_api:usuaria-list-create')
+
+    def test_detail_returns_304_when_not_modified(self):
+        """Test that a matching If-None-Match returns 304 with a single cheap query."""
+        response = self.client.get(self.detail_url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.usuaria.phone = '+34600111222'
+        self.usuaria.save()
+        response = self.client.get(self.detail_url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_changes_with_filtered_rows(self):
+        """Test that the list ETag depends on the filtered rows."""
+        etag = self.client.get(self.list_url, HTTP_ACCEPT='application/json')['ETag']
+        response = self.client.get(self.list_url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Usuaria.objects.create(username="nora", email="nora@example.com", first_name="Nora", last_name="Gil")
+        response = self.client.get(self.list_url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+
+
+class CompiledUsuariaSerializerTest(TestCase):
+    """
+    Tests for the compiled (values()-based) usuaria list serializer.
+    """
+    def setUp(self):
+        cache.clear()
+        self.usuarias = [
+            Usuaria.objects.create(username="ana", email="ana@example.com", first_name="Ana", last_name="Sanz", role='MANAGER'),
+            Usuaria.objects.create(username="bea", email="bea@example.com", first_name="Bea", last_name="Mora"),
+        ]
+        self.url = reverse('usuarias_api:usuaria-list-create')
+
+    def _get(self, **params):
+        return self.client.get(self.url, params, HTTP_ACCEPT='application/json')
+
+    def test_compiled_output_is_byte_identical(self):
+        """Test that ?serializer=compiled renders exactly the same JSON as the ModelSerializer."""
+        default = self._get(serializer='default')
+        compiled = self._get(serializer='compiled')
+        self.assertEqual(compiled.status_code, 200)
+        self.assertEqual(compiled.content, default.content)
+
+    def test_each_computed_field_with_sparse_fields(self):
+        """Test that every computed field requested alone with ?fields= matches the ModelSerializer."""
+        ids = f'{self.usuarias[1].pk},{self.usuarias[0].pk}'
+        for field in CompiledUsuariaListSerializer.computed:
+            for params in ({'fields': field}, {'fields': field, 'ids': ids}):
+                with self.subTest(field=field, **params):
+                    default = self._get(serializer='default', **params)
+                    compiled = self._get(serializer='compiled', **params)
+                    self.assertEqual(compiled.status_code, 200)
+                    self.assertEqual(compiled.content, default.content)
+
+
+class UsuariaStatisticsTest(TestCase):
+    """
+    Tests for the usuarias statistics endpoint.
+    """
+    def setUp(self):
+        cache.clear()
+        today = timezone.localdate()
+        Usuaria.objects.create(
+            username="ana", email="ana@example.com", first_name="Ana", last_name="Sanz",
+            role='ADMIN', salary=Decimal('3000.00'), hire_date=today - timedelta(days=30)
+        )
+        Usuaria.objects.create(
+            username="eva", email="eva@example.com", first_name="Eva", last_name="Mora",
+            role='EMPLOYEE', salary=Decimal('1500.00'), hire_date=today - timedelta(days=2 * 365)
+        )
+        Usuaria.objects.create(
+            username="ines", email="ines@example.com", first_name="Inés", last_name="Vidal",
+            role='EMPLOYEE', salary=Decimal('1700.00'), hire_date=today - timedelta(days=10 * 365),
+            is_active=False, status='INACTIVE'
+        )
+        self.url = reverse('usuarias_api:usuaria-statistics')
+
+    def test_statistics_use_a_single_query(self):
+        """Test that all the statistics come from one aggregation query."""
+        with self.assertNumQueries(1):
+            data = self.client.get(self.url, HTTP_ACCEPT='application/json').json()
+        self.assertEqual((data['total_usuarias'], data['usuarias_activas'], data['usuarias_inactivas']), (3, 2, 1))
+        self.assertEqual(data['por_rol'], [{'role': 'ADMIN', 'count': 1}, {'role': 'EMPLOYEE', 'count': 2}])
+        self.assertEqual(data['por_estado'], [{'status': 'ACTIVE', 'count': 2}, {'status': 'INACTIVE', 'count': 1}])
+        self.assertEqual(
+            data['antiguedad'], {'menos_de_1': 1, 'de_1_a_3': 1, 'de_3_a_5': 0, 'mas_de_5': 1, 'sin_fecha': 0}
+        )
+        employees = next(row for row in data['salario_por_rol'] if row['role'] == 'EMPLOYEE')
+        self.assertEqual((employees['minimo'], employees['maximo']), (1500.0, 1700.0))
+
+    def test_snapshot_is_invalidated_on_save(self):
+        """Test that the cached snapshot is reused until a usuaria changes."""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url, HTTP_ACCEPT='application/json')
+
+        Usuaria.objects.filter(username="ines").get().delete()
+        data = self.client.get(self.url, HTTP_ACCEPT='application/json').json()
+        self.assertEqual(data['total_usuarias'], 2)
+
+    @override_settings(USUARIAS_STATISTICS_CACHE_TIMEOUT=0)
+    def test_snapshot_can_be_disabled(self):
+        """Test that a zero timeout always computes fresh statistics."""
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.client.get(self.url, HTTP_ACCEPT='application/json')
+
+
+class UsuariaAvatarPipelineTest(TestCase):
+    """
+    Tests for the avatar normalization pipeline.
+    """
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        patcher = override_settings(MEDIA_ROOT=media_root)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.url = reverse('usuarias_api:usuaria-list-create')
+
+    def _photo(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camara de prueba'  # Make
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), 'blue').save(buffer, format='JPEG', exif=exif)
+        return SimpleUploadedFile('foto.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def _create(self):
+        return self.client.post(self.url, {
+            'username': 'lola', 'email': 'lola@example.com', 'first_name': 'Lola', 'last_name': 'Paz',
+            'avatar': self._photo(),
+        })
+
+    @override_settings(IMAGE_PROCESSING_MODE='sync')
+    def test_avatar_is_normalized_after_commit(self):
+        """Test that the avatar becomes square, EXIF-free WebP files with content-hashed names."""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._create()
+        self.assertEqual(response.status_code, 201)
+
+        usuaria = Usuaria.objects.get(username='lola')
+        self.assertEqual(set(usuaria.avatar_variants), {'small', 'medium', 'large'})
+        self.assertEqual(usuaria.avatar.name, usuaria.avatar_variants['large'])
+        self.assertRegex(usuaria.avatar.name, r'^content/[0-9a-f]{2}/[0-9a-f]{64}\.webp$')
+
+        with usuaria.avatar.open('rb') as avatar:
+            image = Image.open(avatar)
+            self.assertEqual((image.format, image.size), ('WEBP', (512, 512)))
+            self.assertEqual(len(image.getexif()), 0)
+        # El original (con EXIF) se ha borrado: solo quedan las tres versiones WebP
+        stored = [name for _, _, files in os.walk(settings.MEDIA_ROOT) for name in files]
+        self.assertEqual(len(stored), 3)
+        self.assertTrue(all(name.endswith('.webp') for name in stored))
+
+        detail = self.client.get(reverse('usuarias_api:usuaria-detail', args=[usuaria.pk]), HTTP_ACCEPT='application/json')
+        self.assertTrue(detail.json()['avatar_variants']['small'].endswith('.webp'))
+
+    def test_shared_original_is_kept_while_referenced(self):
+        """Test that an identical upload still used by another usuaria is not deleted."""
+        with self.captureOnCommitCallbacks():
+            self._create()
+            self.client.post(self.url, {
+                'username': 'rita', 'email': 'rita@example.com', 'first_name': 'Rita', 'last_name': 'Paz',
+                'avatar': self._photo(),
+            })
+        lola, rita = Usuaria.objects.get(username='lola'), Usuaria.objects.get(username='rita')
+        self.assertEqual(lola.avatar.name, rita.avatar.name)
+
+        normalize_usuaria_avatar(lola.pk, lola.avatar.name)
+        self.assertTrue(rita.avatar.storage.exists(rita.avatar.name))
+        normalize_usuaria_avatar(rita.pk, rita.avatar.name)
+        self.assertFalse(rita.avatar.storage.exists(rita.avatar.name))
+
+    @override_settings(IMAGE_PROCESSING_MODE='sync')
+    def test_normalized_avatar_is_not_processed_again(self):
+        """Test that assigning an already normalized avatar does not schedule normalization."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create()
+        lola = Usuaria.objects.get(username='lola')
+        rita = Usuaria.objects.create(username='rita', email='rita@example.com', first_name='Rita', last_name='Paz')
+        rita.avatar = lola.avatar.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            rita.save()
+        self.assertEqual(callbacks, [])
+
+        # Ni tampoco volver a poner a lola su propia versión pequeña
+        lola.avatar = lola.avatar_variants['small']
+        with self.captureOnCommitCallbacks() as callbacks:
+            lola.save()
+        self.assertEqual(callbacks, [])
+
+    def test_post_does_not_wait_for_image_work(self):
+        """Test that in background mode the POST returns before any processing happens."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self._create()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(Usuaria.objects.get(username='lola').avatar_variants, {})
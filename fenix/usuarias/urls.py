@@ -1,4 +1,5 @@
 from django.urls import path
+from fenix.batch import FetchByIdsAPIView
 from .api_views import (
     UsuariaListCreateAPIView,
     UsuariaRetrieveUpdateDestroyAPIView,
@@ -13,6 +14,8 @@ urlpatterns = [
     # CRUD endpoints for usuarias
     path('usuarias/', UsuariaListCreateAPIView.as_view(), name='usuaria-list-create'),
     path('usuarias/<int:pk>/', UsuariaRetrieveUpdateDestroyAPIView.as_view(), name='usuaria-detail'),
+    # Varias usuarias por id (POST {"ids": [...]}, igual que GET /usuarias/?ids=...)
+    path('usuarias/by-ids/', FetchByIdsAPIView.as_view(list_view_class=UsuariaListCreateAPIView), name='usuaria-by-ids'),
     
     # Additional endpoints
     path('usuarias/export-csv/', export_usuarias_csv_api, name='usuaria-export-csv'),
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from "react";
 import { FaPlus, FaEdit, FaTrash, FaEye, FaTimes } from "react-icons/fa";
-import { orderAPI, customerAPI, productAPI, usuariaAPI, orderItemAPI, handleAPIError } from '../services/api';
+import { orderAPI, bootstrapAPI, orderItemAPI, handleAPIError } from '../services/api';
 import { toast, ToastContainer } from 'react-toastify';
 import 'react-toastify/dist/ReactToastify.css';
 
@@ -26,29 +26,29 @@ const VentasApp = () => {
   });
 
   useEffect(() => {
-    fetchOrders();
-    fetchCustomers();
-    fetchProducts();
-    fetchUsers();
+    fetchScreen();
   }, []);
 
-  const fetchProducts = async () => {
+  // Carga inicial de la pantalla en una sola petición: pedidos, clientes, productos y usuarias
+  const fetchScreen = async () => {
     try {
-      const response = await productAPI.getAll();
-      setProducts(response.data.results || response.data);
-    } catch (error) {
-      const errorInfo = handleAPIError(error);
-      toast.error(`Error al cargar productos: ${errorInfo.message}`);
-    }
-  };
-
-  const fetchUsers = async () => {
-    try {
-      const response = await usuariaAPI.getAll();
-      setUsers(response.data.results || response.data);
+      setIsLoading(true);
+      const response = await bootstrapAPI.load([
+        { resource: 'orders', limit: 20 }, // igual que la primera página de /orders/
+        { resource: 'customers', fields: ['id', 'name'] },
+        { resource: 'products', fields: ['id', 'name', 'price'] },
+        { resource: 'usuarias', fields: ['id', 'first_name', 'last_name', 'username'] },
+      ]);
+      const data = response.data;
+      setOrders([...data.orders.results]);
+      setCustomers(data.customers.results);
+      setProducts(data.products.results);
+      setUsers(data.usuarias.results);
     } catch (error) {
       const errorInfo = handleAPIError(error);
-      toast.error(`Error al cargar usuarias: ${errorInfo.message}`);
+      toast.error(`Error al cargar la pantalla de ventas: ${errorInfo.message}`);
+    } finally {
+      setIsLoading(false);
     }
   };
 
@@ -67,13 +67,15 @@ const VentasApp = () => {
     }
   };
 
-  const fetchCustomers = async () => {
+  // Vuelve a leer solo los pedidos indicados (una petición) y los sustituye en la lista
+  const refreshOrders = async (ids) => {
     try {
-      const response = await customerAPI.getAll();
-      setCustomers(response.data.results || response.data);
+      const response = await orderAPI.getByIds(ids);
+      const fresh = new Map(response.data.results.map(order => [order.id, order]));
+      setOrders(current => current.map(order => fresh.get(order.id) || order));
     } catch (error) {
       const errorInfo = handleAPIError(error);
-      toast.error(`Error al cargar clientes: ${errorInfo.message}`);
+      toast.error(`Error al cargar las órdenes: ${errorInfo.message}`);
     }
   };
 
@@ -250,7 +252,13 @@ const VentasApp = () => {
   
   const handleQuickStatusUpdate = async (orderId, newStatus) => {
     try {
-await orderAPI.partialUpdate(orderId, { status: newStatus });
+      // Solo cambia el estado (sin reenviar cliente ni líneas); el backend valida la transición
+      const response = await orderAPI.transition([orderId], newStatus);
+      const [result] = response.data.results;
+      if (!result.ok) {
+        toast.error(result.error);
+        return;
+      }
       toast.success(`Estado actualizado a ${getStatusText(newStatus)}`);
       setOrders(prevOrders => 
         prevOrders.map(order => 
@@ -294,10 +302,11 @@ await orderAPI.partialUpdate(orderId, { status: newStatus });
       await orderAPI.update(editingOrder.id, updatePayload);
       
       toast.success('¡Orden actualizada exitosamente!');
+      const updatedId = editingOrder.id;
       setIsEditModalOpen(false);
       setEditingOrder(null);
       resetForm();
-      await fetchOrders(); // Recargar la lista
+      await refreshOrders([updatedId]); // Recargar solo la orden editada
       
     } catch (error) {
       console.error('Error al actualizar orden:', error);
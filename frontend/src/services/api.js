@@ -68,6 +68,8 @@ api.interceptors.response.use(
 export const categoryAPI = {
   getAll: () => api.get('/categories/'),
   getById: (id) => api.get(`/categories/${id}/`),
+  // Productos de la categoría, paginados (mismos filtros que /products/)
+  getProducts: (id, params = {}) => api.get(`/categories/${id}/products/`, { params }),
   create: (data) => api.post('/categories/', data),
   update: (id, data) => api.put(`/categories/${id}/`, data),
   partialUpdate: (id, data) => api.patch(`/categories/${id}/`, data),
@@ -78,6 +80,8 @@ export const categoryAPI = {
 export const productAPI = {
   getAll: (params = {}) => api.get('/products/', { params }),
   getById: (id) => api.get(`/products/${id}/`),
+  // Varios registros en una petición, en el orden pedido: { count, results, missing }
+  getByIds: (ids, params = {}) => api.post('/products/by-ids/', { ids }, { params }),
   create: (data) => {
     const formData = new FormData();
     Object.keys(data).forEach(key => {
@@ -113,23 +117,35 @@ export const productAPI = {
   },
   delete: (id) => api.delete(`/products/${id}/`),
   exportCSV: () => api.get('/products/export-csv/', { responseType: 'blob' }),
+  // Lista compacta para desplegables: { fields, count, results: [[id, name, price, stock], ...] }
+  lookup: (params = {}) => api.get('/products/lookup/', { params }),
 };
 
 // Clientes
 export const customerAPI = {
   getAll: (params = {}) => api.get('/customers/', { params }),
   getById: (id) => api.get(`/customers/${id}/`),
+  // Varios registros en una petición, en el orden pedido: { count, results, missing }
+  getByIds: (ids, params = {}) => api.post('/customers/by-ids/', { ids }, { params }),
   create: (data) => api.post('/customers/', data),
   update: (id, data) => api.put(`/customers/${id}/`, data),
   partialUpdate: (id, data) => api.patch(`/customers/${id}/`, data),
   delete: (id) => api.delete(`/customers/${id}/`),
   exportCSV: () => api.get('/customers/export-csv/', { responseType: 'blob' }),
+  // Lista compacta para desplegables: { fields, count, results: [[id, name, email], ...] }
+  lookup: (params = {}) => api.get('/customers/lookup/', { params }),
 };
 
+// Convierte la respuesta de un endpoint de lookup en objetos ({ id, name, ... })
+export const lookupRows = ({ fields, results }) =>
+  results.map(row => Object.fromEntries(fields.map((field, index) => [field, row[index]])));
+
 // Usuarias
 export const usuariaAPI = {
   getAll: (params = {}) => api.get('/usuarias/', { params }),
   getById: (id) => api.get(`/usuarias/${id}/`),
+  // Varios registros en una petición, en el orden pedido: { count, results, missing }
+  getByIds: (ids, params = {}) => api.post('/usuarias/by-ids/', { ids }, { params }),
   create: (data) => {
     const formData = new FormData();
     Object.keys(data).forEach(key => {
@@ -173,10 +189,14 @@ export const usuariaAPI = {
 export const orderAPI = {
   getAll: (params = {}) => api.get('/orders/', { params }),
   getById: (id) => api.get(`/orders/${id}/`),
+  // Varios registros en una petición, en el orden pedido: { count, results, missing }
+  getByIds: (ids, params = {}) => api.post('/orders/by-ids/', { ids }, { params }),
   create: (data) => api.post('/orders/', data),
   update: (id, data) => api.put(`/orders/${id}/`, data),
   partialUpdate: (id, data) => api.patch(`/orders/${id}/`, data),
   delete: (id) => api.delete(`/orders/${id}/`),
+  // Cambio de estado de varios pedidos: { status, updated, results: [{ id, ok, from, status, error }] }
+  transition: (ids, status) => api.post('/orders/transition/', { ids, status }),
   exportCSV: () => api.get('/orders/export-csv/', { responseType: 'blob' }),
 };
 
@@ -191,6 +211,17 @@ export const orderItemAPI = {
   exportCSV: () => api.get('/order-items/export-csv/', { responseType: 'blob' }),
 };
 
+// Panel de control (datos ya agregados en el servidor)
+export const dashboardAPI = {
+  get: (params = {}) => api.get('/dashboard/', { params }),
+};
+
+// Varios listados en una sola petición: [{ resource, key, filters, fields, limit }, ...]
+// Devuelve { clave: { resource, count, truncated, results } }
+export const bootstrapAPI = {
+  load: (queries) => api.post('/bootstrap/', { queries }),
+};
+
 // Utilidades para manejo de archivos
 export const downloadFile = (blob, filename) => {
   const url = window.URL.createObjectURL(blob);